@@ -0,0 +1,367 @@
+import argparse
+import contextlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import ftp_async
+import path_ftp
+from constant import Const
+from constant import const as c
+
+BENCH_DIR = "UPDATES"  # Директория компонент на локальном FTP сервере.
+FAULT_REPLY = "421 Injected fault, closing control connection."
+
+logger = logging.getLogger("bench_ftp")
+
+
+def main():
+    """Функция main():
+        Назначение.
+            Измерить производительность path_ftp без обращения к ftp.galaktika.ru.
+            Запускается локальный FTP сервер (pyftpdlib, 127.0.0.1) с синтетической
+            директорией компонент, и полная синхронизация path_ftp.main()
+            выполняется в пустую локальную директорию несколько раз.
+            Выводятся файлов/с, МБ/с и p50/p95 времени скачивания одного файла.
+    :return: None
+    """
+    options = get_options()
+
+    file_log = logging.FileHandler("bench_ftp.log")
+    console_log = logging.StreamHandler()
+    for handler in (file_log, console_log):
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    # Журнал path_ftp на время измерений - только ошибки
+    logging.basicConfig(level=logging.ERROR, handlers=(logging.StreamHandler(),))
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_ftp_"))
+    try:
+        server_root = Path(work_dir, "srv")
+        tree = make_tree(Path(server_root, BENCH_DIR), options)
+        logger.info(
+            f"Файлов на сервере: {len(tree)}, "
+            f"{sum(tree.values()) / (1024 * 1024):.1f} МБ, "
+            f"задержка {options.latency} мс, сбоев {options.faults:.0%}"
+        )
+
+        process, port = start_server(server_root, options)
+        try:
+            results = [
+                run_sync(work_dir, port, tree, options, run)
+                for run in range(1, options.runs + 1)
+            ]
+        finally:
+            process.terminate()
+            process.join()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report(results, options)
+
+
+def get_options() -> argparse.Namespace:
+    """Функция get_options() -> argparse.Namespace
+    Разбирает параметры программы.
+    """
+    parser = argparse.ArgumentParser(
+        description="Замер скорости path_ftp на локальном FTP сервере"
+    )
+    parser.add_argument("--files", type=int, default=200, help="Количество файлов")
+    parser.add_argument(
+        "--size-min", type=int, default=4, help="Наименьший размер файла, КБ"
+    )
+    parser.add_argument(
+        "--size-max", type=int, default=2048, help="Наибольший размер файла, КБ"
+    )
+    parser.add_argument(
+        "--old",
+        type=float,
+        default=0.0,
+        help="Доля компонент, уже имеющихся локально в более ранней версии",
+    )
+    parser.add_argument(
+        "--latency", type=int, default=0, help="Задержка ответа на команду, мс"
+    )
+    parser.add_argument(
+        "--faults",
+        type=float,
+        default=0.0,
+        help="Вероятность обрыва сессии ответом 421 на RETR",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Количество замеров")
+    parser.add_argument("--seed", type=int, default=1, help="Начальное число ГСЧ")
+    parser.add_argument("--json", help="Файл для сохранения результатов (JSON)")
+    parser.add_argument(
+        "sync_args",
+        nargs=argparse.REMAINDER,
+        help="Ключи path_ftp (после --), например -- --engine asyncio --connections 8",
+    )
+    options = parser.parse_args()
+    if options.sync_args[:1] == ["--"]:
+        options.sync_args = options.sync_args[1:]
+    return options
+
+
+def make_tree(ftp_dir: Path, options: argparse.Namespace) -> dict[str, int]:
+    """Функция make_tree(ftp_dir: Path, options) -> dict[str, int]
+        Заполняет директорию синтетическими компонентами с именами вида
+        BENCHnnnnn_RES_vvvvvv.ext и файлом контрольных сумм SFV_FILE.
+        Размеры файлов распределены логарифмически равномерно
+        от options.size_min до options.size_max КБ.
+    :return:
+        Словарь: имя файла -> размер файла.
+    """
+    ftp_dir.mkdir(parents=True)
+    rnd = random.Random(options.seed)
+    extensions = (".acd", ".dll", ".res", ".rpt")
+    log_min = math.log(options.size_min * 1024)
+    log_max = math.log(max(options.size_min, options.size_max) * 1024)
+
+    tree = dict()
+    sfv_lines = [f"; {c.SFV_FILE} bench_ftp"]
+    for i in range(options.files):
+        name = (
+            f"BENCH{i:05d}_RES_{rnd.randint(900_000, 999_999):06d}"
+            f"{extensions[i % len(extensions)]}"
+        )
+        data = rnd.randbytes(int(math.exp(rnd.uniform(log_min, log_max))))
+        Path(ftp_dir, name).write_bytes(data)
+        tree[name] = len(data)
+        sfv_lines.append(f"{name} {zlib.crc32(data):08X}")
+
+    sfv_data = ("\n".join(sfv_lines) + "\n").encode("cp1251")
+    Path(ftp_dir, c.SFV_FILE).write_bytes(sfv_data)
+    tree[c.SFV_FILE] = len(sfv_data)
+    return tree
+
+
+def start_server(
+    root: Path, options: argparse.Namespace
+) -> tuple[multiprocessing.Process, int]:
+    """Функция start_server(root: Path, options) -> tuple[Process, int]
+        Запускает FTP сервер в отдельном процессе
+        (pyftpdlib меняет текущую директорию процесса).
+    :return:
+        (Процесс сервера, Порт сервера)
+    """
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve,
+        args=(str(root), port_queue, options.latency, options.faults, options.seed),
+        daemon=True,
+    )
+    process.start()
+    port = port_queue.get(timeout=30)
+    if port is None:
+        process.join()
+        raise SystemExit("Для замеров нужен пакет pyftpdlib (pip install pyftpdlib)")
+    return process, port
+
+
+def serve(
+    root: str,
+    port_queue: multiprocessing.Queue,
+    latency_ms: int,
+    fault_rate: float,
+    seed: int,
+) -> None:
+    """Функция serve(root, port_queue, latency_ms, fault_rate, seed) -> None
+    FTP сервер для замеров (анонимный доступ к root, только чтение).
+    Каждая команда выполняется с задержкой latency_ms,
+    команда RETR с вероятностью fault_rate закрывает сессию ответом 421.
+    """
+    try:
+        from pyftpdlib.authorizers import DummyAuthorizer
+        from pyftpdlib.handlers import FTPHandler
+        from pyftpdlib.servers import ThreadedFTPServer
+    except ImportError:
+        port_queue.put(None)
+        raise
+
+    rnd = random.Random(seed)
+
+    class BenchHandler(FTPHandler):
+        def process_command(self, cmd, *args, **kwargs):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if cmd == "RETR" and rnd.random() < fault_rate:
+                self.respond(FAULT_REPLY)
+                self.close_when_done()
+                return
+            super().process_command(cmd, *args, **kwargs)
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(root)
+    BenchHandler.authorizer = authorizer
+    logging.getLogger("pyftpdlib").setLevel(logging.WARNING)
+
+    server = ThreadedFTPServer(("127.0.0.1", 0), BenchHandler)
+    port_queue.put(server.socket.getsockname()[1])
+    server.serve_forever()
+
+
+def run_sync(
+    work_dir: Path,
+    port: int,
+    tree: dict[str, int],
+    options: argparse.Namespace,
+    run: int,
+) -> dict:
+    """Функция run_sync(work_dir, port, tree, options, run) -> dict
+        Один замер: полная синхронизация path_ftp.main() в пустую директорию.
+    :return:
+        Результаты замера.
+    """
+    local_dir = Path(work_dir, f"local_{run}")
+    local_dir.mkdir()
+    make_old_versions(local_dir, tree, options)
+
+    Const.FTP_SITE = "127.0.0.1"
+    Const.FTP_PORT = port
+    path_ftp.is_VPN_connected = lambda: True  # Стоп лист не применяется
+    sync_options = path_ftp.get_options(
+        [str(local_dir), "/" + BENCH_DIR] + options.sync_args
+    )
+
+    latencies = []
+    with timed_copies(latencies), open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            time_begin = time.perf_counter()
+            try:
+                pool, copied, not_copied = path_ftp.main(sync_options)
+                pool.quit()
+            except path_ftp.f.MyException as e:
+                logger.error(f"Замер {run}: {e.text_err}")
+                copied, not_copied = 0, len(tree)
+            seconds = time.perf_counter() - time_begin
+
+    shutil.rmtree(local_dir, ignore_errors=True)
+    copied = abs(copied)
+    assert not copied or len(latencies) == copied, (
+        f"Замер {run}: время скачивания учтено у {len(latencies)} файлов "
+        f"из {copied} скопированных"
+    )
+    result = {
+        "run": run,
+        "seconds": seconds,
+        "files_copied": copied,
+        "files_not_copied": not_copied,
+        "bytes": sum(tree.values()),
+        "files_per_sec": copied / seconds,
+        "mb_per_sec": sum(tree.values()) / (1024 * 1024) / seconds,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+    logger.info(
+        f"Замер {run}: {seconds:.2f} с, файлов {copied} (не скопировано {not_copied}), "
+        f"{result['files_per_sec']:.1f} файлов/с, {result['mb_per_sec']:.2f} МБ/с, "
+        f"p50 {result['p50_ms']:.1f} мс, p95 {result['p95_ms']:.1f} мс"
+    )
+    return result
+
+
+def make_old_versions(
+    local_dir: Path, tree: dict[str, int], options: argparse.Namespace
+) -> None:
+    """Функция make_old_versions(local_dir, tree, options) -> None
+    Создаёт в локальной директории более ранние версии доли options.old компонент
+    (их path_men перенесёт в OLD после синхронизации).
+    """
+    rnd = random.Random(options.seed)
+    for name in tree:
+        component_name = path_ftp.f.parse_component_name(name)
+        if component_name and rnd.random() < options.old:
+            old_version = f"{int(component_name.version) - 1:06d}"
+            Path(
+                local_dir,
+                component_name.base + old_version + component_name.extension,
+            ).write_bytes(b"old")
+
+
+@contextlib.contextmanager
+def timed_copies(latencies: list[float]):
+    """Замеряет время скачивания каждого скопированного файла обоими механизмами
+    скачивания (время copy_with_retry: одним потоком, по участкам, с повторными
+    попытками) и добавляет его в latencies."""
+    sync_copy = path_ftp.copy_with_retry
+    async_copy = ftp_async.copy_with_retry
+
+    def timed_sync_copy(*args, **kwargs):
+        time_begin = time.perf_counter()
+        copied = sync_copy(*args, **kwargs)
+        if copied:
+            latencies.append(time.perf_counter() - time_begin)
+        return copied
+
+    async def timed_async_copy(*args, **kwargs):
+        time_begin = time.perf_counter()
+        copied, session = await async_copy(*args, **kwargs)
+        if copied:
+            latencies.append(time.perf_counter() - time_begin)
+        return copied, session
+
+    path_ftp.copy_with_retry = timed_sync_copy
+    ftp_async.copy_with_retry = timed_async_copy
+    try:
+        yield
+    finally:
+        path_ftp.copy_with_retry = sync_copy
+        ftp_async.copy_with_retry = async_copy
+
+
+def percentile(values: list[float], p: int) -> float:
+    """Функция percentile(values: list[float], p: int) -> float
+    Процентиль p значений values (0, если значений нет).
+    """
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def report(results: list[dict], options: argparse.Namespace) -> None:
+    """Функция report(results: list[dict], options) -> None
+    Выводит медианы замеров и при необходимости сохраняет результаты в JSON.
+    """
+    summary = {
+        key: statistics.median(result[key] for result in results)
+        for key in ("seconds", "files_per_sec", "mb_per_sec", "p50_ms", "p95_ms")
+    }
+    logger.info(
+        f"Медиана {len(results)} замеров: {summary['seconds']:.2f} с, "
+        f"{summary['files_per_sec']:.1f} файлов/с, {summary['mb_per_sec']:.2f} МБ/с, "
+        f"p50 {summary['p50_ms']:.1f} мс, p95 {summary['p95_ms']:.1f} мс"
+    )
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "options": {
+                        key: value
+                        for key, value in vars(options).items()
+                        if key != "json"
+                    },
+                    "runs": results,
+                    "median": summary,
+                },
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import gc
+import json
+import random
+import re
+import statistics
+import time
+
+import component_functions as f
+import path_men
+from constant import const as c
+
+
+def main():
+    """Функция main():
+        Назначение.
+            Измерить затраты на разбор и сравнение имён компонент
+            на синтетической директории (по умолчанию 100 000 имён).
+            Сравниваются прежний разбор (re.match по строке шаблона, кортеж,
+            сравнение версий выравниванием строк) и ComponentName:
+            первый разбор имён (пустой кэш), повторный разбор (имена в кэше)
+            сравнение версий и проход path_men по отсортированным именам.
+            Выводится время на одно имя, нс.
+    :return: None
+    """
+    options = get_options()
+    names = make_names(options)
+
+    results = {
+        "legacy_parse": measure(
+            lambda: [legacy_name_to_tuple(n) for n in names], options.runs
+        ),
+        "parse_cold": measure(
+            lambda: [f.parse_component_name(n) for n in names], options.runs, True
+        ),
+        "parse_cached": measure(
+            lambda: [f.parse_component_name(n) for n in names], options.runs
+        ),
+    }
+    # Сравнение версий: оба списка строятся в порядке сортировки
+    sorted_names = sorted(names)
+    legacy_tuples = [legacy_name_to_tuple(name) for name in sorted_names]
+    component_names = [
+        f.parse_component_name.__wrapped__(name) for name in sorted_names
+    ]
+    results["legacy_compare"] = measure(
+        lambda: legacy_outdated(legacy_tuples), options.runs
+    )
+    results["compare"] = measure(lambda: outdated(component_names), options.runs)
+    # Проход path_men целиком: имена уже разобраны индексом директории (в кэше)
+    results["legacy_path_men"] = measure(
+        lambda: legacy_outdated([legacy_name_to_tuple(n) for n in sorted_names]),
+        options.runs,
+    )
+    results["path_men"] = measure(
+        lambda: outdated([f.parse_component_name(n) for n in sorted_names]),
+        options.runs,
+    )
+
+    ns_per_name = {
+        key: statistics.median(times) * 1e9 / len(names)
+        for key, times in results.items()
+    }
+    print(f"Имён: {len(names)}, замеров: {options.runs}")
+    for key, value in ns_per_name.items():
+        print(f"    {key:<15} {value:8.1f} нс/имя")
+    for title, legacy_key, key in (
+        ("Разбор без кэша", "legacy_parse", "parse_cold"),
+        ("Разбор с кэшем", "legacy_parse", "parse_cached"),
+        ("Сравнение версий", "legacy_compare", "compare"),
+        ("Проход path_men", "legacy_path_men", "path_men"),
+    ):
+        print(
+            f"{title}: в {ns_per_name[legacy_key] / ns_per_name[key]:.1f} раза быстрее"
+        )
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as file:
+            json.dump(
+                {"names": len(names), "runs": options.runs, "ns_per_name": ns_per_name},
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+def get_options() -> argparse.Namespace:
+    """Функция get_options() -> argparse.Namespace
+    Разбирает параметры программы.
+    """
+    parser = argparse.ArgumentParser(
+        description="Замер разбора и сравнения имён компонент"
+    )
+    parser.add_argument("--names", type=int, default=100_000, help="Количество имён")
+    parser.add_argument(
+        "--versions", type=int, default=3, help="Версий одного компонента"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Количество замеров")
+    parser.add_argument("--seed", type=int, default=1, help="Начальное число ГСЧ")
+    parser.add_argument("--json", help="Файл для сохранения результатов (JSON)")
+    return parser.parse_args()
+
+
+def make_names(options: argparse.Namespace) -> list[str]:
+    """Функция make_names(options) -> list[str]
+    Имена файлов вида COMPnnnnnn_RES_vvvvvv.ext, по options.versions версий
+    каждого компонента, и несколько имён, не являющихся именами компонент.
+    """
+    rnd = random.Random(options.seed)
+    extensions = (".acd", ".dll", ".res", ".rpt")
+    names = []
+    for i in range(options.names):
+        component = i // options.versions
+        names.append(
+            f"COMP{component:06d}_RES_{rnd.randint(900_000, 999_999):06d}"
+            f"{extensions[component % len(extensions)]}"
+        )
+        if i % 1000 == 0:
+            names[-1] = f"readme{i}.txt"
+    rnd.shuffle(names)
+    return names
+
+
+def measure(function, runs: int, clear_cache: bool = False) -> list[float]:
+    """Функция measure(function, runs, clear_cache) -> list[float]
+    Время runs вызовов function, секунд.
+    Если clear_cache - перед каждым вызовом кэш разбора имён очищается.
+    Сборщик мусора на время замера отключается (как в timeit).
+    """
+    times = []
+    for _ in range(runs):
+        if clear_cache:
+            f.parse_component_name.cache_clear()
+        gc.collect()
+        gc.disable()
+        try:
+            time_begin = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - time_begin)
+        finally:
+            gc.enable()
+    return times
+
+
+def legacy_name_to_tuple(name: str) -> tuple[str, str, str] | None:
+    """Прежний разбор имени компонента (для сравнения)."""
+    res_match = re.match(c.RE_PATTERN_NAME_COMPONENT, name)
+    if not res_match:
+        return None
+    for i in range(1, 4):
+        if not res_match.group(i):
+            return None
+    return res_match.group(1), res_match.group(2), res_match.group(3)
+
+
+def legacy_outdated(name_tuples: list) -> int:
+    """Прежний проход path_men: сравнение версий выравниванием строк."""
+    count_outdated = 0
+    previous = ("", "", "")
+    for name_tuple in name_tuples:
+        if name_tuple:
+            if legacy_is_eq_name(name_tuple, previous):
+                legacy_get_oldest_component(name_tuple, previous)
+                count_outdated += 1
+        else:
+            name_tuple = ("", "", "")
+        previous = name_tuple
+    return count_outdated
+
+
+def legacy_is_eq_name(tuple1: tuple, tuple2: tuple) -> bool:
+    """Прежнее сравнение постоянных частей имён компонентов."""
+    return tuple1[0] == tuple2[0] and tuple1[2] == tuple2[2]
+
+
+def legacy_get_oldest_component(tuple1: tuple, tuple2: tuple) -> tuple:
+    """Прежнее сравнение версий выравниванием строк."""
+    version_1 = tuple1[1]
+    version_2 = tuple2[1]
+    delta_len = len(version_1) - len(version_2)
+    if delta_len < 0:
+        version_1 += "0" * (-delta_len)
+    elif delta_len > 0:
+        version_2 += "0" * delta_len
+    return tuple1 if int(version_1) < int(version_2) else tuple2
+
+
+def outdated(component_names: list) -> int:
+    """Проход path_men по разобранным именам (без перемещения файлов)."""
+    return len(path_men.get_outdated_components(component_names))
+
+
+if __name__ == "__main__":
+    main()
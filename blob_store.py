@@ -0,0 +1,148 @@
+import hashlib
+import os
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+import promotion
+from constant import const as c
+
+
+@dataclass
+class StoreStats:
+    """Итоги работы с хранилищем содержимого файлов.
+    linked_files / linked_bytes:    файлы, взятые из хранилища вместо скачивания.
+    added_files / added_bytes:      файлы, содержимое которых добавлено в хранилище.
+    shared_files / shared_bytes:    скачанные файлы, содержимое которых уже было
+                                    в хранилище (файл заменён ссылкой).
+    """
+
+    linked_files: int = 0
+    linked_bytes: int = 0
+    added_files: int = 0
+    added_bytes: int = 0
+    shared_files: int = 0
+    shared_bytes: int = 0
+
+
+class BlobStore:
+    """Хранилище содержимого файлов компонент, адресуемое хэшем (SHA-256).
+    Каждое содержимое хранится один раз: файл STORE_OBJECTS/xx/<sha256> в директории
+    хранилища. Файлы директории компонент, NEW и OLD - жёсткие ссылки на него,
+    поэтому занятое место и время переноса зависят только от числа разных содержимых.
+    Индекс хранилища (файл SQLite STORE_INDEX) позволяет найти содержимое
+    до скачивания: по размеру и CRC32 из SFV_FILE или, без контрольной суммы,
+    по имени файла и размеру на FTP сервере (имена компонент содержат версию).
+    Хранилище должно быть на одной файловой системе с директорией компонент.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.stats = StoreStats()
+        Path(self.directory, c.STORE_OBJECTS).mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            Path(self.directory, c.STORE_INDEX), timeout=c.STORE_TIMEOUT_SEC
+        )
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS blobs "
+                "(sha256 TEXT PRIMARY KEY, size INTEGER, crc32 INTEGER)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS blobs_crc32 ON blobs (size, crc32)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS names (name TEXT, size INTEGER, "
+                "sha256 TEXT, PRIMARY KEY (name, size))"
+            )
+
+    def blob_path(self, sha256: str) -> Path:
+        """Файл содержимого с хэшем sha256."""
+        return Path(self.directory, c.STORE_OBJECTS, sha256[:2], sha256)
+
+    def find(self, name: str, size: int | None, crc: int | None) -> Path | None:
+        """Ищет в хранилище содержимое файла name.
+        Если известна контрольная сумма crc (из SFV_FILE) - по размеру и CRC32,
+        иначе - по имени и размеру файла. Без размера файл не ищется.
+        :return: Файл содержимого или None.
+        """
+        if size is None:
+            return None
+        if crc is not None:
+            row = self._connection.execute(
+                "SELECT sha256 FROM blobs WHERE size = ? AND crc32 = ?", (size, crc)
+            ).fetchone()
+        else:
+            row = self._connection.execute(
+                "SELECT sha256 FROM names WHERE name = ? AND size = ?", (name, size)
+            ).fetchone()
+        if row is None:
+            return None
+        blob = self.blob_path(row[0])
+        try:
+            if blob.stat().st_size == size:
+                return blob
+        except FileNotFoundError:
+            pass
+        with self._connection:
+            self._connection.execute("DELETE FROM blobs WHERE sha256 = ?", row)
+            self._connection.execute("DELETE FROM names WHERE sha256 = ?", row)
+        return None
+
+    def link(self, blob: Path, file_to: Path) -> None:
+        """Создаёт файл file_to - жёсткую ссылку на содержимое blob
+        (или его копию, если ссылка невозможна)."""
+        size = blob.stat().st_size
+        promotion.promote_file(blob, file_to, promotion.PromotionStats(), try_link=True)
+        self.stats.linked_files += 1
+        self.stats.linked_bytes += size
+
+    def add(self, file: Path) -> None:
+        """Добавляет содержимое файла в хранилище.
+        Если такое содержимое уже есть, файл заменяется ссылкой на него.
+        """
+        sha256, crc_value, size = hash_file(file)
+        blob = self.blob_path(sha256)
+        if blob.exists():
+            if not os.path.samefile(blob, file):
+                promotion.promote_file(
+                    blob, file, promotion.PromotionStats(), try_link=True
+                )
+                self.stats.shared_files += 1
+                self.stats.shared_bytes += size
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            os.link(file, blob)
+            self.stats.added_files += 1
+            self.stats.added_bytes += size
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)",
+                (sha256, size, crc_value),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO names VALUES (?, ?, ?)",
+                (file.name, size, sha256),
+            )
+
+    def close(self) -> None:
+        """Закрывает индекс хранилища."""
+        self._connection.close()
+
+
+def hash_file(file: Path) -> tuple[str, int, int]:
+    """Функция hash_file(file: Path) -> tuple[str, int, int]
+    Читает файл блоками по COPY_CHUNK_SIZE один раз.
+    :return: (SHA-256, CRC32, размер файла)
+    """
+    sha256 = hashlib.sha256()
+    crc_value = 0
+    size = 0
+    with open(file, "rb") as f_in:
+        while block := f_in.read(c.COPY_CHUNK_SIZE):
+            sha256.update(block)
+            crc_value = zlib.crc32(block, crc_value)
+            size += len(block)
+    return sha256.hexdigest(), crc_value, size
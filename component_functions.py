@@ -1,8 +1,12 @@
+import re
+from functools import lru_cache
 from pathlib import Path
-from re import match
+from typing import NamedTuple
 
 from constant import const as C
 
+RE_NAME_COMPONENT = re.compile(C.RE_PATTERN_NAME_COMPONENT)
+
 
 class MyException(Exception):
     def __init__(self, text_err, ret_code):
@@ -10,38 +14,72 @@ class MyException(Exception):
         self.ret_code = ret_code
 
 
-def is_eq_name(tuple1: tuple, tuple2: tuple) -> bool:
-    """Функция is_eq_name(tuple1: tuple, tuple2: tuple) -> bool
-        сравнивает равны ли постоянные части имён компонентов
-        (имя компонента и расширение). Номера версий не сравниваются.
-
-    Аргументы:
-         tuple1 (tuple): кортеж имени компонента (имя, версия, расширение файла).
-         tuple2 (tuple): кортеж имени компонента (имя, версия, расширение файла).
-
-    Возвращает:
-         bool: True если постоянные части имён совпадают, иначе - False.
+class ComponentName(NamedTuple):
+    """Разобранное имя файла компонента, например F_GETAN_RES_911010.acd.
+    Неизменяемый кортеж без словаря атрибутов: таких имён в директории компонент
+    десятки тысяч.
+    base:       имя компонента - F_GETAN_RES_.
+    version:    версия компонента, как в имени файла - 911010.
+    extension:  расширение файла компонента - .acd.
+    number:     версия для сравнения версий: цифры версии, дополненные справа нулями
+                до VERSION_WIDTH разрядов (версии 91 и 911010 сравниваются
+                как 910000 и 911010).
     """
 
-    return tuple1[0] == tuple2[0] and tuple1[2] == tuple2[2]
-
-
-def name_to_tuple(name: str) -> tuple[str, str, str] | None:
-    """Функция name_to_tuple(name: str) -> tuple[str, str, str]
-        разбивает имя файла компонента на 3 части.
+    base: str
+    version: str
+    extension: str
+    number: int
+
+    @property
+    def name(self) -> str:
+        """Имя файла компонента."""
+        return self.base + self.version + self.extension
+
+    def is_same_component(self, other: "ComponentName") -> bool:
+        """Равны ли постоянные части имён компонентов (имя компонента и расширение).
+        Номера версий не сравниваются."""
+        return self.base == other.base and self.extension == other.extension
+
+    def is_newer(self, other: "ComponentName") -> bool:
+        """Свежее ли версия, чем версия other того же компонента: порядок версий
+        по ключу (number, name) - при равных номерах (версии 91 и 910000) свежее
+        большее имя файла. Порядок общий для path_men и --latest (planning).
+        Имя собирается только при равных номерах."""
+        return self.number > other.number or (
+            self.number == other.number and self.name > other.name
+        )
+
+
+@lru_cache(maxsize=C.COMPONENT_NAME_CACHE_SIZE)
+def parse_component_name(name: str) -> ComponentName | None:
+    """Функция parse_component_name(name: str) -> ComponentName | None
+        разбирает имя файла компонента на 3 части
         (имя компонента, номер версии, расширение файла).
+        Результаты разбора хранятся в кэше (COMPONENT_NAME_CACHE_SIZE имён):
+        одни и те же имена разбирают path_ftp, path_men и индекс директории.
     :param name: str - имя файла компонента.
-    :return: (имя компонента, номер версии, расширение файла).
+    :return: Разобранное имя компонента.
     Если имя файла компонента не соответствует структуре имени компонента, то None.
     """
 
-    res_match = match(C.RE_PATTERN_NAME_COMPONENT, name)
+    res_match = RE_NAME_COMPONENT.match(name)
     if not res_match:
         return None
-    for i in range(1, 4):
-        if not res_match.group(i):
-            return None
-    return res_match.group(1), res_match.group(2), res_match.group(3)
+    base, version, extension = res_match.groups()
+    if not extension:
+        return None
+    return make_component_name(base, version, extension)
+
+
+def make_component_name(base: str, version: str, extension: str) -> ComponentName:
+    """Функция make_component_name(base: str, version: str, extension: str) -> ComponentName
+    Имя компонента из уже разобранных частей (номер версии для сравнения
+    вычисляется по версии).
+    """
+    return ComponentName(
+        base, version, extension, int(version.ljust(C.VERSION_WIDTH, "0"))
+    )
 
 
 def reset_component_version(name_file: str) -> str:
@@ -53,30 +91,14 @@ def reset_component_version(name_file: str) -> str:
     Если имя файла компонента не соответствует структуре имени компонента,
     то возвращается имя файла в исходном виде.
     """
-    name_tuple = name_to_tuple(name_file)
-    if name_tuple:
-        name = name_tuple[0] + C.ZERO_VERSION + name_tuple[2]
+    component_name = parse_component_name(name_file)
+    if component_name:
+        name = component_name.base + C.ZERO_VERSION + component_name.extension
     else:
         name = name_file
     return name
 
 
-def confirm_if_needed(dir_: Path) -> None:
-    """
-    :Назначение
-        Функция проводит проверку директории и при необходимости устраняет проблему.
-    :param dir_:Path. Проверяемая директория.
-    :return: Нет.
-    """
-    if any(dir_.iterdir()):
-        answer = dialog(f"{dir_}. {C.TEXT_1}", ["н", "п"])
-        if answer == "н":
-            delete_all(dir_)
-        print("Продолжаем работать")
-
-    return
-
-
 def dialog(text: str, answers: list[str]) -> str:
     """Функция организует диалог с пользователем.
         Функция не выпустит пользователя,
@@ -23,9 +23,58 @@ class Const:
     SUB_DIR_NEW = "NEW"  # Имя поддиректории для скопированных с FTP сервера компонент.
     SUB_DIR_OLD = "OLD"  # Имя поддиректории для перемещённых устаревших компонент.
     TIME_OUT_SEC = 5  # Количество секунд на ожидания отклика с FTP сервера.
+    FTP_PORT = 21  # Порт FTP сервера.
+    FTP_CONNECTIONS = 4  # Количество параллельных сессий с FTP сервером.
+    FTP_ENCODING = "utf-8"  # Кодировка команд FTP (как в ftplib).
+    FTP_ENGINES = ("ftplib", "asyncio")  # Механизмы скачивания. Первый - по умолчанию.
+    SCHEDULE_ORDERS = ("largest", "smallest", "listing")  # Порядок скачивания.
+    SCHEDULE_REPORT_SEC = 30  # Период вывода оценки окончания скачивания, секунд.
+    ASYNC_CHUNK_SIZE = 64 * 1024  # Размер блока чтения данных механизмом asyncio.
+    ASYNC_WRITE_QUEUE = 16  # Сколько блоков может ждать записи на диск.
+    ASYNC_SLOT_POLL_SEC = 0.05  # Период ожидания места в пуле сессий.
+    RATE_BURST_SEC = 1.0  # Запас ограничителя скорости: сколько секунд передачи.
+    ADAPTIVE_INTERVAL_SEC = 5.0  # Период пересмотра числа параллельных передач.
+    ADAPTIVE_GAIN = 0.1  # Изменение скорости, которое считается значимым (доля).
+    ADAPTIVE_MAX_ERROR_RATE = 0.2  # Доля ошибок, при которой передач вдвое меньше.
+    RETRY_ATTEMPTS = 3  # Сколько раз пытаться скачать файл при потере сессии.
+    RETRY_BASE_SEC = 1.0  # Пауза перед первой повторной попыткой, секунд.
+    RETRY_MAX_SEC = 30.0  # Наибольшая пауза перед повторной попыткой, секунд.
+    MIRROR_MAX_FAILURES = 3  # После скольких ошибок подряд зеркало исключается.
+    MIRROR_EXCLUDE_SEC = 60  # На сколько секунд исключается зеркало.
+    MIRROR_MIN_LATENCY_SEC = 0.001  # Наименьшая задержка зеркала при выборе.
+    JOBS_SEPARATOR = ";"  # Разделитель директорий в строке файла заданий.
+    PLAN_VERSION = 1  # Версия формата файла плана синхронизации (--plan).
+    PLAN_HISTORY_JOBS = 20  # По скольким заданиям из отчёта оценивать скорость.
     PRINTING_RATIO = 10  # Через сколько операций вывода 'FTP -> компьютер' надо делать сообщение в консоль.
+    FTP_MODIFY_FORMAT = "%Y%m%d%H%M%S"  # Формат времени изменения файла (MLSD).
+    MANIFEST_FILE = ".manifest.sqlite"  # Файл индекса директории компонент.
+    JOURNAL_FILE = ".path_ftp.journal"  # Журнал задания в директории компонент.
+    MANIFEST_MTIME_GRANULARITY_NS = 2_000_000_000  # Точность времени изменения файлов.
+    COPY_CHUNK_SIZE = 1024 * 1024  # Размер блока при копировании файлов.
+    SFV_FILE = "UPDATES.sfv"  # Файл контрольных сумм CRC32 файлов директории FTP.
+    CRC_RETRIES = 2  # Сколько раз скачивать заново файл с неверной контрольной суммой.
+    STORE_OBJECTS = "objects"  # Поддиректория хранилища с содержимым файлов.
+    STORE_INDEX = "store.sqlite"  # Файл индекса хранилища содержимого файлов.
+    STORE_TIMEOUT_SEC = 30  # Ожидание индекса хранилища, занятого другим заданием.
+    PART_SUFFIX = ".part"  # Суффикс файла, копирование которого не завершено.
+    SEGMENT_COUNT = 4  # Наибольшее число участков файла (по умолчанию --segments).
+    SEGMENT_MIN_FILE_SIZE = 32 * 1024 * 1024  # С какого размера файл делится.
+    SEGMENT_MIN_SIZE = 8 * 1024 * 1024  # Наименьший размер участка файла.
+    SEGMENT_BLOCK_SIZE = 64 * 1024  # Размер блока чтения участка файла.
+    SEGMENT_SUFFIX = ".seg"  # Суффикс файла, скачиваемого по участкам.
+    SEGMENT_MAP_SUFFIX = ".segmap"  # Суффикс карты участков файла.
+    PART_SOURCE_SUFFIX = (
+        ".source"  # Суффикс сведений о файле FTP сервера скачанной части.
+    )
+    PREALLOCATE_MIN_SIZE = 1024 * 1024  # С какого размера место выделяется заранее.
+    DISK_FREE_MARGIN = 64 * 1024 * 1024  # Запас свободного места на диске, байт.
+    FTP_REST_REFUSED = ("500", "501", "502", "504", "554")
+    # Коды ответа FTP сервера, означающие отказ выполнить команду REST (докачку файла).
     FILE_STOP_LIST = "_internal\stop_list.txt"  # Файл с именами файлов, не подлежащих скачиванию с FTP сервера без VPN.
     ZERO_VERSION = "00000"  # Версия компонента = 0.
+    VERSION_WIDTH = 20  # Разрядов версии компонента при сравнении версий.
+    COMPONENT_NAME_CACHE_SIZE = 1 << 17  # Сколько разобранных имён хранить.
+    PRUNE_MOVE_WORKERS = 8  # Потоков переноса устаревших компонент в OLD.
     WORD_FONT_NAME = "Tahoma"  # Имя шрифта текста, формируемого, для MS WORD.
     WORD_FONT_SIZE = Pt(11)  # Размер шрифта текста, формируемого, для MS WORD.
     WORD_NAME = "Рассылка.docx"  # Имя формируемого WORD файла.
@@ -36,9 +85,33 @@ class Const:
         ", "  # Разделитель имён компонент в списке информационного письма.
     )
     TEXT_ERROR_SAVE = "Доступ к файлу сохранения документа запрещён"
-    TEXT_1 = (
-        "\nЕсли вы начинаете новое скачивание файлов - нажмите клавиши 'н' и Enter.\n"
-        "Если Вы продолжаете скачивание после сбоя - 'п' и Enter.\n"
+    TEXT_FTP_PARAMETERS = (
+        "Программе передано неверное количество параметров.\n"
+        "Программа принимает 2 параметра:\n"
+        "1. Имя директории локального диска с дистрибутивом обновлений, например,\n"
+        "   c:\\Дистрибутив\\PREPARE\n"
+        "2. Имя директории FTP сервера Галактика, например,\n"
+        "   /pub/support/galaktika/bug_fix/GAL910/UPDATES/\n"
+        "и ключи:\n"
+        "   --engine ftplib|asyncio - механизм скачивания файлов\n"
+        "   --connections N         - количество параллельных сессий с FTP сервером\n"
+        "   --jobs FILE             - файл заданий вместо параметров 1 и 2:\n"
+        "                             строки 'директория локального диска ; директория FTP'\n"
+        "   --rate KB               - ограничение общей скорости скачивания, КБ/с\n"
+        "   --adaptive              - подбирать число параллельных передач по скорости\n"
+        "   --watch SECONDS         - режим наблюдения: опрос FTP сервера с периодом\n"
+        "                             SECONDS без вопросов оператору\n"
+        "   --report FILE           - дописывать отчёт о запуске в FILE (JSON Lines)\n"
+        "   --prometheus FILE       - показатели запуска для Prometheus в FILE\n"
+        "   --latest                - скачивать только самые свежие версии компонент\n"
+        "   --store DIR             - хранилище содержимого файлов (жёсткие ссылки)\n"
+        "   --plan FILE             - только составить план синхронизации (JSON)\n"
+        "   --apply-plan FILE       - выполнить ранее составленный план\n"
+        "   --mirrors HOST[:PORT],... - зеркала FTP сервера (первое - эталон)\n"
+        "   --segments N            - скачивать большие файлы по N участков\n"
+        "                             параллельно (1 - одним потоком)\n"
+        "   --order ORDER           - порядок скачивания файлов: largest (сначала\n"
+        "                             большие), smallest или listing (как в директории)\n"
     )
     TEXT_3 = (
         "\nПапка старых версий компонент не пуста.\n"
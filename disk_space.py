@@ -0,0 +1,74 @@
+import os
+import shutil
+from pathlib import Path
+from threading import Lock
+
+import component_functions as f
+import rate_limit
+from constant import const as c
+
+
+class DiskSpace:
+    """Место на дисках, занятое под скачивание заданиями программы.
+    Задания выполняются параллельно и могут писать на один том, поэтому
+    свободное место тома для задания уменьшается на место, занятое другими
+    заданиями (и на запас DISK_FREE_MARGIN). Место занимается до начала
+    скачивания (reserve) и освобождается по окончании задания (release);
+    место под скачиваемый файл - по окончании файла, когда записанное
+    уже уменьшило свободное место тома.
+    """
+
+    def __init__(self):
+        self._reserved: dict[object, dict[int, int]] = dict()
+        self._lock = Lock()
+
+    def reserve(self, owner: object, needs: dict[Path, int]) -> None:
+        """Функция reserve(owner: object, needs: dict[Path, int]) -> None
+            Проверяет, хватает ли места, и занимает его для задания owner.
+            Директории одного тома складываются.
+        :param
+            1. owner: object            - Задание, занимающее место
+            2. needs: dict[Path, int]   - Директория -> сколько байт в неё будет записано
+        :return:
+            None. Если места не хватает, возникает MyException,
+            и место не занимается.
+        """
+        with self._lock:
+            volumes: dict[int, tuple[Path, int]] = dict()
+            for directory, size in needs.items():
+                device = os.stat(directory).st_dev
+                first, total = volumes.get(device, (directory, 0))
+                volumes[device] = (first, total + size)
+
+            for device, (directory, size) in volumes.items():
+                if not size:
+                    continue
+                free = shutil.disk_usage(directory).free - self._get_reserved(device)
+                if size > free - c.DISK_FREE_MARGIN:
+                    raise f.MyException(
+                        f"Недостаточно места на диске: {directory}\n"
+                        f"Нужно {rate_limit.format_size(size)} "
+                        f"(и запас {rate_limit.format_size(c.DISK_FREE_MARGIN)}), "
+                        f"свободно {rate_limit.format_size(max(0, free))}",
+                        777,
+                    )
+
+            reserved = self._reserved.setdefault(id(owner), dict())
+            for device, (_, size) in volumes.items():
+                reserved[device] = reserved.get(device, 0) + size
+
+    def release(self, owner: object, needs: dict[Path, int] | None = None) -> None:
+        """Освобождает место, занятое заданием owner: всё или только
+        needs (директория -> байт), например под уже скачанный файл."""
+        with self._lock:
+            if needs is None:
+                self._reserved.pop(id(owner), None)
+                return
+            reserved = self._reserved.get(id(owner), dict())
+            for directory, size in needs.items():
+                device = os.stat(directory).st_dev
+                if device in reserved:
+                    reserved[device] = max(0, reserved[device] - size)
+
+    def _get_reserved(self, device: int) -> int:
+        return sum(reserved.get(device, 0) for reserved in self._reserved.values())
@@ -0,0 +1,505 @@
+import errno
+import json
+import logging
+import os
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Event, Lock
+from typing import Callable
+
+import component_functions as f
+import metrics
+import mirrors
+import rate_limit
+import sfv
+from constant import const as c
+
+
+@dataclass
+class DownloadContext:
+    """Общие данные потоков скачивания файлов.
+    ftp_file_sizes: размеры файлов на FTP сервере (снимок директории).
+    sfv_crcs:       контрольные суммы файлов из SFV_FILE.
+    local_subdir:   целевая поддиректория NEW.
+    ftp_dir:        директория FTP сервера.
+    counts:         счётчики скопированных и не скопированных файлов,
+                    повторных попыток и повторных подключений к FTP серверу.
+    lock:           блокировка для изменения счётчиков.
+    stop:           признак прерывания работы оператором.
+    control:        общее управление скоростью скачивания (None - без ограничений).
+    job_metrics:    показатели задания, в которые добавляются показатели файлов.
+    mirror_set:     зеркала FTP сервера, с которыми открывает сессии механизм asyncio
+                    (None - FTP_SITE).
+    segments:       наибольшее число участков, скачиваемых параллельно, для файлов
+                    от SEGMENT_MIN_FILE_SIZE байт (1 - файлы не делятся).
+    scheduled:      файлы, запланированные к скачиванию (schedule) и ещё не скачанные,
+                    и моменты их постановки в очередь (time.perf_counter)
+                    - по ним оценивается окончание скачивания (control).
+    on_settle:      вызывается с именем файла по окончании скачивания
+                    запланированного файла (settle), например чтобы освободить
+                    занятое под него место на диске.
+    ftp_file_modify: время изменения файлов на FTP сервере (снимок директории)
+                    - по нему скачанная ранее часть файла сверяется с источником.
+    """
+
+    ftp_file_sizes: dict[str, int]
+    sfv_crcs: dict[str, int]
+    local_subdir: Path
+    ftp_dir: str
+    counts: dict[str, int] = field(
+        default_factory=lambda: {
+            "copied": 0,
+            "not_copied": 0,
+            "retries": 0,
+            "reconnects": 0,
+        }
+    )
+    lock: Lock = field(default_factory=Lock)
+    stop: Event = field(default_factory=Event)
+    control: rate_limit.TransferControl | None = None
+    job_metrics: metrics.JobMetrics | None = None
+    mirror_set: mirrors.MirrorSet | None = None
+    segments: int = 1
+    scheduled: dict[str, float] = field(default_factory=dict)
+    on_settle: Callable[[str], None] | None = None
+    ftp_file_modify: dict[str, str] = field(default_factory=dict)
+
+    def new_file_metrics(self, ftp_file: str) -> metrics.FileMetrics | None:
+        """Показатели скачивания файла (None, если показатели не собираются)."""
+        if self.job_metrics is None:
+            return None
+        return self.job_metrics.new_file(ftp_file, self.scheduled.get(ftp_file, 0.0))
+
+    def schedule(self, ftp_files: list[str]) -> None:
+        """Планирует скачивание файлов: отмечает момент постановки в очередь
+        и учитывает их объём в оценке окончания скачивания."""
+        queued_at = time.perf_counter()
+        with self.lock:
+            self.scheduled.update(dict.fromkeys(ftp_files, queued_at))
+        if self.control is not None:
+            self.control.schedule(
+                sum(self.ftp_file_sizes.get(name) or 0 for name in ftp_files)
+            )
+
+    def settle(
+        self, ftp_file: str, file_metrics: metrics.FileMetrics | None = None
+    ) -> None:
+        """Учитывает окончание скачивания запланированного файла в оценке
+        окончания: байты файла, которые не были получены, снимаются с неё."""
+        with self.lock:
+            if ftp_file not in self.scheduled:
+                return
+            del self.scheduled[ftp_file]
+        if self.on_settle is not None:
+            self.on_settle(ftp_file)
+        if self.control is not None and file_metrics is not None:
+            size = self.ftp_file_sizes.get(ftp_file) or 0
+            self.control.settle(max(0, size - file_metrics.bytes))
+
+    def count(self, copied: bool) -> None:
+        """Учитывает результат копирования файла в счётчиках."""
+        self.add("copied" if copied else "not_copied")
+        if self.control is not None:
+            self.control.finished(copied)
+
+    def add(self, name: str) -> None:
+        """Увеличивает счётчик name на 1."""
+        with self.lock:
+            self.counts[name] += 1
+
+
+def get_part_file(local_subdir: Path, ftp_file: str) -> Path:
+    """Функция get_part_file(local_subdir: Path, ftp_file: str) -> Path
+    Файл, в который пишется скачиваемый файл до завершения копирования.
+    """
+    return Path(local_subdir, ftp_file + c.PART_SUFFIX)
+
+
+def get_part_offset(
+    part_file: Path,
+    ftp_size: int | None,
+    ftp_modify: str | None = None,
+    crc: int | None = None,
+) -> int:
+    """Функция get_part_offset(part_file, ftp_size, ftp_modify, crc) -> int
+        Определяет, с какого байта продолжать скачивание файла.
+        Скачанная часть продолжается, только если она скачивалась из того же
+        файла FTP сервера: размер и время изменения, записанные рядом с ней
+        (save_part_source), совпадают с текущими. Если время изменения неизвестно
+        и контрольной суммы в SFV нет, продолжение из другого файла нечем
+        обнаружить, и файл скачивается с начала.
+    :param
+        1. part_file: Path  - Файл с уже скачанной частью
+        2. ftp_size: int    - Размер файла на FTP сервере (None - неизвестен)
+        3. ftp_modify: str  - Время изменения файла на FTP сервере (None - неизвестно)
+        4. crc: int         - Контрольная сумма из SFV_FILE (None - неизвестна)
+    :return:
+        Размер скачанной части или 0, если скачивать надо с начала.
+    """
+    if not part_file.exists():
+        return 0
+    if ftp_modify is None and crc is None:
+        return 0
+    if not is_part_source(part_file, ftp_size, ftp_modify):
+        return 0
+    offset = part_file.stat().st_size
+    if ftp_size is not None and offset > ftp_size:
+        offset = 0
+    return offset
+
+
+def get_part_source_file(part_file: Path) -> Path:
+    """Функция get_part_source_file(part_file: Path) -> Path
+    Файл сведений о файле FTP сервера, из которого скачивается часть part_file.
+    """
+    name = part_file.name.removesuffix(c.PART_SUFFIX)
+    return Path(part_file.parent, name + c.PART_SOURCE_SUFFIX + c.PART_SUFFIX)
+
+
+def save_part_source(
+    part_file: Path, ftp_size: int | None, ftp_modify: str | None
+) -> None:
+    """Функция save_part_source(part_file, ftp_size, ftp_modify) -> None
+    Записывает рядом с начатой частью part_file размер и время изменения файла
+    на FTP сервере, из которого она скачивается (is_part_source).
+    """
+    with open(get_part_source_file(part_file), "w", encoding="utf-8") as file:
+        json.dump({"size": ftp_size, "modify": ftp_modify}, file)
+
+
+def is_part_source(
+    part_file: Path, ftp_size: int | None, ftp_modify: str | None
+) -> bool:
+    """Функция is_part_source(part_file, ftp_size, ftp_modify) -> bool
+    Скачивалась ли часть part_file из файла FTP сервера с размером ftp_size
+    и временем изменения ftp_modify (сведений нет - неизвестно, значит нет).
+    """
+    try:
+        with open(get_part_source_file(part_file), encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return data == {"size": ftp_size, "modify": ftp_modify}
+
+
+def is_transfer_needed(part_file: Path, offset: int, ftp_size: int | None) -> bool:
+    """Функция is_transfer_needed(part_file: Path, offset: int, ftp_size: int | None) -> bool
+    Проверяет, надо ли обращаться к FTP серверу за данными файла.
+    Не надо, если скачанная ранее часть уже имеет полный размер.
+    """
+    return not part_file.exists() or ftp_size is None or offset < ftp_size
+
+
+def finish_part_file(
+    ftp_file: str,
+    local_subdir: Path,
+    ftp_size: int | None,
+    crc: int | None,
+    crc_value: int,
+) -> bool | None:
+    """Функция finish_part_file(ftp_file, local_subdir, ftp_size, crc, crc_value) -> bool | None
+        Проверяет скачанный файл по размеру и контрольной сумме
+        и при совпадении даёт ему окончательное имя.
+    :param
+        1. ftp_file: str        - Имя файла на FTP сервере
+        2. local_subdir: Path   - Целевая поддиректория
+        3. ftp_size: int        - Размер файла на FTP сервере (None - неизвестен)
+        4. crc: int             - Контрольная сумма из SFV_FILE (None - неизвестна)
+        5. crc_value: int       - Контрольная сумма, вычисленная при скачивании
+    :return:
+        True  - файл скопирован.
+        False - файл не скопирован.
+        None  - контрольная сумма не совпала, файл надо скачать заново.
+    """
+    part_file = get_part_file(local_subdir, ftp_file)
+    local_size = part_file.stat().st_size
+    if ftp_size is not None and local_size != ftp_size:
+        logging.warning(
+            f"Размер файла {ftp_file} на FTP сервере {ftp_size} "
+            f"не совпадает с размером скопированной части {local_size}:\n"
+            f"Файл {ftp_file} не скопирован\n"
+        )
+        if local_size > ftp_size:
+            discard_part_file(part_file)
+        return False
+
+    if crc is not None and crc_value != crc:
+        logging.warning(
+            f"Контрольная сумма файла {ftp_file} {crc_value:08X} "
+            f"не совпадает с контрольной суммой в {c.SFV_FILE} {crc:08X}\n"
+        )
+        discard_part_file(part_file)
+        return None
+
+    part_file.replace(Path(local_subdir, ftp_file))
+    get_part_source_file(part_file).unlink(missing_ok=True)
+    return True
+
+
+def discard_part_file(part_file: Path) -> None:
+    """Функция discard_part_file(part_file: Path) -> None
+    Удаляет скачанную часть и сведения о её источнике.
+    """
+    part_file.unlink(missing_ok=True)
+    get_part_source_file(part_file).unlink(missing_ok=True)
+
+
+@dataclass
+class Segment:
+    """Участок файла, скачиваемый одной сессией.
+    start, end: границы участка, байт (end не входит).
+    position:   до какого байта участок записан.
+    """
+
+    start: int
+    end: int
+    position: int
+
+    @property
+    def done(self) -> bool:
+        return self.position >= self.end
+
+
+class SegmentedFile:
+    """Файл, скачиваемый по участкам несколькими сессиями.
+    Данные пишутся в файл полного размера, место под который выделено заранее
+    (preallocate, суффикс SEGMENT_SUFFIX + PART_SUFFIX): каждая сессия пишет свой участок
+    со своего смещения. Границы участков и записанные байты сохраняются в карте
+    участков (SEGMENT_MAP_SUFFIX + PART_SUFFIX) при окончании работы с участком,
+    поэтому прерванное скачивание продолжается с записанных байтов, если размер
+    и время изменения файла на FTP сервере, сохранённые в карте, не изменились.
+    Когда все участки записаны, файл получает суффикс PART_SUFFIX и проверяется,
+    как скачанный одним потоком (finish_part_file).
+    Если участок один, контрольная сумма вычисляется при записи (get_crc32),
+    и записанный файл не перечитывается.
+    """
+
+    def __init__(
+        self,
+        local_subdir: Path,
+        ftp_file: str,
+        ftp_size: int,
+        count: int,
+        file_metrics: metrics.FileMetrics | None = None,
+        ftp_modify: str | None = None,
+    ):
+        """
+        :param
+            1. local_subdir: Path           - Целевая поддиректория
+            2. ftp_file: str                - Имя файла на FTP сервере
+            3. ftp_size: int                - Размер файла на FTP сервере
+            4. count: int                   - Число участков (если карты участков нет)
+            5. file_metrics: FileMetrics    - Показатели скачивания файла
+            6. ftp_modify: str              - Время изменения файла на FTP сервере
+        """
+        self.ftp_file = ftp_file
+        self.local_subdir = local_subdir
+        self.size = ftp_size
+        self.modify = ftp_modify
+        self.file = Path(local_subdir, ftp_file + c.SEGMENT_SUFFIX + c.PART_SUFFIX)
+        self.map_file = Path(
+            local_subdir, ftp_file + c.SEGMENT_MAP_SUFFIX + c.PART_SUFFIX
+        )
+        self.file_metrics = file_metrics
+        self.stopped = False
+        self._lock = Lock()
+        self.segments = self._load() or self._create(count)
+        self._pending = [segment for segment in self.segments if not segment.done]
+        self._crc_value = 0
+        self._crc_position = 0
+
+    def take(self) -> Segment | None:
+        """Выдаёт сессии следующий незаписанный участок (None - участков нет
+        или скачивание остановлено)."""
+        with self._lock:
+            if self.stopped or not self._pending:
+                return None
+            return self._pending.pop(0)
+
+    def put_back(self, segment: Segment) -> None:
+        """Возвращает недописанный участок (сессия потеряна) и сохраняет карту."""
+        with self._lock:
+            if not segment.done:
+                self._pending.insert(0, segment)
+        self.save()
+
+    def pending(self) -> int:
+        """Сколько участков ещё никто не скачивает."""
+        with self._lock:
+            return len(self._pending)
+
+    def is_complete(self) -> bool:
+        """Записаны ли все участки."""
+        return all(segment.done for segment in self.segments)
+
+    def open(self, segment: Segment):
+        """Файл для записи участка с его недописанной части.
+        Если участок один, а его записанная часть ещё не учтена в контрольной сумме
+        (скачивание продолжается), она читается для вычисления контрольной суммы."""
+        file = open(self.file, "r+b")
+        if len(self.segments) == 1 and self._crc_position != segment.position:
+            self._crc_value = 0
+            self._crc_position = 0
+            while self._crc_position < segment.position:
+                block = file.read(
+                    min(c.COPY_CHUNK_SIZE, segment.position - self._crc_position)
+                )
+                if not block:
+                    break
+                self.written(block)
+        file.seek(segment.position)
+        return file
+
+    def written(self, block: bytes) -> None:
+        """Учитывает записанный блок в контрольной сумме (если участок один)
+        и в показателях файла."""
+        if len(self.segments) == 1:
+            self._crc_value = zlib.crc32(block, self._crc_value)
+            self._crc_position += len(block)
+        if self.file_metrics is not None:
+            with self._lock:
+                self.file_metrics.received(len(block))
+
+    def get_crc32(self) -> int | None:
+        """Контрольная сумма файла, вычисленная при записи
+        (None - участков несколько или файл записан не полностью)."""
+        if len(self.segments) == 1 and self._crc_position == self.size:
+            return self._crc_value
+        return None
+
+    def save(self) -> None:
+        """Сохраняет карту участков."""
+        with self._lock:
+            data = {
+                "size": self.size,
+                "modify": self.modify,
+                "segments": [
+                    [segment.start, segment.position, segment.end]
+                    for segment in self.segments
+                ],
+            }
+            with open(self.map_file, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+
+    def stitch(self) -> Path:
+        """Даёт записанному файлу суффикс PART_SUFFIX и удаляет карту участков.
+        :return: Файл с суффиксом PART_SUFFIX."""
+        part_file = get_part_file(self.local_subdir, self.ftp_file)
+        save_part_source(part_file, self.size, self.modify)
+        self.file.replace(part_file)
+        self.map_file.unlink(missing_ok=True)
+        return part_file
+
+    def discard(self) -> None:
+        """Удаляет файл и карту участков."""
+        self.file.unlink(missing_ok=True)
+        self.map_file.unlink(missing_ok=True)
+
+    def _load(self) -> list[Segment] | None:
+        """Участки по карте, оставшейся от прерванного скачивания
+        (None - карты нет, или она не подходит к файлу)."""
+        try:
+            with open(self.map_file, encoding="utf-8") as file:
+                data = json.load(file)
+            if (
+                data["size"] != self.size
+                or data.get("modify") != self.modify
+                or self.file.stat().st_size != self.size
+            ):
+                return None
+            return [
+                Segment(start, end, position)
+                for start, position, end in data["segments"]
+            ]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _create(self, count: int) -> list[Segment]:
+        """Выделяет файл полного размера (preallocate) и делит его на count участков.
+        Если места на диске нет, возникает MyException до начала скачивания."""
+        try:
+            preallocate(self.file, self.size)
+        except OSError as e:
+            self.file.unlink(missing_ok=True)
+            if e.errno == errno.ENOSPC:
+                raise f.MyException(
+                    f"Нет места на диске для файла {self.ftp_file}\n{e}", 777
+                )
+            raise
+        bounds = [self.size * i // count for i in range(count + 1)]
+        segments = [
+            Segment(start, end, start) for start, end in zip(bounds, bounds[1:])
+        ]
+        self.segments = segments
+        self.save()
+        return segments
+
+
+def get_segment_count(context: DownloadContext, ftp_file: str) -> int:
+    """Функция get_segment_count(context: DownloadContext, ftp_file: str) -> int
+        На сколько участков делить файл при скачивании (SegmentedFile).
+        Место под файлы от PREALLOCATE_MIN_SIZE байт выделяется заранее, поэтому
+        они скачиваются хотя бы одним участком (контрольная сумма единственного
+        участка вычисляется при записи); файлы от SEGMENT_MIN_FILE_SIZE байт
+        делятся на участки не меньше SEGMENT_MIN_SIZE, не больше context.segments.
+        Продолжается и скачивание по участкам, прерванное ранее. Файл, начатый
+        одним потоком, докачивается одним потоком.
+    :return:
+        Число участков или 0, если файл скачивается одним потоком.
+    """
+    ftp_size = context.ftp_file_sizes.get(ftp_file)
+    if ftp_size is None:
+        return 0
+    map_file = Path(
+        context.local_subdir, ftp_file + c.SEGMENT_MAP_SUFFIX + c.PART_SUFFIX
+    )
+    if not map_file.exists():
+        if ftp_size < c.PREALLOCATE_MIN_SIZE:
+            return 0
+        if get_part_offset(
+            get_part_file(context.local_subdir, ftp_file),
+            ftp_size,
+            context.ftp_file_modify.get(ftp_file),
+            sfv.get_crc(context.sfv_crcs, ftp_file),
+        ):
+            return 0
+    if context.segments < 2 or ftp_size < c.SEGMENT_MIN_FILE_SIZE:
+        return 1
+    return max(1, min(context.segments, ftp_size // c.SEGMENT_MIN_SIZE))
+
+
+def get_downloaded_size(local_subdir: Path, ftp_file: str) -> int:
+    """Функция get_downloaded_size(local_subdir: Path, ftp_file: str) -> int
+    Сколько места на диске уже занимает скачиваемый файл: скачанная часть
+    (PART_SUFFIX) или выделенный заранее файл скачивания по участкам.
+    """
+    size = 0
+    for suffix in ("", c.SEGMENT_SUFFIX):
+        try:
+            size = max(
+                size,
+                Path(local_subdir, ftp_file + suffix + c.PART_SUFFIX).stat().st_size,
+            )
+        except OSError:
+            pass
+    return size
+
+
+def preallocate(file: Path, size: int) -> None:
+    """Функция preallocate(file: Path, size: int) -> None
+    Создаёт файл размера size, выделяя место на диске сразу (posix_fallocate):
+    файл меньше фрагментирован, а нехватка места обнаруживается до скачивания.
+    Где posix_fallocate нет или файловая система его не поддерживает, размер
+    файла устанавливается (NTFS при этом выделяет место).
+    """
+    with open(file, "wb") as out:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(out.fileno(), 0, size)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+        out.truncate(size)
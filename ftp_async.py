@@ -0,0 +1,741 @@
+import asyncio
+import logging
+import zlib
+from collections.abc import Iterable
+from ftplib import error_perm, error_reply, error_temp, parse227
+from pathlib import Path
+from threading import Event
+
+import component_functions as f
+import download
+import ftp_pool
+import metrics
+import mirrors
+import rate_limit
+import retry
+import sfv
+from constant import const as c
+
+
+class AsyncFtpSession:
+    """Сессия с FTP сервером на asyncio.
+    Команды, не зависящие от ответа на предыдущую, отправляются пакетом
+    (TYPE + CWD при входе, REST + RETR при скачивании),
+    что экономит время ожидания ответов на медленном канале.
+    """
+
+    def __init__(self):
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self.host = ""
+        self.mirror: str | None = None
+        self._mirror_set: mirrors.MirrorSet | None = None
+
+    async def connect(
+        self,
+        ftp_site: str,
+        ftp_dir: str,
+        user: str,
+        password: str,
+        mirror_set: mirrors.MirrorSet | None = None,
+    ):
+        """Подключается к FTP серверу, входит и переходит в директорию ftp_dir.
+        Если заданы зеркала, подключается к выбранному ими (MirrorSet.choose)
+        вместо ftp_site.
+        """
+        port = c.FTP_PORT
+        if mirror_set is not None:
+            mirror = await asyncio.to_thread(mirror_set.choose, ftp_dir)
+            ftp_site, port = mirror.host, mirror.port
+            self.mirror = mirror.name
+            self._mirror_set = mirror_set
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(ftp_site, port), c.TIME_OUT_SEC
+        )
+        self.host = self.writer.get_extra_info("peername")[0]
+        check_reply(await self.read_reply())
+        (reply,) = await self.pipeline(f"USER {user}")
+        if reply.startswith("3"):
+            await self.pipeline(f"PASS {password}")
+        await self.pipeline("TYPE I", f"CWD {ftp_dir}")
+
+    def report(self, ok: bool) -> None:
+        """Сообщает зеркалу сессии исход работы (MirrorSet.succeeded / failed)."""
+        if self._mirror_set is not None:
+            if ok:
+                self._mirror_set.succeeded(self.mirror)
+            else:
+                self._mirror_set.failed(self.mirror)
+
+    async def quit(self) -> None:
+        """Закрывает сессию. Ошибки закрытия игнорируются."""
+        if self._mirror_set is not None:
+            self._mirror_set.closed(self.mirror)
+            self._mirror_set = None
+        if self.writer is None:
+            return
+        try:
+            await asyncio.wait_for(self.pipeline("QUIT"), c.TIME_OUT_SEC)
+        except Exception:
+            pass
+        self.writer.close()
+        self.writer = None
+
+    async def size(self, ftp_file: str) -> int | None:
+        """Размер файла на FTP сервере (команда SIZE) или None."""
+        try:
+            (reply,) = await self.pipeline(f"SIZE {ftp_file}")
+            return int(reply[3:].strip())
+        except (error_perm, error_temp, ValueError):
+            return None
+
+    async def pipeline(self, *commands: str) -> list[str]:
+        """Отправляет команды пакетом и читает ответы на них по порядку.
+        Если какой-либо ответ - ошибка, исключение возникает после чтения всех ответов.
+        """
+        for command in commands:
+            self.writer.write(f"{command}\r\n".encode(c.FTP_ENCODING))
+        await self.writer.drain()
+        replies = [await self.read_reply() for _ in commands]
+        for reply in replies:
+            check_reply(reply)
+        return replies
+
+    async def read_reply(self) -> str:
+        """Читает ответ FTP сервера (в том числе многострочный)."""
+        reply = await self._read_line()
+        if reply[3:4] == "-":
+            code = reply[:3]
+            while True:
+                line = await self._read_line()
+                reply += "\n" + line
+                if line[:3] == code and line[3:4] != "-":
+                    break
+        return reply
+
+    async def retrieve(self, ftp_file: str, offset: int, sink: "PartFileSink"):
+        """Скачивает файл с байта offset в приёмник sink.
+        Если сервер не поддерживает докачку (REST отклонён с кодом из FTP_REST_REFUSED),
+        файл принимается с начала. Другой ответ на REST - ошибка сессии: скачанная
+        часть сохраняется, и следующая попытка продолжает с неё.
+        """
+        (reply,) = await self.pipeline("PASV")
+        _, port = parse227(reply)
+        data_reader, data_writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, port), c.TIME_OUT_SEC
+        )
+        try:
+            commands = ([f"REST {offset}"] if offset else []) + [f"RETR {ftp_file}"]
+            for command in commands:
+                self.writer.write(f"{command}\r\n".encode(c.FTP_ENCODING))
+            await self.writer.drain()
+            if offset:
+                reply = await self.read_reply()
+                if not reply.startswith("3") and reply[:3] not in c.FTP_REST_REFUSED:
+                    # RETR уже отправлен: если передача началась, она прерывается,
+                    # ответ на неё дочитывается
+                    if (await self.read_reply()).startswith("1"):
+                        data_writer.close()
+                        await self.read_reply()
+                    check_reply(reply)
+                    raise error_reply(reply)
+                if not reply.startswith("3"):
+                    logging.info(
+                        f"FTP сервер не поддерживает докачку:\n"
+                        f"Файл {ftp_file} копируется заново\n"
+                    )
+                    await sink.restart()
+            check_reply(await self.read_reply())
+            await sink.receive(data_reader)
+        finally:
+            data_writer.close()
+        check_reply(await self.read_reply())
+
+    async def retrieve_segment(
+        self,
+        segmented: download.SegmentedFile,
+        segment: download.Segment,
+        stop: Event,
+        control: rate_limit.TransferControl | None = None,
+    ) -> None:
+        """Скачивает участок файла с его недописанной части (REST + RETR).
+        Дочитав участок, прерывает передачу данных и читает ответ сервера на неё.
+        """
+        (reply,) = await self.pipeline("PASV")
+        _, port = parse227(reply)
+        data_reader, data_writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, port), c.TIME_OUT_SEC
+        )
+        try:
+            commands = [f"RETR {segmented.ftp_file}"]
+            if segment.position:
+                commands.insert(0, f"REST {segment.position}")
+            for command in commands:
+                self.writer.write(f"{command}\r\n".encode(c.FTP_ENCODING))
+            await self.writer.drain()
+            replies = [await self.read_reply() for _ in commands]
+            try:
+                for reply in replies:
+                    check_reply(reply)
+            except (error_perm, error_temp):
+                # REST отклонён, а RETR уже начал передачу с начала файла:
+                # она прерывается, ответ на неё дочитывается
+                if replies[-1].startswith("1"):
+                    data_writer.close()
+                    await self.read_reply()
+                raise
+            if segmented.file_metrics is not None:
+                segmented.file_metrics.request()
+            file = await asyncio.to_thread(segmented.open, segment)
+            with file:
+                while not segment.done:
+                    if stop.is_set():
+                        raise f.MyException("Программа прервана оператором", 1000)
+                    block = await asyncio.wait_for(
+                        data_reader.read(
+                            min(c.SEGMENT_BLOCK_SIZE, segment.end - segment.position)
+                        ),
+                        c.TIME_OUT_SEC,
+                    )
+                    if not block:
+                        break
+                    await asyncio.to_thread(file.write, block)
+                    segment.position += len(block)
+                    segmented.written(block)
+                    if control is not None:
+                        delay = control.transferred(len(block))
+                        if delay:
+                            await asyncio.sleep(delay)
+        finally:
+            data_writer.close()
+        try:
+            check_reply(await self.read_reply())
+        except (error_perm, error_temp):
+            # Передача прервана до конца файла - ответ 426 или подобный ожидаем
+            if not segment.done:
+                raise
+        if not segment.done:
+            raise EOFError(
+                f"Передача файла {segmented.ftp_file} закончилась до конца участка"
+            )
+
+    async def _read_line(self) -> str:
+        line = await asyncio.wait_for(self.reader.readline(), c.TIME_OUT_SEC)
+        if not line:
+            raise EOFError("FTP сервер закрыл соединение")
+        return line.decode(c.FTP_ENCODING, errors="replace").rstrip("\r\n")
+
+
+class PartFileSink:
+    """Приёмник данных скачиваемого файла.
+    Блоки из сети передаются на запись в файл через очередь ограниченного размера:
+    пока диск не успевает, данные из сети не читаются.
+    По ходу записи вычисляется контрольная сумма CRC32.
+    """
+
+    def __init__(
+        self,
+        part_file: Path,
+        offset: int,
+        crc_value: int,
+        stop: Event,
+        control: rate_limit.TransferControl | None = None,
+        file_metrics: metrics.FileMetrics | None = None,
+    ):
+        self.file = open(part_file, "ab" if offset else "wb")
+        self.crc_value = crc_value
+        self.stop = stop
+        self.control = control
+        self.file_metrics = file_metrics
+        self.count_blocks = 0
+        self.error: Exception | None = None
+
+    async def restart(self) -> None:
+        """Начинает файл заново."""
+        await asyncio.to_thread(self.file.truncate, 0)
+        self.crc_value = 0
+
+    async def receive(self, data_reader: asyncio.StreamReader) -> None:
+        """Читает данные из соединения и записывает их в файл."""
+        queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=c.ASYNC_WRITE_QUEUE)
+        writer = asyncio.create_task(self._write(queue))
+        try:
+            while self.error is None:
+                if self.stop.is_set():
+                    raise f.MyException("Программа прервана оператором", 1000)
+                block = await asyncio.wait_for(
+                    data_reader.read(c.ASYNC_CHUNK_SIZE), c.TIME_OUT_SEC
+                )
+                await queue.put(block)
+                if not block:
+                    break
+                if self.file_metrics is not None:
+                    self.file_metrics.received(len(block))
+                await self._throttle(len(block))
+            else:
+                await queue.put(b"")
+            await writer
+        finally:
+            writer.cancel()
+        if self.error is not None:
+            raise self.error
+
+    def close(self) -> None:
+        self.file.close()
+
+    async def _throttle(self, size: int) -> None:
+        # Ограничение скорости и вывод его состояния
+        if self.control is None:
+            return
+        delay = self.control.transferred(size)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.count_blocks == 0:
+            print(f"\r{self.control.status()}", end="")
+        self.count_blocks = (self.count_blocks + 1) % c.PRINTING_RATIO
+
+    async def _write(self, queue: asyncio.Queue) -> None:
+        # После ошибки записи очередь дочитывается, чтобы не остановить чтение из сети
+        while block := await queue.get():
+            if self.error is not None:
+                continue
+            try:
+                await asyncio.to_thread(self.file.write, block)
+            except OSError as e:
+                self.error = e
+                continue
+            self.crc_value = zlib.crc32(block, self.crc_value)
+
+
+def check_reply(reply: str) -> str:
+    """Функция check_reply(reply: str) -> str
+        Проверяет ответ FTP сервера так же, как ftplib.
+    :return:
+        Ответ, если он не является ошибкой.
+    """
+    if reply[:1] == "4":
+        raise error_temp(reply)
+    if reply[:1] == "5":
+        raise error_perm(reply)
+    if reply[:1] not in "123":
+        raise error_reply(reply)
+    return reply
+
+
+def download_files(
+    ftp_files: Iterable[str],
+    context: download.DownloadContext,
+    pool: ftp_pool.FtpSessionPool,
+) -> tuple[int, int]:
+    """Функция download_files(ftp_files, context, pool) -> tuple[int, int]
+    Скачивает файлы с FTP сервера в поддиректорию NEW механизмом asyncio.
+    Все сессии и передачи данных работают в одном цикле событий.
+    Аргументы и результат - как у path_ftp.download_files.
+    """
+    return asyncio.run(download_all(ftp_files, context, pool))
+
+
+async def download_all(
+    ftp_files: Iterable[str],
+    context: download.DownloadContext,
+    pool: ftp_pool.FtpSessionPool,
+) -> tuple[int, int]:
+    """Функция download_all(ftp_files, context, pool) -> tuple[int, int]
+    Запускает не больше pool.size сессий, выбирающих файлы из общей очереди.
+    Файлы ставятся в очередь по мере их выдачи ftp_files в отдельном потоке
+    (конвейер плана читает директорию блокирующими вызовами ftplib),
+    конец очереди отмечается для каждой сессии значением None.
+    """
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    count = len(ftp_files) if isinstance(ftp_files, list) else pool.size
+    workers = [
+        asyncio.create_task(download_worker(queue, context, pool))
+        for _ in range(max(1, min(pool.size, count)))
+    ]
+
+    def put_files() -> None:
+        try:
+            for ftp_file in ftp_files:
+                if context.stop.is_set():
+                    break
+                context.schedule([ftp_file])
+                loop.call_soon_threadsafe(queue.put_nowait, ftp_file)
+        finally:
+            for _ in workers:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    try:
+        await asyncio.to_thread(put_files)
+    finally:
+        await asyncio.gather(*workers)
+    return context.counts["copied"], context.counts["not_copied"]
+
+
+async def acquire_slot(pool: ftp_pool.FtpSessionPool, stop: Event) -> bool:
+    """Функция acquire_slot(pool: FtpSessionPool, stop: Event) -> bool
+    Занимает место в пределе параллельной работы пула, не блокируя цикл событий.
+    :return:
+        True - место занято, False - работа прервана оператором.
+    """
+    while not pool.acquire_slot(blocking=False):
+        if stop.is_set():
+            return False
+        await asyncio.sleep(c.ASYNC_SLOT_POLL_SEC)
+    return True
+
+
+async def wait_stop(stop: Event, delay: float) -> bool:
+    """Функция wait_stop(stop: Event, delay: float) -> bool
+    Пауза delay секунд, прерываемая остановкой (как Event.wait в path_ftp),
+    не блокирующая цикл событий.
+    :return:
+        True - работа прервана оператором, False - пауза истекла.
+    """
+    deadline = asyncio.get_running_loop().time() + delay
+    while not stop.is_set():
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(remaining, c.ASYNC_SLOT_POLL_SEC))
+    return True
+
+
+async def download_worker(
+    queue: asyncio.Queue,
+    context: download.DownloadContext,
+    pool: ftp_pool.FtpSessionPool,
+) -> None:
+    """Функция download_worker(queue, context, pool) -> None
+    Сессия скачивания. Выбирает файлы из очереди и копирует их.
+    На время копирования файла занимает место в пределе пула,
+    общем для всех заданий программы.
+    После неудачного копирования сессия открывается заново.
+    """
+    session = None
+    try:
+        while not context.stop.is_set():
+            ftp_file = await queue.get()
+            if ftp_file is None:
+                break
+            if not await acquire_slot(pool, context.stop):
+                break
+
+            copied = False
+            try:
+                copied, session = await copy_with_retry(
+                    session, ftp_file, context, pool
+                )
+            except f.MyException as e:
+                if not context.stop.is_set():
+                    logging.warning(f"{e.text_err}\nФайл {ftp_file} не скопирован\n")
+            finally:
+                pool.release_slot()
+
+            if context.stop.is_set():
+                break
+            context.count(copied)
+    finally:
+        if session is not None:
+            await session.quit()
+
+
+async def copy_with_retry(
+    session: AsyncFtpSession | None,
+    ftp_file: str,
+    context: download.DownloadContext,
+    pool: ftp_pool.FtpSessionPool | None = None,
+) -> tuple[bool, AsyncFtpSession | None]:
+    """Функция copy_with_retry(session, ftp_file, context, pool) -> tuple[bool, AsyncFtpSession | None]
+    Копирует файл, повторяя попытку в новой сессии при потере сессии
+    с FTP сервером - как у path_ftp.copy_with_retry. Файл от PREALLOCATE_MIN_SIZE
+    байт копируется по участкам (copy_segmented), дополнительные сессии
+    занимают места пула pool.
+    :return:
+        (True - если файл скопирован успешно, Сессия для следующего файла или None)
+    """
+    file_metrics = context.new_file_metrics(ftp_file)
+    copied = False
+    try:
+        for attempt in range(1, c.RETRY_ATTEMPTS + 1):
+            if file_metrics is not None:
+                file_metrics.attempts = attempt
+            if attempt > 1:
+                context.add("retries")
+                if await wait_stop(context.stop, retry.get_backoff_delay(attempt - 1)):
+                    return False, session
+
+            if session is None:
+                session = AsyncFtpSession()
+                try:
+                    await session.connect(
+                        c.FTP_SITE,
+                        context.ftp_dir,
+                        c.USER,
+                        c.PASSWORD,
+                        context.mirror_set,
+                    )
+                except Exception as e:
+                    await session.quit()
+                    if session.mirror is not None:
+                        context.mirror_set.unavailable(session.mirror)
+                    session = None
+                    logging.warning(
+                        f"Ошибка при доступе к FTP серверу\n {e}\n"
+                        f"Файл {ftp_file}: попытка {attempt} из {c.RETRY_ATTEMPTS} не удалась\n"
+                    )
+                    continue
+
+            try:
+                count = download.get_segment_count(context, ftp_file)
+                if count and pool is not None:
+                    copied = await copy_segmented(
+                        session, ftp_file, context, count, pool, file_metrics
+                    )
+                else:
+                    copied = await copy_from_ftp_file(
+                        session, ftp_file, context, file_metrics
+                    )
+            except f.MyException:
+                raise
+            except Exception as err:
+                session.report(ok=False)
+                await session.quit()
+                session = None
+                logging.warning(
+                    f"Сессия с FTP сервером потеряна: {err!r}\n"
+                    f"Файл {ftp_file}: попытка {attempt} из {c.RETRY_ATTEMPTS} не удалась\n"
+                )
+                if attempt < c.RETRY_ATTEMPTS:
+                    context.add("reconnects")
+                continue
+
+            # Файл не скопирован не по вине сессии (контрольная сумма, 550, остановка)
+            session.report(ok=True)
+            if not copied:
+                await session.quit()
+                session = None
+            return copied, session
+
+        logging.warning(
+            f"Файл {ftp_file} не скопирован: попытки исчерпаны ({c.RETRY_ATTEMPTS})\n"
+        )
+        return False, session
+    finally:
+        if file_metrics is not None:
+            file_metrics.finish(copied)
+        context.settle(ftp_file, file_metrics)
+
+
+async def copy_from_ftp_file(
+    session: AsyncFtpSession,
+    ftp_file: str,
+    context: download.DownloadContext,
+    file_metrics: metrics.FileMetrics | None = None,
+) -> bool:
+    """Функция copy_from_ftp_file(session, ftp_file, context, file_metrics) -> bool
+        Копирует файл в поддиректорию NEW.
+        Докачка, проверка размера и контрольной суммы - как у path_ftp.copy_from_ftp_file.
+        Ошибки потери сессии передаются вызывающей функции (copy_with_retry).
+    :return:
+        True - если файл скопирован успешно, False - если не скопирован.
+    """
+    print(f"\rкопируем файл {ftp_file}")
+
+    part_file = download.get_part_file(context.local_subdir, ftp_file)
+    ftp_size = context.ftp_file_sizes.get(ftp_file)
+    crc = sfv.get_crc(context.sfv_crcs, ftp_file)
+    ftp_modify = context.ftp_file_modify.get(ftp_file)
+    try:
+        if ftp_size is None:
+            ftp_size = await session.size(ftp_file)
+
+        for _ in range(c.CRC_RETRIES + 1):
+            offset = download.get_part_offset(part_file, ftp_size, ftp_modify, crc)
+            crc_value = (
+                await asyncio.to_thread(sfv.file_crc32, part_file)
+                if offset and crc is not None
+                else 0
+            )
+
+            if download.is_transfer_needed(part_file, offset, ftp_size):
+                if not offset:
+                    download.save_part_source(part_file, ftp_size, ftp_modify)
+                sink = PartFileSink(
+                    part_file,
+                    offset,
+                    crc_value,
+                    context.stop,
+                    context.control,
+                    file_metrics,
+                )
+                if file_metrics is not None:
+                    file_metrics.request()
+                try:
+                    await session.retrieve(ftp_file, offset, sink)
+                finally:
+                    sink.close()
+                crc_value = sink.crc_value
+
+            finished = download.finish_part_file(
+                ftp_file, context.local_subdir, ftp_size, crc, crc_value
+            )
+            if finished is not None:
+                return finished
+
+        logging.warning(f"Файл {ftp_file} не скопирован\n")
+        return False
+    except f.MyException:
+        raise
+    except Exception as err:
+        if retry.is_session_error(err):
+            raise
+        logging.warning(
+            f"Произошла ошибка при копировании {err}:\nФайл {ftp_file} не скопирован\n"
+        )
+        return False
+
+
+async def copy_segmented(
+    session: AsyncFtpSession,
+    ftp_file: str,
+    context: download.DownloadContext,
+    count: int,
+    pool: ftp_pool.FtpSessionPool,
+    file_metrics: metrics.FileMetrics | None = None,
+) -> bool:
+    """Функция copy_segmented(session, ftp_file, context, count, pool, file_metrics) -> bool
+        Копирует файл по участкам - как path_ftp.copy_segmented:
+        участки по очереди скачивает сессия session, а пока есть участки, которые
+        никто не скачивает, свободные места пула занимают дополнительные сессии
+        (segment_helper).
+        Ошибки потери сессии передаются вызывающей функции (copy_with_retry).
+    :return:
+        True - если файл скопирован успешно, False - если не скопирован.
+    """
+    print(f"\rкопируем файл {ftp_file}" + (" по участкам" if count > 1 else ""))
+
+    ftp_size = context.ftp_file_sizes[ftp_file]
+    crc = sfv.get_crc(context.sfv_crcs, ftp_file)
+    try:
+        for _ in range(c.CRC_RETRIES + 1):
+            segmented = download.SegmentedFile(
+                context.local_subdir,
+                ftp_file,
+                ftp_size,
+                count,
+                file_metrics,
+                ftp_modify=context.ftp_file_modify.get(ftp_file),
+            )
+            helpers = []
+            rest_refused = False
+            try:
+                while True:
+                    segment = segmented.take()
+                    if segment is None:
+                        await asyncio.gather(*helpers)
+                        helpers = []
+                        if not segmented.pending():
+                            break
+                        continue
+                    running = sum(not helper.done() for helper in helpers)
+                    for _ in range(segmented.pending() - running):
+                        if not pool.acquire_slot(blocking=False):
+                            break
+                        helpers.append(
+                            asyncio.create_task(
+                                segment_helper(segmented, context, pool)
+                            )
+                        )
+                    try:
+                        await session.retrieve_segment(
+                            segmented, segment, context.stop, context.control
+                        )
+                    except error_perm as err:
+                        segmented.put_back(segment)
+                        if str(err)[:3] not in c.FTP_REST_REFUSED:
+                            raise
+                        rest_refused = True
+                        break
+                    except BaseException:
+                        segmented.put_back(segment)
+                        raise
+            finally:
+                segmented.stopped = True
+                await asyncio.gather(*helpers)
+                segmented.save()
+
+            if rest_refused:
+                logging.info(
+                    f"FTP сервер не поддерживает докачку:\n"
+                    f"Файл {ftp_file} копируется одним потоком\n"
+                )
+                segmented.discard()
+                return await copy_from_ftp_file(
+                    session, ftp_file, context, file_metrics
+                )
+            if not segmented.is_complete():
+                logging.warning(f"Файл {ftp_file} не скопирован\n")
+                return False
+            part_file = segmented.stitch()
+            crc_value = segmented.get_crc32()
+            if crc_value is None:
+                crc_value = (
+                    await asyncio.to_thread(sfv.file_crc32, part_file)
+                    if crc is not None
+                    else 0
+                )
+            finished = download.finish_part_file(
+                ftp_file, context.local_subdir, ftp_size, crc, crc_value
+            )
+            if finished is not None:
+                return finished
+
+        logging.warning(f"Файл {ftp_file} не скопирован\n")
+        return False
+    except f.MyException:
+        raise
+    except Exception as err:
+        if retry.is_session_error(err):
+            raise
+        logging.warning(
+            f"Произошла ошибка при копировании {err}:\nФайл {ftp_file} не скопирован\n"
+        )
+        return False
+
+
+async def segment_helper(
+    segmented: download.SegmentedFile,
+    context: download.DownloadContext,
+    pool: ftp_pool.FtpSessionPool,
+) -> None:
+    """Функция segment_helper(segmented, context, pool) -> None
+    Дополнительная сессия на место пула, уже занятое вызывающей функцией:
+    скачивает участки файла, пока они есть, затем закрывается и освобождает место.
+    При ошибке участок возвращается (его докачает другая сессия).
+    """
+    session = AsyncFtpSession()
+    ok = True
+    try:
+        await session.connect(
+            c.FTP_SITE, context.ftp_dir, c.USER, c.PASSWORD, context.mirror_set
+        )
+        while (segment := segmented.take()) is not None:
+            try:
+                await session.retrieve_segment(
+                    segmented, segment, context.stop, context.control
+                )
+            except BaseException:
+                segmented.put_back(segment)
+                raise
+    except Exception as err:
+        ok = False
+        if not context.stop.is_set():
+            logging.info(
+                f"Дополнительная сессия для файла {segmented.ftp_file} "
+                f"потеряна: {err!r}"
+            )
+    finally:
+        session.report(ok)
+        await session.quit()
+        pool.release_slot()
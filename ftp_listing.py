@@ -0,0 +1,285 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from ftplib import FTP, error_perm, error_proto, error_temp
+from socket import socket
+from typing import Iterable, Iterator
+
+from constant import const as c
+
+
+@dataclass(frozen=True, slots=True)
+class FtpEntry:
+    """Элемент директории FTP сервера.
+    name:   имя файла.
+    size:   размер файла в байтах.
+    modify: время изменения в формате YYYYMMDDHHMMSS (None - если неизвестно).
+    type:   тип элемента: FILE_TYPE, DIR_TYPE или LINK_TYPE.
+    """
+
+    name: str
+    size: int
+    modify: str | None
+    type: str
+
+
+FILE_TYPE = "file"
+DIR_TYPE = "dir"
+LINK_TYPE = "link"
+
+RE_UNIX_LINE = re.compile(
+    r"""^(?P<kind>[-dlbcps])\S{9}\S*\s+   # права доступа
+        .*?\s(?P<size>\d+)\s+               # ссылки, владелец, группа, размер
+        (?P<month>[A-Za-z]{3})\s+(?P<day>\d{1,2})\s+
+        (?P<time>\d{1,2}:\d{2}|\d{4})\s     # время или год
+        (?P<name>.+)$""",
+    re.VERBOSE,
+)
+RE_DOS_LINE = re.compile(
+    r"""^(?P<date>\d{2}-\d{2}-\d{2,4})\s+
+        (?P<time>\d{1,2}:\d{2}[AaPp][Mm])\s+
+        (?P<size><DIR>|\d+)\s+
+        (?P<name>.+)$""",
+    re.VERBOSE,
+)
+
+
+def get_listing(ftp: FTP) -> dict[str, FtpEntry]:
+    """Функция get_listing(ftp: FTP) -> dict[str, FtpEntry]
+        Читает текущую директорию FTP сервера одним запросом (iter_listing).
+    :param
+        ftp: FTP сервер
+    :return:
+        Словарь: имя -> элемент директории.
+    """
+    return {entry.name: entry for entry in iter_listing(ftp)}
+
+
+def iter_listing(ftp: FTP) -> Iterator[FtpEntry]:
+    """Функция iter_listing(ftp: FTP) -> Iterator[FtpEntry]
+        Читает текущую директорию FTP сервера одним запросом и выдаёт её элементы
+        по мере поступления строк ответа, не накапливая их в памяти.
+        Используется команда MLSD, а если сервер её не поддерживает - LIST.
+        Строки, формат которых не распознан, пропускаются.
+        Сессию можно использовать снова только после того, как элементы
+        прочитаны до конца или генератор закрыт.
+    :param
+        ftp: FTP сервер
+    :return:
+        Элементы директории в порядке ответа сервера.
+    """
+    try:
+        ftp.sendcmd("OPTS MLST type;size;modify;")
+    except (error_perm, error_temp):
+        pass
+    try:
+        lines = iter_lines(ftp, "MLSD")
+        parse_line = parse_mlsd_line
+    except (error_perm, error_temp):
+        lines = iter_lines(ftp, "LIST")
+        parse_line = parse_list_line
+    for line in lines:
+        entry = parse_line(line)
+        if entry:
+            yield entry
+
+
+def iter_lines(ftp: FTP, cmd: str) -> Iterator[str]:
+    """Функция iter_lines(ftp: FTP, cmd: str) -> Iterator[str]
+    Выполняет команду cmd с передачей данных в режиме ASCII (как ftp.retrlines)
+    и выдаёт строки ответа по мере их поступления.
+    Команда отправляется сразу, так что отказ сервера выполнить её
+    (error_perm, error_temp) возникает при вызове, а не при чтении строк.
+    Если генератор закрыт до конца ответа, соединение данных закрывается
+    и ответ сервера на прерванную передачу читается.
+    """
+    ftp.sendcmd("TYPE A")
+    conn = ftp.transfercmd(cmd)
+    return read_lines(ftp, conn)
+
+
+def read_lines(ftp: FTP, conn: socket) -> Iterator[str]:
+    """Функция read_lines(ftp: FTP, conn: socket) -> Iterator[str]
+    Строки соединения данных conn команды iter_lines, затем ответ сервера.
+    """
+    try:
+        with conn, conn.makefile("r", encoding=ftp.encoding) as file:
+            while line := file.readline(ftp.maxline + 1):
+                if len(line) > ftp.maxline:
+                    raise error_proto(f"got more than {ftp.maxline} bytes")
+                yield line.rstrip("\r\n")
+    except BaseException:
+        try:
+            ftp.voidresp()
+        except (error_temp, error_proto, OSError):
+            pass
+        raise
+    ftp.voidresp()
+
+
+def parse_mlsd_line(line: str) -> FtpEntry | None:
+    """Функция parse_mlsd_line(line: str) -> FtpEntry | None
+        Разбирает строку ответа на команду MLSD: "факт=значение;...; имя".
+        Текущая и родительская директории (cdir, pdir) пропускаются.
+    :param
+        line: str - строка ответа FTP сервера
+    :return:
+        Элемент директории или None, если строка не является элементом.
+    """
+    facts_found, _, name = line.partition(" ")
+    facts = dict()
+    for fact in facts_found[:-1].split(";"):
+        key, _, value = fact.partition("=")
+        facts[key.lower()] = value
+    kind = facts.get("type", "").lower()
+    if not name or kind in ("cdir", "pdir"):
+        return None
+    if kind == "file":
+        kind = FILE_TYPE
+    elif kind == "dir":
+        kind = DIR_TYPE
+    else:
+        kind = LINK_TYPE
+    modify = facts.get("modify")
+    try:
+        size = int(facts.get("size", 0))
+    except ValueError:
+        size = 0
+    return FtpEntry(
+        name=name,
+        size=size,
+        modify=modify[:14] if modify else None,
+        type=kind,
+    )
+
+
+def parse_list_line(line: str, now: datetime | None = None) -> FtpEntry | None:
+    """Функция parse_list_line(line: str, now: datetime | None = None) -> FtpEntry | None
+        Разбирает строку ответа на команду LIST.
+        Поддерживаются форматы UNIX (ls -l) и DOS (IIS).
+    :param
+        1. line: str        - строка ответа FTP сервера
+        2. now: datetime    - текущее время, для определения года в формате UNIX
+    :return:
+        Элемент директории или None, если строка не распознана.
+    """
+    res_match = RE_UNIX_LINE.match(line)
+    if res_match:
+        name = res_match.group("name")
+        kind = res_match.group("kind")
+        if kind == "d":
+            kind = DIR_TYPE
+        elif kind == "l":
+            kind = LINK_TYPE
+            name = name.split(" -> ", 1)[0]
+        elif kind == "-":
+            kind = FILE_TYPE
+        else:
+            return None
+        if name in (".", ".."):
+            return None
+        return FtpEntry(
+            name=name,
+            size=int(res_match.group("size")),
+            modify=unix_time_to_modify(
+                res_match.group("month"),
+                res_match.group("day"),
+                res_match.group("time"),
+                now or datetime.now(),
+            ),
+            type=kind,
+        )
+
+    res_match = RE_DOS_LINE.match(line)
+    if res_match:
+        size = res_match.group("size")
+        try:
+            modify = datetime.strptime(
+                f"{res_match.group('date')} {res_match.group('time').upper()}",
+                (
+                    "%m-%d-%y %I:%M%p"
+                    if len(res_match.group("date")) == 8
+                    else "%m-%d-%Y %I:%M%p"
+                ),
+            ).strftime(c.FTP_MODIFY_FORMAT)
+        except ValueError:
+            modify = None
+        return FtpEntry(
+            name=res_match.group("name"),
+            size=0 if size == "<DIR>" else int(size),
+            modify=modify,
+            type=DIR_TYPE if size == "<DIR>" else FILE_TYPE,
+        )
+
+    return None
+
+
+def unix_time_to_modify(month: str, day: str, time: str, now: datetime) -> str | None:
+    """Функция unix_time_to_modify(month, day, time, now) -> str | None
+        Преобразует дату из строки формата UNIX в формат YYYYMMDDHHMMSS.
+        Если вместо года указано время, то год - текущий,
+        а если такая дата ещё не наступила - предыдущий.
+    :return:
+        Дата в формате YYYYMMDDHHMMSS или None, если дата не распознана.
+    """
+    try:
+        if ":" in time:
+            date = datetime.strptime(
+                f"{now.year} {month} {day} {time}", "%Y %b %d %H:%M"
+            )
+            if date - now > timedelta(days=1):
+                date = date.replace(year=now.year - 1)
+        else:
+            date = datetime.strptime(f"{time} {month} {day}", "%Y %b %d")
+    except ValueError:
+        return None
+    return date.strftime(c.FTP_MODIFY_FORMAT)
+
+
+def get_dir_modify(ftp: FTP, ftp_dir: str) -> str | None:
+    """Функция get_dir_modify(ftp: FTP, ftp_dir: str) -> str | None
+        Время изменения директории FTP сервера (команда MDTM).
+        Время директории меняется при появлении, удалении и переименовании файлов.
+    :param
+        1. ftp: FTP         - FTP сервер
+        2. ftp_dir: str     - Директория FTP сервера
+    :return:
+        Время в формате YYYYMMDDHHMMSS или None, если сервер не сообщает время директорий.
+    """
+    try:
+        reply = ftp.sendcmd("MDTM " + ftp_dir)
+    except (error_perm, error_temp):
+        return None
+    modify = reply[3:].strip()[:14]
+    return modify if modify.isdigit() else None
+
+
+def get_listing_digest(listing: dict[str, FtpEntry]) -> str:
+    """Функция get_listing_digest(listing: dict[str, FtpEntry]) -> str
+    Отпечаток снимка директории FTP сервера: совпадает у снимков
+    с одинаковыми именами, размерами, временами и типами элементов.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(listing):
+        entry = listing[name]
+        digest.update(f"{name}\0{entry.size}\0{entry.modify}\0{entry.type}\n".encode())
+    return digest.hexdigest()
+
+
+def get_file_sizes(listing: dict[str, FtpEntry]) -> dict[str, int]:
+    """Функция get_file_sizes(listing: dict[str, FtpEntry]) -> dict[str, int]
+        Выбирает из снимка директории FTP сервера файлы и их размеры.
+    :param
+        listing: снимок директории FTP сервера
+    :return:
+        Словарь: имя файла -> размер файла.
+    """
+    return {entry.name: entry.size for entry in iter_files(listing.values())}
+
+
+def iter_files(entries: Iterable[FtpEntry]) -> Iterator[FtpEntry]:
+    """Функция iter_files(entries: Iterable[FtpEntry]) -> Iterator[FtpEntry]
+    Выбирает файлы из элементов директории FTP сервера по мере их поступления.
+    """
+    return (entry for entry in entries if entry.type == FILE_TYPE)
@@ -0,0 +1,155 @@
+from contextlib import contextmanager
+from ftplib import FTP
+from threading import Condition, Lock
+from typing import Callable
+
+
+class FtpSessionPool:
+    """Общий пул сессий с FTP сервером (его зеркалами).
+    Одновременно выдаётся не более size сессий - это общий предел
+    параллельной работы с FTP сервером для всех заданий программы.
+    Освобождённые сессии не закрываются, а выдаются следующим запросам,
+    при необходимости со сменой директории FTP сервера.
+    Сессия, освобождённая как неисправная, закрывается; вместо неё открывается новая.
+    Предел limit (не больше size) можно менять по ходу работы (set_limit).
+    Если заданы зеркала, пулу сообщаются исход работы и закрытие сессий,
+    а свободная сессия с исключённым или несверенным зеркалом не выдаётся.
+    """
+
+    def __init__(self, size: int, connect: Callable[[str], FTP], mirrors=None):
+        """
+        :param
+            1. size: int                        - Предел одновременно выданных сессий
+            2. connect: Callable[[str], FTP]    - Открывает сессию в директории FTP сервера
+            3. mirrors: MirrorSet | None        - Зеркала FTP сервера (mirrors.MirrorSet)
+        """
+        self.size = size
+        self.limit = size
+        self.active = 0
+        self.mirrors = mirrors
+        self._connect = connect
+        self._slots = Condition()
+        self._idle: list[tuple[FTP, str]] = []
+        self._lock = Lock()
+
+    def acquire(self, ftp_dir: str, blocking: bool = True) -> FTP | None:
+        """Выдаёт сессию, текущая директория которой - ftp_dir.
+        Ждёт, пока число выданных сессий не станет меньше предела
+        (blocking=False - не ждёт и возвращает None).
+        """
+        if not self.acquire_slot(blocking):
+            return None
+        try:
+            ftp, current_dir = self._take_idle(ftp_dir)
+            if ftp is None:
+                return self._connect(ftp_dir)
+            if self.mirrors is not None and not self.mirrors.accepts(
+                get_mirror_name(ftp), ftp_dir
+            ):
+                self._close(ftp)
+                return self._connect(ftp_dir)
+            if current_dir != ftp_dir:
+                try:
+                    ftp.cwd(ftp_dir)
+                except Exception:
+                    self._close(ftp)
+                    return self._connect(ftp_dir)
+            return ftp
+        except BaseException:
+            self.release_slot()
+            raise
+
+    def release(self, ftp: FTP, ftp_dir: str, broken: bool = False) -> None:
+        """Возвращает сессию в пул. Неисправная сессия закрывается."""
+        if self.mirrors is not None:
+            if broken:
+                self.mirrors.failed(get_mirror_name(ftp))
+            else:
+                self.mirrors.succeeded(get_mirror_name(ftp))
+        if broken:
+            self._close(ftp)
+        else:
+            with self._lock:
+                self._idle.append((ftp, ftp_dir))
+        self.release_slot()
+
+    @contextmanager
+    def session(self, ftp_dir: str):
+        """Сессия на время блока with. При исключении сессия считается неисправной."""
+        ftp = self.acquire(ftp_dir)
+        try:
+            yield ftp
+        except BaseException:
+            self.release(ftp, ftp_dir, broken=True)
+            raise
+        self.release(ftp, ftp_dir)
+
+    def acquire_slot(self, blocking: bool = True) -> bool:
+        """Занимает место в пределе параллельной работы без выдачи сессии
+        (для механизма asyncio, открывающего собственные сессии).
+        :return: True, если место занято.
+        """
+        with self._slots:
+            while self.active >= self.limit:
+                if not blocking:
+                    return False
+                self._slots.wait()
+            self.active += 1
+        return True
+
+    def release_slot(self) -> None:
+        """Освобождает место, занятое acquire_slot."""
+        with self._slots:
+            self.active -= 1
+            self._slots.notify()
+
+    def set_limit(self, limit: int) -> int:
+        """Меняет предел одновременно выданных сессий (от 1 до size).
+        Уже выданные сессии не отбираются: при уменьшении предела
+        новые сессии выдаются, когда число выданных станет меньше него.
+        :return: Установленный предел.
+        """
+        with self._slots:
+            self.limit = max(1, min(self.size, limit))
+            self._slots.notify_all()
+        return self.limit
+
+    def quit(self) -> None:
+        """Закрывает все свободные сессии пула."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for ftp, _ in idle:
+            self._close(ftp)
+
+    def _close(self, ftp: FTP) -> None:
+        close_ftp(ftp)
+        if self.mirrors is not None:
+            self.mirrors.closed(get_mirror_name(ftp))
+
+    def _take_idle(self, ftp_dir: str) -> tuple[FTP | None, str]:
+        with self._lock:
+            if not self._idle:
+                return None, ""
+            for i, (_, current_dir) in enumerate(self._idle):
+                if current_dir == ftp_dir:
+                    return self._idle.pop(i)
+            return self._idle.pop()
+
+
+def get_mirror_name(ftp: FTP) -> str:
+    """Функция get_mirror_name(ftp: FTP) -> str
+    Имя зеркала (host:port), с которым открыта сессия ftp.
+    """
+    return f"{ftp.host}:{ftp.port}"
+
+
+def close_ftp(ftp: FTP | None) -> None:
+    """Функция close_ftp(ftp: FTP | None) -> None
+    Закрывает сессию с FTP сервером. Ошибки закрытия игнорируются.
+    """
+    if ftp is None:
+        return
+    try:
+        ftp.quit()
+    except Exception:
+        ftp.close()
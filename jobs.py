@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import component_functions as f
+from constant import const as c
+from ftp_listing import FtpEntry
+from metrics import JobMetrics
+from planning import JobPlan
+
+
+@dataclass
+class SyncJob:
+    """Задание синхронизации директории FTP сервера с директорией локального диска.
+    local_dir:                  директория локального диска с дистрибутивом обновлений.
+    ftp_dir:                    директория FTP сервера.
+    local_subdir:               поддиректория NEW (заполняется при подготовке).
+    count_of_files_copied:      количество скопированных файлов.
+    count_of_files_not_copied:  количество не скопированных файлов.
+    retries:                    количество повторных попыток скачивания файлов.
+    reconnects:                 количество повторных подключений к FTP серверу.
+    error:                      ошибка, прервавшая выполнение задания.
+    ftp_listing:                снимок директории FTP сервера, если он уже прочитан.
+    metrics:                    показатели выполнения задания (для отчёта о запуске).
+    plan:                       план синхронизации (составляется при выполнении
+                                или берётся из файла плана).
+    """
+
+    local_dir: str
+    ftp_dir: str
+    local_subdir: Path | None = None
+    count_of_files_copied: int = 0
+    count_of_files_not_copied: int = 0
+    retries: int = 0
+    reconnects: int = 0
+    error: f.MyException | None = field(default=None, repr=False)
+    ftp_listing: dict[str, FtpEntry] | None = field(default=None, repr=False)
+    metrics: JobMetrics = field(default_factory=JobMetrics, repr=False)
+    plan: JobPlan | None = field(default=None, repr=False)
+
+    def summary(self) -> str:
+        """Строка итогов задания для журнала."""
+        text = (
+            f"{self.ftp_dir} -> {self.local_dir}: "
+            f"скопировано файлов {abs(self.count_of_files_copied)}, "
+            f"не скопировано {self.count_of_files_not_copied}"
+        )
+        if self.retries or self.reconnects:
+            text += (
+                f", повторных попыток {self.retries}, "
+                f"переподключений {self.reconnects}"
+            )
+        if self.error is not None:
+            text += f"\n    Ошибка: {self.error.text_err}"
+        return text
+
+
+def read_jobs_file(file_jobs: str) -> list[SyncJob]:
+    """Функция read_jobs_file(file_jobs: str) -> list[SyncJob]
+        Читает файл заданий.
+        Каждая строка файла: директория локального диска ; директория FTP сервера
+        Пустые строки и строки, начинающиеся с '#', пропускаются.
+    :param
+        file_jobs: str - Имя файла заданий
+    :return:
+        Список заданий.
+    """
+    try:
+        with open(file_jobs, encoding="utf-8") as file:
+            lines = file.readlines()
+    except OSError as e:
+        raise f.MyException(f"Не могу прочитать файл заданий {file_jobs}\n{e}", 777)
+
+    list_jobs = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split(c.JOBS_SEPARATOR)]
+        if len(parts) != 2 or not all(parts):
+            raise f.MyException(
+                f"Файл заданий {file_jobs}, строка {number}:\n{line}\n"
+                f"Ожидается: директория локального диска "
+                f"{c.JOBS_SEPARATOR} директория FTP сервера",
+                777,
+            )
+        list_jobs.append(SyncJob(local_dir=parts[0], ftp_dir=parts[1]))
+
+    if not list_jobs:
+        raise f.MyException(f"Файл заданий {file_jobs} не содержит заданий", 777)
+    return list_jobs
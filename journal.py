@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+import component_functions as f
+import manifest
+import promotion
+from constant import const as c
+
+
+class PromotionJournal:
+    """Журнал упреждающей записи (write-ahead) задания синхронизации.
+    Хранится в директории компонент (файл JOURNAL_FILE), по записи JSON в строке.
+    Каждая запись сбрасывается на диск (fsync) до начала шага, который она описывает:
+        begin       - начато задание (скачивание в NEW);
+        promote     - начат перенос файлов names из NEW в директорию компонент;
+        promoted    - перенос закончен;
+        prune       - начат перенос устаревших компонент names в OLD (path_men);
+        pruned      - перенос в OLD закончен;
+        commit      - задание выполнено, директории совпали.
+    Журнал содержит записи только последнего задания (begin начинает его заново),
+    поэтому восстановление после сбоя (recover) читает только его
+    и не зависит от числа файлов в директориях.
+    """
+
+    def __init__(self, local_dir: str | Path):
+        self.local_dir = Path(local_dir)
+        self.file = Path(self.local_dir, c.JOURNAL_FILE)
+
+    def read(self) -> list[dict]:
+        """Записи журнала. Недописанная при сбое последняя строка пропускается:
+        шаг, который она описывает, не начинался."""
+        try:
+            with open(self.file, encoding="utf-8") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return []
+        except OSError as e:
+            raise f.MyException(f"Не могу прочитать журнал {self.file}\n{e}", 777)
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+        return records
+
+    def state(self) -> str:
+        """Состояние последнего задания по журналу:
+        none - журнала нет (задания не было или оно выполнено прежней версией программы),
+        committed - задание выполнено,
+        downloading / promoting / pruning - задание прервано на этом шаге.
+        """
+        ops = [record.get("op") for record in self.read()]
+        if not ops:
+            return "none"
+        if ops[-1] == "commit":
+            return "committed"
+        steps = [op for op in ops if op in ("promote", "promoted", "prune", "pruned")]
+        if steps and steps[-1] == "prune":
+            return "pruning"
+        if steps and steps[-1] == "promote":
+            return "promoting"
+        return "downloading"
+
+    def begin(self, ftp_dirs: list[str]) -> None:
+        """Начинает журнал нового задания с директориями FTP сервера ftp_dirs
+        (прежние записи удаляются атомарно)."""
+        file_temp = Path(self.local_dir, c.JOURNAL_FILE + ".tmp")
+        with open(file_temp, "w", encoding="utf-8") as file:
+            file.write(self._line({"op": "begin", "ftp_dirs": ftp_dirs}))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(file_temp, self.file)
+
+    def write(self, op: str, names: list[str] | None = None) -> None:
+        """Дописывает запись op (с именами файлов names) и сбрасывает её на диск."""
+        record = {"op": op}
+        if names is not None:
+            record["names"] = names
+        with open(self.file, "a", encoding="utf-8") as file:
+            file.write(self._line(record))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def recover(self, local_subdir: Path) -> str:
+        """Функция recover(local_subdir: Path) -> str
+            Приводит директорию компонент в согласованное состояние по журналу
+            (вместо вопроса оператору о непустой поддиректории NEW):
+            1. прерванный перенос в OLD доводится до конца по списку из журнала;
+            2. прерванный перенос из NEW доводится до конца по списку из журнала
+               (уже перенесённые файлы пропускаются); файлы, которых в NEW нет,
+               откатываются - их незаконченные копии удаляются;
+            3. если последнее задание выполнено, поддиректория NEW очищается -
+               начинается новое скачивание; иначе скачивание в NEW продолжается.
+        :param
+            local_subdir: Path - Поддиректория NEW
+        :return:
+            Состояние журнала до восстановления (state).
+        """
+        records = self.read()
+        state = self.state()
+        if state == "pruning":
+            names = next(r["names"] for r in reversed(records) if r["op"] == "prune")
+            self._roll_forward_prune(names)
+            self.write("pruned")
+        elif state == "promoting":
+            names = next(r["names"] for r in reversed(records) if r["op"] == "promote")
+            self._roll_forward_promote(local_subdir, names)
+            self.write("promoted")
+
+        if state == "committed":
+            if self._has_files(local_subdir):
+                logging.info(
+                    f"Прошлое задание выполнено: {local_subdir} очищена "
+                    f"для нового скачивания"
+                )
+                f.delete_all(local_subdir)
+        elif state != "none" or self._has_files(local_subdir):
+            logging.info(
+                f"Прошлое задание прервано ({state}): скачивание в {local_subdir} "
+                f"продолжается"
+            )
+        return state
+
+    def _roll_forward_promote(self, local_subdir: Path, names: list[str]) -> None:
+        """Доводит до конца перенос файлов names из NEW в директорию компонент."""
+        stats = promotion.PromotionStats()
+        try_link = promotion.is_same_device(local_subdir, self.local_dir)
+        rolled_back = 0
+        for name in names:
+            file_from = Path(local_subdir, name)
+            if file_from.exists():
+                try_link = promotion.promote_file(
+                    file_from, Path(self.local_dir, name), stats, try_link
+                )
+            else:
+                Path(self.local_dir, name + c.PART_SUFFIX).unlink(missing_ok=True)
+                rolled_back += 1
+        logging.info(
+            f"Восстановление по журналу: перенос из {c.SUB_DIR_NEW} доведён до конца, "
+            f"файлов {stats.linked_files + stats.copied_files}, отменено {rolled_back}"
+        )
+
+    def _roll_forward_prune(self, names: list[str]) -> None:
+        """Доводит до конца перенос устаревших компонент names в OLD."""
+        sub_dir_oldest = Path(self.local_dir, c.SUB_DIR_OLD)
+        sub_dir_oldest.mkdir(exist_ok=True)
+        moved = 0
+        for name in names:
+            file_from = Path(self.local_dir, name)
+            if file_from.exists():
+                file_from.replace(Path(sub_dir_oldest, name))
+                moved += 1
+        logging.info(
+            f"Восстановление по журналу: перенос в {c.SUB_DIR_OLD} доведён до конца, "
+            f"файлов {moved}"
+        )
+
+    @staticmethod
+    def _has_files(local_subdir: Path) -> bool:
+        """Есть ли в поддиректории файлы, кроме индекса."""
+        return any(
+            not manifest.is_manifest_file(item.name) for item in local_subdir.iterdir()
+        )
+
+    @staticmethod
+    def _line(record: dict) -> str:
+        record["time"] = datetime.now().isoformat(timespec="seconds")
+        return json.dumps(record, ensure_ascii=False) + "\n"
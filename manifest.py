@@ -0,0 +1,266 @@
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+
+import component_functions as f
+from constant import const as c
+
+
+@dataclass(frozen=True, slots=True)
+class ManifestEntry:
+    """Запись индекса директории компонент.
+    name:       имя файла.
+    size:       размер файла в байтах.
+    mtime_ns:   время изменения файла в наносекундах.
+    component:  имя компонента (None - если имя файла не является именем компонента).
+    version:    версия компонента.
+    extension:  расширение файла компонента.
+    """
+
+    name: str
+    size: int
+    mtime_ns: int
+    component: str | None
+    version: str | None
+    extension: str | None
+
+    def component_name(self) -> f.ComponentName | None:
+        """Разобранное имя компонента или None.
+        Собирается из сохранённых в записи частей имени; имя файла разбирается
+        заново, только если версия или расширение в записи не сохранены."""
+        if self.component is None:
+            return None
+        if self.version is None or not self.extension:
+            return f.parse_component_name(self.name)
+        return f.make_component_name(self.component, self.version, self.extension)
+
+
+class Manifest:
+    """Индекс файлов директории, хранящийся в файле SQLite MANIFEST_FILE этой директории.
+    При открытии индекс читается из файла и обновляется:
+    если время изменения директории не изменилось с прошлого обновления,
+    директория не читается, иначе читается один раз (os.scandir)
+    и заново разбираются только новые и изменившиеся файлы.
+    Если файл индекса недоступен, индекс строится в памяти.
+    Изменения, сделанные самой программой, вносятся в индекс на месте (update, remove),
+    и до конца работы директория из-за них повторно не читается: один индекс
+    передаётся всем этапам синхронизации, включая path_men.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.entries: dict[str, ManifestEntry] = dict()
+        self._dir_mtime_ns = 0
+        self._scanned_at_ns = 0
+        self._own_mtime_ns = None
+        self._connection = self._open()
+        self.refresh()
+
+    def names(self) -> set[str]:
+        """Множество имён файлов директории."""
+        return set(self.entries)
+
+    def sizes(self) -> dict[str, int]:
+        """Словарь: имя файла -> размер файла."""
+        return {name: entry.size for name, entry in self.entries.items()}
+
+    def files(self, pattern: str = "*") -> list[ManifestEntry]:
+        """Записи файлов, имена которых соответствуют шаблону (как в Path.glob)."""
+        return [entry for name, entry in self.entries.items() if fnmatch(name, pattern)]
+
+    def refresh(self) -> None:
+        """Приводит индекс в соответствие с директорией.
+        Директория читается, только если она изменилась с прошлого обновления.
+        """
+        dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        if self._is_clean(dir_mtime_ns) or dir_mtime_ns == self._own_mtime_ns:
+            return
+
+        scanned_at_ns = time.time_ns()
+        changed = []
+        seen = set()
+        with os.scandir(self.directory) as dir_entries:
+            for dir_entry in dir_entries:
+                if is_manifest_file(dir_entry.name) or not dir_entry.is_file():
+                    continue
+                stat = dir_entry.stat()
+                seen.add(dir_entry.name)
+                entry = self.entries.get(dir_entry.name)
+                if (
+                    entry is None
+                    or entry.size != stat.st_size
+                    or entry.mtime_ns != stat.st_mtime_ns
+                ):
+                    entry = make_entry(dir_entry.name, stat.st_size, stat.st_mtime_ns)
+                    self.entries[entry.name] = entry
+                    changed.append(entry)
+
+        removed = self.entries.keys() - seen
+        for name in removed:
+            del self.entries[name]
+
+        self._dir_mtime_ns = dir_mtime_ns
+        self._scanned_at_ns = scanned_at_ns
+        self._save(changed, removed)
+
+    def verify(self) -> None:
+        """Приводит индекс в соответствие с директорией для сверки целостности:
+        после refresh проверяется каждый файл индекса (размер и время изменения).
+        Перезапись или усечение файла на месте не меняет время изменения
+        директории, и refresh такие изменения не обнаруживает.
+        """
+        self.refresh()
+        changed = []
+        removed = []
+        for name, entry in list(self.entries.items()):
+            try:
+                stat = os.stat(Path(self.directory, name))
+            except FileNotFoundError:
+                del self.entries[name]
+                removed.append(name)
+                continue
+            if entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns:
+                entry = make_entry(name, stat.st_size, stat.st_mtime_ns)
+                self.entries[name] = entry
+                changed.append(entry)
+        if changed or removed:
+            self._save(changed, removed)
+
+    def update(self, names: list[str]) -> None:
+        """Обновляет в индексе записи файлов, изменённых программой.
+        Файлы, которых нет в директории, из индекса удаляются.
+        """
+        changed = []
+        removed = []
+        for name in names:
+            try:
+                stat = Path(self.directory, name).stat()
+            except FileNotFoundError:
+                if self.entries.pop(name, None):
+                    removed.append(name)
+                continue
+            entry = make_entry(name, stat.st_size, stat.st_mtime_ns)
+            self.entries[name] = entry
+            changed.append(entry)
+        self._save(changed, removed)
+        self._note_own_changes()
+
+    def remove(self, names: list[str]) -> None:
+        """Удаляет из индекса записи файлов, перемещённых программой."""
+        removed = [name for name in names if self.entries.pop(name, None)]
+        self._save([], removed)
+        self._note_own_changes()
+
+    def close(self) -> None:
+        """Закрывает файл индекса."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _note_own_changes(self) -> None:
+        # Время изменения директории после изменений программы, уже внесённых
+        # в индекс. В файл индекса не записывается: при следующем запуске
+        # директория будет прочитана, если она менялась.
+        self._own_mtime_ns = os.stat(self.directory).st_mtime_ns
+
+    def _is_clean(self, dir_mtime_ns: int) -> bool:
+        # Изменения, сделанные в пределах точности времени файловой системы
+        # после предыдущего чтения, по времени директории не обнаружить.
+        return (
+            dir_mtime_ns == self._dir_mtime_ns
+            and dir_mtime_ns < self._scanned_at_ns - c.MANIFEST_MTIME_GRANULARITY_NS
+        )
+
+    def _open(self) -> sqlite3.Connection | None:
+        file_manifest = Path(self.directory, c.MANIFEST_FILE)
+        try:
+            connection = sqlite3.connect(file_manifest)
+            # Файл журнала не удаляется и не меняет время изменения директории
+            connection.execute("PRAGMA journal_mode=PERSIST")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, "
+                "size INTEGER, mtime_ns INTEGER, "
+                "component TEXT, version TEXT, extension TEXT)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)"
+            )
+            for row in connection.execute("SELECT * FROM files"):
+                entry = ManifestEntry(*row)
+                self.entries[entry.name] = entry
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+            self._dir_mtime_ns = meta.get("dir_mtime_ns", 0)
+            self._scanned_at_ns = meta.get("scanned_at_ns", 0)
+            connection.commit()
+        except sqlite3.Error as e:
+            logging.warning(
+                f"Индекс {file_manifest} недоступен: {e}\n"
+                f"Директория {self.directory} будет прочитана полностью"
+            )
+            self.entries.clear()
+            return None
+        return connection
+
+    def _save(self, changed: list[ManifestEntry], removed) -> None:
+        if self._connection is None:
+            return
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (
+                            entry.name,
+                            entry.size,
+                            entry.mtime_ns,
+                            entry.component,
+                            entry.version,
+                            entry.extension,
+                        )
+                        for entry in changed
+                    ),
+                )
+                self._connection.executemany(
+                    "DELETE FROM files WHERE name = ?", ((name,) for name in removed)
+                )
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    (
+                        ("dir_mtime_ns", self._dir_mtime_ns),
+                        ("scanned_at_ns", self._scanned_at_ns),
+                    ),
+                )
+        except sqlite3.Error as e:
+            logging.warning(
+                f"Не удалось сохранить индекс директории {self.directory}: {e}"
+            )
+            self.close()
+
+
+def make_entry(name: str, size: int, mtime_ns: int) -> ManifestEntry:
+    """Функция make_entry(name: str, size: int, mtime_ns: int) -> ManifestEntry
+    Формирует запись индекса, разбирая имя файла компонента.
+    """
+    component_name = f.parse_component_name(name)
+    if component_name is None:
+        return ManifestEntry(name, size, mtime_ns, None, None, None)
+    return ManifestEntry(
+        name,
+        size,
+        mtime_ns,
+        component_name.base,
+        component_name.version,
+        component_name.extension,
+    )
+
+
+def is_manifest_file(name: str) -> bool:
+    """Функция is_manifest_file(name: str) -> bool
+    Проверяет, является ли файл файлом индекса (или его журналом)
+    или журналом задания синхронизации (JOURNAL_FILE).
+    """
+    return name.startswith((c.MANIFEST_FILE, c.JOURNAL_FILE))
@@ -0,0 +1,298 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+
+
+@dataclass
+class FileMetrics:
+    """Показатели скачивания одного файла.
+    name:       имя файла.
+    queue_wait: время ожидания в очереди скачивания, секунд.
+    first_byte: время от запроса файла (RETR) до первого байта, секунд.
+    transfer:   время передачи данных (от первого до последнего байта), секунд.
+    bytes:      количество полученных байт (без части, скачанной ранее).
+    attempts:   количество попыток скачивания.
+    copied:     скопирован ли файл.
+    """
+
+    name: str
+    queue_wait: float = 0.0
+    first_byte: float | None = None
+    transfer: float = 0.0
+    bytes: int = 0
+    attempts: int = 0
+    copied: bool = False
+    _requested: float = field(default=0.0, repr=False)
+    _first: float | None = field(default=None, repr=False)
+    _last: float = field(default=0.0, repr=False)
+
+    @property
+    def throughput(self) -> float:
+        """Скорость передачи, байт в секунду."""
+        return self.bytes / self.transfer if self.transfer > 0 else 0.0
+
+    def request(self) -> None:
+        """Отмечает запрос данных файла у FTP сервера."""
+        self._requested = time.perf_counter()
+
+    def received(self, size: int) -> None:
+        """Учитывает полученные байты."""
+        now = time.perf_counter()
+        if self._first is None:
+            self._first = now
+            self.first_byte = now - self._requested
+        self._last = now
+        self.bytes += size
+
+    def finish(self, copied: bool) -> None:
+        """Отмечает окончание скачивания файла."""
+        self.copied = copied
+        if self._first is not None:
+            self.transfer = self._last - self._first
+
+    def as_dict(self) -> dict:
+        """Показатели для отчёта."""
+        result = {
+            key: value for key, value in asdict(self).items() if not key.startswith("_")
+        }
+        result["throughput"] = self.throughput
+        return result
+
+
+@dataclass
+class JobMetrics:
+    """Показатели выполнения задания.
+    phases: продолжительность этапов задания (чтение директории FTP сервера,
+            скачивание, перенос, сверка), секунд.
+    files:  показатели скачивания файлов.
+    """
+
+    phases: dict[str, float] = field(default_factory=dict)
+    files: list[FileMetrics] = field(default_factory=list)
+    lock: Lock = field(default_factory=Lock, repr=False)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замеряет продолжительность этапа name (блок with)."""
+        time_begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[name] = (
+                    self.phases.get(name, 0.0) + time.perf_counter() - time_begin
+                )
+
+    def new_file(self, name: str, queued_at: float = 0.0) -> FileMetrics:
+        """Показатели скачивания файла name, поставленного в очередь в момент queued_at
+        (time.perf_counter, 0 - файл скачивается вне очереди)."""
+        file_metrics = FileMetrics(
+            name=name,
+            queue_wait=time.perf_counter() - queued_at if queued_at else 0.0,
+        )
+        with self.lock:
+            self.files.append(file_metrics)
+        return file_metrics
+
+    def bytes(self) -> int:
+        """Количество полученных байт."""
+        return sum(file_metrics.bytes for file_metrics in self.files)
+
+    def throughput(self) -> float:
+        """Скорость скачивания задания, байт в секунду
+        (полученные байты на продолжительность этапа скачивания)."""
+        seconds = self.phases.get("download", 0.0)
+        return self.bytes() / seconds if seconds > 0 else 0.0
+
+
+def write_json_lines(file_report: str, list_jobs: list, started: datetime) -> None:
+    """Функция write_json_lines(file_report: str, list_jobs: list[SyncJob], started) -> None
+        Дописывает в файл отчёт о запуске в формате JSON Lines:
+        строка запуска (type = run), строки заданий (type = job)
+        и строки скачанных файлов (type = file).
+    :param
+        1. file_report: str         - Файл отчёта
+        2. list_jobs: list[SyncJob] - Выполненные задания
+        3. started: datetime        - Время начала запуска
+    """
+    run_id = started.isoformat(timespec="seconds")
+    lines = [
+        {
+            "type": "run",
+            "run": run_id,
+            "duration": (datetime.now() - started).total_seconds(),
+            "jobs": len(list_jobs),
+            "failed_jobs": sum(job.error is not None for job in list_jobs),
+        }
+    ]
+    for job in list_jobs:
+        lines.append(
+            {
+                "type": "job",
+                "run": run_id,
+                "ftp_dir": job.ftp_dir,
+                "local_dir": job.local_dir,
+                "copied": abs(job.count_of_files_copied),
+                "not_copied": job.count_of_files_not_copied,
+                "retries": job.retries,
+                "reconnects": job.reconnects,
+                "error": job.error.text_err if job.error is not None else None,
+                "bytes": job.metrics.bytes(),
+                "throughput": job.metrics.throughput(),
+                "phases": job.metrics.phases,
+            }
+        )
+        for file_metrics in job.metrics.files:
+            lines.append(
+                {"type": "file", "run": run_id, "ftp_dir": job.ftp_dir}
+                | file_metrics.as_dict()
+            )
+
+    with open(file_report, "a", encoding="utf-8") as file:
+        for line in lines:
+            file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def write_prometheus(file_prometheus: str, list_jobs: list) -> None:
+    """Функция write_prometheus(file_prometheus: str, list_jobs: list[SyncJob]) -> None
+    Записывает показатели последнего запуска в файл для textfile collector
+    Prometheus (node_exporter). Файл заменяется целиком (os.replace),
+    чтобы сборщик не прочитал его наполовину записанным.
+    Задание определяют метки dir и local_dir: одну директорию FTP сервера
+    могут копировать несколько заданий.
+    """
+    metrics = {
+        "path_ftp_last_run_timestamp_seconds": (
+            "gauge",
+            "Время окончания последнего запуска.",
+            [("", time.time())],
+        ),
+        "path_ftp_job_success": (
+            "gauge",
+            "1 - задание выполнено без ошибок.",
+            [],
+        ),
+        "path_ftp_files": ("gauge", "Файлов скачано и не скачано.", []),
+        "path_ftp_bytes": ("gauge", "Получено байт.", []),
+        "path_ftp_throughput_bytes_per_second": (
+            "gauge",
+            "Скорость скачивания задания.",
+            [],
+        ),
+        "path_ftp_retries": ("gauge", "Повторных попыток скачивания.", []),
+        "path_ftp_reconnects": ("gauge", "Повторных подключений к FTP серверу.", []),
+        "path_ftp_phase_seconds": ("gauge", "Продолжительность этапов задания.", []),
+        "path_ftp_file_first_byte_seconds": (
+            "gauge",
+            "Время до первого байта файла (квантили).",
+            [],
+        ),
+        "path_ftp_file_transfer_seconds": (
+            "gauge",
+            "Время передачи файла (квантили).",
+            [],
+        ),
+        "path_ftp_file_queue_wait_seconds": (
+            "gauge",
+            "Время ожидания файла в очереди (квантили).",
+            [],
+        ),
+    }
+    for job in list_jobs:
+        label = (
+            f'dir="{escape_label(job.ftp_dir)}",'
+            f'local_dir="{escape_label(job.local_dir)}"'
+        )
+        metrics["path_ftp_job_success"][2].append((label, int(job.error is None)))
+        metrics["path_ftp_files"][2].extend(
+            (
+                (f'{label},result="copied"', abs(job.count_of_files_copied)),
+                (f'{label},result="not_copied"', job.count_of_files_not_copied),
+            )
+        )
+        metrics["path_ftp_bytes"][2].append((label, job.metrics.bytes()))
+        metrics["path_ftp_throughput_bytes_per_second"][2].append(
+            (label, job.metrics.throughput())
+        )
+        metrics["path_ftp_retries"][2].append((label, job.retries))
+        metrics["path_ftp_reconnects"][2].append((label, job.reconnects))
+        for phase, seconds in job.metrics.phases.items():
+            metrics["path_ftp_phase_seconds"][2].append(
+                (f'{label},phase="{phase}"', seconds)
+            )
+        for name, values in (
+            (
+                "path_ftp_file_first_byte_seconds",
+                [m.first_byte for m in job.metrics.files if m.first_byte is not None],
+            ),
+            (
+                "path_ftp_file_transfer_seconds",
+                [m.transfer for m in job.metrics.files if m.bytes],
+            ),
+            (
+                "path_ftp_file_queue_wait_seconds",
+                [m.queue_wait for m in job.metrics.files],
+            ),
+        ):
+            for quantile in (0.5, 0.95):
+                metrics[name][2].append(
+                    (
+                        f'{label},quantile="{quantile}"',
+                        get_quantile(values, quantile),
+                    )
+                )
+
+    lines = []
+    for name, (kind, help_text, samples) in metrics.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+    file_temp = Path(file_prometheus + ".tmp")
+    file_temp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.replace(file_temp, file_prometheus)
+
+
+def write_reports(
+    options: argparse.Namespace, list_jobs: list, started: datetime
+) -> None:
+    """Функция write_reports(options, list_jobs: list[SyncJob], started) -> None
+    Записывает отчёты, заданные параметрами программы (--report, --prometheus).
+    Ошибка записи отчёта не прерывает работу программы.
+    """
+    try:
+        if options.report:
+            write_json_lines(options.report, list_jobs, started)
+        if options.prometheus:
+            write_prometheus(options.prometheus, list_jobs)
+    except OSError as e:
+        logging.warning(f"Не удалось записать отчёт о запуске: {e}")
+
+
+def get_quantile(values: list[float], quantile: float) -> float:
+    """Функция get_quantile(values: list[float], quantile: float) -> float
+    Квантиль значений values (0, если значений нет).
+    """
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[
+        round(quantile * 100) - 1
+    ]
+
+
+def escape_label(value: str) -> str:
+    """Функция escape_label(value: str) -> str
+    Экранирует значение метки в формате Prometheus.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
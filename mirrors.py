@@ -0,0 +1,325 @@
+import logging
+import time
+from dataclasses import dataclass
+from ftplib import FTP
+from threading import Lock
+from typing import Callable, Iterator
+
+import component_functions as f
+import ftp_listing
+import ftp_pool
+from constant import const as c
+
+
+@dataclass
+class Mirror:
+    """Зеркало FTP сервера.
+    host, port:     адрес зеркала.
+    latency:        время подключения и чтения директории при проверке, секунд
+                    (None - зеркало недоступно или не проверялось).
+    sessions:       количество открытых сессий с зеркалом.
+    failures:       количество ошибок сессий подряд.
+    excluded_until: до какого момента (time.monotonic) зеркало не используется.
+    """
+
+    host: str
+    port: int
+    latency: float | None = None
+    sessions: int = 0
+    failures: int = 0
+    excluded_until: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def is_healthy(self) -> bool:
+        """Можно ли открывать сессии с зеркалом."""
+        return self.excluded_until <= time.monotonic()
+
+
+class MirrorSet:
+    """Равноценные зеркала FTP сервера.
+    При первом подключении все зеркала проверяются (подключение и чтение
+    директории) и упорядочиваются по задержке; самое быстрое - основное.
+    Новая сессия открывается с исправным зеркалом с наименьшим произведением
+    числа открытых сессий на задержку, так что параллельные передачи
+    распределяются между зеркалами. Зеркало, сессии с которым MIRROR_MAX_FAILURES
+    раз подряд завершились ошибкой, исключается на MIRROR_EXCLUDE_SEC секунд.
+    Эталон - первое в списке доступное при проверке зеркало (исходный сервер).
+    С другим зеркалом директория FTP сервера используется, только если её состав
+    и размеры файлов совпадают с эталоном. Результаты сверки действуют до forget
+    (в режиме наблюдения - до следующего цикла).
+    """
+
+    def __init__(self, mirrors: list[Mirror], connect: Callable[[Mirror, str], FTP]):
+        """
+        :param
+            1. mirrors: list[Mirror]                - Зеркала (первое - исходный сервер)
+            2. connect: Callable[[Mirror, str], FTP] - Открывает сессию с зеркалом
+                                                      в директории FTP сервера
+        """
+        self.mirrors = mirrors
+        self._connect = connect
+        self._probed = len(mirrors) == 1
+        self._reference: Mirror | None = None
+        self._file_sizes: dict[tuple[str, str], dict[str, int]] = dict()
+        self._consistent: dict[tuple[str, str], bool] = dict()
+        self._key_locks: dict[tuple[str, str, str], Lock] = dict()
+        self._lock = Lock()
+        self._probe_lock = Lock()
+
+    @property
+    def reference(self) -> Mirror:
+        """Эталон для сверки зеркал (до проверки и без доступных - основное)."""
+        return self._reference or self.primary
+
+    @property
+    def primary(self) -> Mirror:
+        """Основное зеркало: самое быстрое из исправных."""
+        return next(
+            (mirror for mirror in self.mirrors if mirror.is_healthy()), self.mirrors[0]
+        )
+
+    def probe(self, ftp_dir: str) -> None:
+        """Проверяет зеркала: задержка подключения и чтения директории ftp_dir.
+        Зеркала упорядочиваются по задержке, недоступные - в конце и исключаются.
+        Эталоном становится первое в списке доступное зеркало.
+        Прочитанные директории запоминаются для сверки зеркал.
+        """
+        for mirror in self.mirrors:
+            time_begin = time.perf_counter()
+            ftp = None
+            try:
+                ftp = self._connect(mirror, ftp_dir)
+                listing = ftp_listing.get_listing(ftp)
+            except Exception as e:
+                mirror.latency = None
+                mirror.excluded_until = time.monotonic() + c.MIRROR_EXCLUDE_SEC
+                logging.warning(
+                    f"Зеркало {mirror.name} недоступно\n{getattr(e, 'text_err', e)}"
+                )
+                continue
+            finally:
+                ftp_pool.close_ftp(ftp)
+            mirror.latency = time.perf_counter() - time_begin
+            if self._reference is None:
+                self._reference = mirror
+            self._file_sizes[(mirror.name, ftp_dir)] = ftp_listing.get_file_sizes(
+                listing
+            )
+
+        self.mirrors.sort(key=lambda mirror: (mirror.latency is None, mirror.latency))
+        logging.info(
+            f"Зеркала FTP сервера (подключение и чтение директории), "
+            f"эталон {self.reference.name}:\n"
+            + "\n".join(
+                f"    {mirror.name}: "
+                + (
+                    f"{mirror.latency:.3f} с"
+                    if mirror.latency is not None
+                    else "недоступно"
+                )
+                for mirror in self.mirrors
+            )
+        )
+
+    def forget(self) -> None:
+        """Забывает прочитанные директории зеркал и результаты сверки:
+        директории FTP сервера могли измениться, зеркала сверяются заново."""
+        with self._lock:
+            self._file_sizes.clear()
+            self._consistent.clear()
+
+    def choose(self, ftp_dir: str) -> Mirror:
+        """Выбирает зеркало для новой сессии в директории ftp_dir
+        и учитывает сессию в числе открытых (closed - при закрытии).
+        """
+        mirror = next(self._choose_all(ftp_dir), None)
+        if mirror is None:
+            raise self._no_mirror_error(ftp_dir)
+        return mirror
+
+    def connect(self, ftp_dir: str) -> FTP:
+        """Открывает сессию в директории ftp_dir с выбранным зеркалом (choose).
+        Если подключиться не удалось, зеркало исключается (unavailable)
+        и сессия открывается со следующим.
+        """
+        error = None
+        for mirror in self._choose_all(ftp_dir):
+            try:
+                return self._connect(mirror, ftp_dir)
+            except f.MyException as e:
+                error = e
+                self.closed(mirror.name)
+                self.unavailable(mirror.name)
+        raise error or self._no_mirror_error(ftp_dir)
+
+    def unavailable(self, name: str) -> None:
+        """Исключает зеркало name, к которому не удалось подключиться,
+        если есть другие исправные зеркала."""
+        with self._lock:
+            mirror = self._find(name)
+            if mirror is None or not self._exclude(mirror):
+                return
+        logging.warning(
+            f"Зеркало {name} недоступно, не используется {c.MIRROR_EXCLUDE_SEC} с"
+        )
+
+    def closed(self, name: str) -> None:
+        """Учитывает закрытие сессии с зеркалом name."""
+        with self._lock:
+            mirror = self._find(name)
+            if mirror is not None and mirror.sessions > 0:
+                mirror.sessions -= 1
+
+    def failed(self, name: str) -> None:
+        """Учитывает ошибку сессии с зеркалом name. После MIRROR_MAX_FAILURES
+        ошибок подряд зеркало исключается, если есть другие исправные."""
+        with self._lock:
+            mirror = self._find(name)
+            if mirror is None:
+                return
+            mirror.failures += 1
+            if mirror.failures < c.MIRROR_MAX_FAILURES:
+                return
+            mirror.failures = 0
+            if not self._exclude(mirror):
+                return
+        logging.warning(
+            f"Зеркало {name}: ошибок подряд {c.MIRROR_MAX_FAILURES}, "
+            f"не используется {c.MIRROR_EXCLUDE_SEC} с"
+        )
+
+    def succeeded(self, name: str) -> None:
+        """Учитывает успешную работу сессии с зеркалом name."""
+        with self._lock:
+            mirror = self._find(name)
+            if mirror is not None:
+                mirror.failures = 0
+
+    def accepts(self, name: str, ftp_dir: str) -> bool:
+        """Можно ли продолжать работу сессии с зеркалом name в директории ftp_dir."""
+        mirror = self._find(name)
+        if mirror is None:
+            return True
+        return mirror.is_healthy() and self._consistent.get(
+            (name, ftp_dir), mirror is self.reference
+        )
+
+    def _choose_all(self, ftp_dir: str) -> Iterator[Mirror]:
+        """Зеркала, подходящие для новой сессии в директории ftp_dir,
+        в порядке выбора. Каждое выданное зеркало учитывает новую сессию."""
+        self._probe_once(ftp_dir)
+        for mirror in self._get_candidates():
+            if self._is_consistent(mirror, ftp_dir):
+                with self._lock:
+                    mirror.sessions += 1
+                yield mirror
+
+    @staticmethod
+    def _no_mirror_error(ftp_dir: str) -> f.MyException:
+        return f.MyException(
+            f"Ошибка при доступе к FTP серверу\n"
+            f"Нет зеркала с директорией {ftp_dir}, совпадающей с эталоном",
+            777,
+        )
+
+    def _exclude(self, mirror: Mirror) -> bool:
+        """Исключает зеркало на MIRROR_EXCLUDE_SEC секунд, если есть другие
+        исправные зеркала. :return: True, если зеркало исключено."""
+        if not any(other.is_healthy() for other in self.mirrors if other is not mirror):
+            return False
+        mirror.excluded_until = time.monotonic() + c.MIRROR_EXCLUDE_SEC
+        return True
+
+    def _probe_once(self, ftp_dir: str) -> None:
+        if self._probed:
+            return
+        with self._probe_lock:
+            if not self._probed:
+                self.probe(ftp_dir)
+                self._probed = True
+
+    def _get_candidates(self) -> list[Mirror]:
+        """Зеркала в порядке выбора: исправные по нагрузке и задержке,
+        затем исключённые (если исправных нет)."""
+        with self._lock:
+            healthy = [mirror for mirror in self.mirrors if mirror.is_healthy()]
+            healthy.sort(
+                key=lambda mirror: (mirror.sessions + 1)
+                * max(mirror.latency or 0.0, c.MIRROR_MIN_LATENCY_SEC)
+            )
+            return healthy + [
+                mirror for mirror in self.mirrors if mirror not in healthy
+            ]
+
+    def _is_consistent(self, mirror: Mirror, ftp_dir: str) -> bool:
+        """Совпадает ли директория ftp_dir зеркала с эталоном
+        (состав и размеры файлов). Результат сверки запоминается;
+        параллельные задания сверяют зеркало один раз."""
+        reference = self.reference
+        if mirror is reference:
+            return True
+        key = (mirror.name, ftp_dir)
+        with self._get_key_lock("consistent", key):
+            consistent = self._consistent.get(key)
+            if consistent is not None:
+                return consistent
+            try:
+                reference_sizes = self._get_file_sizes(reference, ftp_dir)
+                file_sizes = self._get_file_sizes(mirror, ftp_dir)
+            except Exception as e:
+                logging.warning(
+                    f"Зеркало {mirror.name}: сверка не удалась\n"
+                    f"{getattr(e, 'text_err', e)}"
+                )
+                return False
+            consistent = file_sizes == reference_sizes
+            self._consistent[key] = consistent
+        if not consistent:
+            logging.warning(
+                f"Зеркало {mirror.name}: директория {ftp_dir} не совпадает "
+                f"с эталоном {reference.name}, зеркало для неё не используется"
+            )
+        return consistent
+
+    def _get_file_sizes(self, mirror: Mirror, ftp_dir: str) -> dict[str, int]:
+        """Состав и размеры файлов директории ftp_dir зеркала (читается один раз,
+        параллельные задания ждут первого чтения)."""
+        key = (mirror.name, ftp_dir)
+        with self._get_key_lock("file_sizes", key):
+            file_sizes = self._file_sizes.get(key)
+            if file_sizes is not None:
+                return file_sizes
+            ftp = self._connect(mirror, ftp_dir)
+            try:
+                file_sizes = ftp_listing.get_file_sizes(ftp_listing.get_listing(ftp))
+            finally:
+                ftp_pool.close_ftp(ftp)
+            self._file_sizes[key] = file_sizes
+            return file_sizes
+
+    def _get_key_lock(self, kind: str, key: tuple[str, str]) -> Lock:
+        """Блокировка заполнения кэша kind для зеркала и директории key."""
+        with self._lock:
+            return self._key_locks.setdefault((kind, *key), Lock())
+
+    def _find(self, name: str) -> Mirror | None:
+        return next((mirror for mirror in self.mirrors if mirror.name == name), None)
+
+
+def parse_mirrors(text: str) -> list[Mirror]:
+    """Функция parse_mirrors(text: str) -> list[Mirror]
+        Разбирает список зеркал: адреса через запятую, порт - через двоеточие
+        (по умолчанию FTP_PORT), например "ftp.galaktika.ru,10.0.0.5:2121".
+    :return:
+        Зеркала в порядке списка.
+    """
+    mirrors = []
+    for item in text.split(","):
+        host, _, port = item.strip().partition(":")
+        if not host or (port and not port.isdigit()):
+            raise ValueError(f"неверный адрес зеркала '{item.strip()}'")
+        mirrors.append(Mirror(host=host, port=int(port) if port else c.FTP_PORT))
+    return mirrors
@@ -1,12 +1,38 @@
+import argparse
+import contextlib
+import itertools
 import logging
+import os
 import socket
-from ftplib import FTP
+from collections.abc import Iterable, Iterator
+from ftplib import FTP, all_errors, error_perm, error_temp
+from datetime import datetime
 from pathlib import Path
+from queue import Queue
 from sys import argv, exit
+from threading import Event, Lock, Thread
+import time
 import traceback
+import zlib
 
 import component_functions as f
+import blob_store
+import disk_space
+import download
+import ftp_async
+import ftp_listing
+import ftp_pool
+import jobs
+import journal
+import manifest
+import metrics
+import mirrors
 import path_men
+import planning
+import promotion
+import rate_limit
+import retry
+import sfv
 from constant import const as c
 
 
@@ -19,28 +45,37 @@ def main_():
     """
 
     ftp = None
+    interactive = True
     try:
-        (ftp, count_of_files_copied, count_of_files_not_copied) = main()
+        set_logging()
+        options = get_options(argv[1:])
+        interactive = options.watch is None and options.plan is None
+        if options.plan is not None:
+            dry_run(options)
+            my_exit(ftp, 0, interactive)
+        if options.watch is not None:
+            watch(options)
+        (ftp, count_of_files_copied, count_of_files_not_copied) = main(options)
     except KeyboardInterrupt:
         ret_code = 1000
         logging.critical(
             "Оператор прекратил работу программы\n" f"Код возврата {ret_code}"
         )
-        my_exit(ftp, ret_code)
+        my_exit(ftp, ret_code, interactive)
     except f.MyException as e:
         logging.error(
             f"{e.text_err}\n"
             f"Программа завершила работу.\n"
             f"Код возврата {e.ret_code}"
         )
-        my_exit(ftp, e.ret_code)
+        my_exit(ftp, e.ret_code, interactive)
     except Exception as e:
         ret_code = 1000
         tb = traceback.format_exc()
         logging.critical(
             f"{e}\n" f"Программа завершилась аварийно\n{tb}\nКод возврата {ret_code}\n"
         )
-        my_exit(ftp, ret_code)
+        my_exit(ftp, ret_code, interactive)
     else:
         if count_of_files_not_copied == 0:
             ret_code = 0
@@ -57,7 +92,7 @@ def main_():
                     f"Код возврата {ret_code}"
                 )
 
-                my_exit(ftp, ret_code)
+                my_exit(ftp, ret_code, interactive)
         else:
             ret_code = 1
             logging.warning(
@@ -68,20 +103,12 @@ def main_():
             )
             if not is_VPN_connected():
                 logging.info(f"Подключите VPN и повторите вызов программы")
-            my_exit(ftp, ret_code)
+            my_exit(ftp, ret_code, interactive)
 
 
-def main() -> tuple[FTP, int, int]:
-    """Функция
-        main() -> tuple[FTP, int, int]
-    Назначение
-        Файлы, существующие на FTP сервере и отсутствующие в директории компьютера,
-        записываются в поддиректорию.
-    Результат:
-        tuple, состоящий из 3 целых чисел:
-        1. FTP сервер
-        2. Количество скопированных файлов
-        3. Количество не скопированных файлов.
+def set_logging() -> None:
+    """Функция set_logging() -> None
+    Настраивает журнал программы (файл и консоль).
     """
     file_log = logging.FileHandler("Log_FTP.log")
     console_out = logging.StreamHandler()
@@ -91,110 +118,893 @@ def main() -> tuple[FTP, int, int]:
         handlers=(file_log, console_out),
         format="%(asctime)s %(levelname)s %(message)s",
     )
-    count_of_files_copied = 0
-    count_of_files_not_copied = 0
 
+
+def main(
+    options: argparse.Namespace | None = None,
+) -> tuple[ftp_pool.FtpSessionPool, int, int]:
+    """Функция
+        main(options: argparse.Namespace | None = None) -> tuple[FtpSessionPool, int, int]
+    Назначение
+        Файлы, существующие на FTP сервере и отсутствующие в директории компьютера,
+        записываются в поддиректорию.
+        Если задан файл заданий, так обрабатываются все пары директорий из него.
+    Аргумент:
+        options - Параметры программы. Если не заданы, берутся из командной строки.
+    Результат:
+        tuple, состоящий из 3 элементов:
+        1. Сессии с FTP сервером
+        2. Количество скопированных файлов
+        3. Количество не скопированных файлов.
+    """
+    if options is None:
+        set_logging()
+        options = get_options(argv[1:])
+
+    started = datetime.now()
+    list_jobs, VPN_connected, stop_list_files = prepare_jobs(options)
+    pool = get_pool(options)
+    control = rate_limit.TransferControl(pool, options.rate, options.adaptive)
     try:
-        _, local_dir, ftp_dir = argv
-    except ValueError:
+        run_jobs(list_jobs, pool, options, VPN_connected, stop_list_files, control)
+    except BaseException:
+        pool.quit()
+        raise
+    metrics.write_reports(options, list_jobs, started)
+
+    count_of_files_copied = sum(job.count_of_files_copied for job in list_jobs)
+    count_of_files_not_copied = sum(job.count_of_files_not_copied for job in list_jobs)
+    retries = sum(job.retries for job in list_jobs)
+    reconnects = sum(job.reconnects for job in list_jobs)
+    if retries or reconnects:
+        logging.info(
+            f"Повторных попыток скачивания: {retries}\n"
+            f"Повторных подключений к FTP серверу: {reconnects}"
+        )
+    failed_jobs = [job for job in list_jobs if job.error is not None]
+    if len(list_jobs) > 1:
+        logging.info("Итоги заданий:\n" + "\n".join(job.summary() for job in list_jobs))
+    if failed_jobs:
+        pool.quit()
+        if len(list_jobs) == 1:
+            raise failed_jobs[0].error
         raise f.MyException(
-            "Программе передано неверное количество параметров.\n"
-            "Программа принимает 2 параметра:\n"
-            "1. Имя директории локального диска с дистрибутивом обновлений, например,\n"
-            "   c:\\Дистрибутив\\PREPARE\n"
-            "2. Имя директории FTP сервера Галактика, например,\n"
-            "   /pub/support/galaktika/bug_fix/GAL910/UPDATES/\n",
-            777,
+            f"Не выполнено заданий: {len(failed_jobs)} из {len(list_jobs)}",
+            max(job.error.ret_code for job in failed_jobs),
         )
-    logging.info(Path(ftp_dir).name)
+
+    print("\r")
+    return pool, count_of_files_copied, count_of_files_not_copied
+
+
+def watch(options: argparse.Namespace) -> None:
+    """Функция watch(options: argparse.Namespace) -> None
+    Режим наблюдения: через каждые options.watch секунд проверяет,
+    изменились ли директории FTP сервера, и синхронизирует изменившиеся.
+    Работает без вопросов оператору до прерывания (Ctrl+C).
+    Ошибки цикла записываются в журнал и не прекращают наблюдение.
+    """
+    logging.info(f"Режим наблюдения: проверка FTP сервера каждые {options.watch} с")
+    pool = get_pool(options)
+    control = rate_limit.TransferControl(pool, options.rate, options.adaptive)
+    watch_state: dict[tuple[str, str], str] = dict()
+    try:
+        while True:
+            watch_cycle(options, pool, control, watch_state)
+            # Сервер закрывает простаивающие сессии - между циклами они не хранятся
+            pool.quit()
+            time.sleep(options.watch)
+    finally:
+        pool.quit()
+
+
+def watch_cycle(
+    options: argparse.Namespace,
+    pool: ftp_pool.FtpSessionPool,
+    control: rate_limit.TransferControl,
+    watch_state: dict[tuple[str, str], str],
+) -> None:
+    """Функция watch_cycle(options, pool, control, watch_state) -> None
+        Цикл режима наблюдения. Синхронизирует только задания, директория FTP
+        сервера которых изменилась с последней успешной синхронизации.
+        Ошибка проверки директории задания (в том числе потеря сессии)
+        записывается в журнал, задание проверяется снова в следующем цикле.
+        Директории зеркал сверяются с эталоном заново в каждом цикле.
+    :param
+        1. options: Namespace           - Параметры программы
+        2. pool: FtpSessionPool         - Общий пул сессий с FTP сервером
+        3. control: TransferControl     - Управление скоростью скачивания
+        4. watch_state: dict            - (local_dir, ftp_dir) -> состояние директории
+                                          FTP сервера при последней успешной синхронизации
+    """
+    if pool.mirrors is not None:
+        pool.mirrors.forget()
+    try:
+        list_jobs, VPN_connected, stop_list_files = prepare_jobs(options)
+    except f.MyException as e:
+        logging.error(e.text_err)
+        return
+
+    changed_jobs = []
+    for job in list_jobs:
+        key = (job.local_dir, job.ftp_dir)
+        try:
+            state = get_changed_state(pool, job, watch_state.get(key))
+        except (f.MyException, *all_errors) as e:
+            # Сессия потеряна (тайм-аут, обрыв, 4xx): состояние задания
+            # не меняется, и директория проверяется в следующем цикле
+            logging.error(f"{job.ftp_dir}: {getattr(e, 'text_err', e)!s}")
+            continue
+        if state is not None:
+            changed_jobs.append((job, key, state))
+
+    if not changed_jobs:
+        return
+
+    started = datetime.now()
+    run_jobs(
+        [job for job, _, _ in changed_jobs],
+        pool,
+        options,
+        VPN_connected,
+        stop_list_files,
+        control,
+    )
+    metrics.write_reports(options, [job for job, _, _ in changed_jobs], started)
+    for job, key, state in changed_jobs:
+        logging.info(job.summary())
+        if job.error is None and job.count_of_files_not_copied == 0:
+            watch_state[key] = state
+
+
+def get_changed_state(
+    pool: ftp_pool.FtpSessionPool, job: jobs.SyncJob, last_state: str | None
+) -> str | None:
+    """Функция get_changed_state(pool, job, last_state) -> str | None
+        Дешёвая проверка изменения директории FTP сервера.
+        Если сервер сообщает время изменения директории (MDTM), сравнивается оно,
+        и при совпадении директория не читается. Иначе сравнивается
+        отпечаток снимка директории. Прочитанный снимок сохраняется в задании.
+    :return:
+        Новое состояние директории или None, если директория не изменилась.
+    """
+    with pool.session(job.ftp_dir) as ftp, job.metrics.phase("listing"):
+        dir_modify = ftp_listing.get_dir_modify(ftp, job.ftp_dir)
+        if dir_modify is not None and f"MDTM {dir_modify}" == last_state:
+            return None
+        job.ftp_listing = ftp_listing.get_listing(ftp)
+
+    if dir_modify is not None:
+        return f"MDTM {dir_modify}"
+    state = f"LIST {ftp_listing.get_listing_digest(job.ftp_listing)}"
+    return None if state == last_state else state
+
+
+def prepare_jobs(
+    options: argparse.Namespace,
+) -> tuple[list[jobs.SyncJob], bool, set[str]]:
+    """Функция prepare_jobs(options) -> tuple[list[SyncJob], bool, set[str]]
+        Формирует задания из параметров программы и проверяет их поддиректории NEW.
+    :param
+        options: Namespace   - Параметры программы
+    :return:
+        (Задания, Подключен ли VPN, Стоп лист)
+    """
+    list_jobs = get_jobs(options)
+    VPN_connected = is_VPN_connected()
+    stop_list_files = selection_stop_list_files(VPN_connected=VPN_connected)
+    for job in list_jobs:
+        job.local_subdir = check_local_subdir(name_local_dir=job.local_dir)
+    return list_jobs, VPN_connected, stop_list_files
+
+
+def get_jobs(options: argparse.Namespace) -> list[jobs.SyncJob]:
+    """Функция get_jobs(options: argparse.Namespace) -> list[SyncJob]
+    Задания из параметров программы: пара директорий, файл заданий
+    или план синхронизации (--apply-plan, задания с готовыми планами).
+    """
+    if options.apply_plan:
+        return [
+            jobs.SyncJob(local_dir=plan.local_dir, ftp_dir=plan.ftp_dir, plan=plan)
+            for plan in planning.read_plan(options.apply_plan)
+        ]
+    if options.jobs:
+        return jobs.read_jobs_file(options.jobs)
+    return [jobs.SyncJob(local_dir=options.local_dir, ftp_dir=options.ftp_dir)]
+
+
+def dry_run(options: argparse.Namespace) -> None:
+    """Функция dry_run(options: argparse.Namespace) -> None
+    Составляет план синхронизации, ничего не скачивая (--plan):
+    читает директории FTP сервера и локальные директории, применяет стоп лист,
+    учитывает уже скачанные в NEW файлы и версии компонент (--latest).
+    Поддиректории NEW не создаются и не меняются, вопросы оператору не задаются.
+    План (файлы к скачиванию, пропускаемые файлы с причинами, объём и оценка
+    продолжительности по скорости из отчёта --report) записывается в JSON
+    и может быть выполнен позже без повторного чтения директорий (--apply-plan).
+    """
+    list_jobs = get_jobs(options)
     VPN_connected = is_VPN_connected()
-    local_subdir = check_local_subdir(name_local_dir=local_dir)
-    already_copied_files = selection_already_copied_files(local_subdir=local_subdir)
     stop_list_files = selection_stop_list_files(VPN_connected=VPN_connected)
-    local_files = get_local_files(local_dir=local_dir)
+    pool = get_pool(options)
+    try:
+        for job in list_jobs:
+            local_manifest = get_manifest(directory=Path(job.local_dir))
+            job.plan = plan_job(
+                job,
+                pool,
+                options,
+                VPN_connected,
+                stop_list_files,
+                local_files=local_manifest.names(),
+                already_copied_files=read_already_copied_files(job.local_dir),
+            )
+    finally:
+        pool.quit()
 
-    ftp = connect_to_ftp(
-        ftp_site=c.FTP_SITE, ftp_dir=ftp_dir, user=c.USER, password=c.PASSWORD
+    throughput = planning.get_recent_throughput(options.report)
+    if options.rate is not None:
+        throughput = min(throughput or float("inf"), options.rate * 1024)
+    plans = [job.plan for job in list_jobs]
+    try:
+        planning.write_plan(options.plan, plans, throughput)
+    except OSError as e:
+        raise f.MyException(f"Не могу записать план {options.plan}\n{e}", 777)
+
+    size = sum(plan.bytes() for plan in plans)
+    estimate = planning.get_estimate(size, throughput)
+    logging.info(
+        f"План синхронизации записан в {options.plan}\n"
+        f"Файлов к скачиванию: {sum(len(plan.files_to_copy) for plan in plans)}, "
+        f"{size} байт\n"
+        + (
+            f"Оценка продолжительности скачивания: {estimate} с"
+            if estimate is not None
+            else "Скорость скачивания неизвестна (нет отчёта --report)"
+        )
     )
-    ftp_files = ftp.nlst()
 
-    for ftp_file in ftp_files:
-        if ftp_file not in local_files and ftp_file not in already_copied_files:
-            if not VPN_connected and is_stop_list_file(ftp_file, stop_list_files):
-                count_of_files_not_copied += 1
-                logging.info(
-                    f"Файл {ftp_file} в стоп списке:\nФайл {ftp_file} не скопирован\n"
+
+def plan_job(
+    job: jobs.SyncJob,
+    pool: ftp_pool.FtpSessionPool,
+    options: argparse.Namespace,
+    VPN_connected: bool,
+    stop_list_files: set[str],
+    local_files: set[str],
+    already_copied_files: set[str],
+) -> planning.JobPlan:
+    """Функция plan_job(job, pool, options, VPN_connected, stop_list_files, local_files, already_copied_files) -> JobPlan
+        Составляет план синхронизации задания: читает директорию FTP сервера
+        (если она ещё не прочитана) и SFV_FILE и выбирает файлы,
+        существующие на FTP сервере и отсутствующие в директории компьютера
+        и в поддиректории NEW (iter_plan_files). Файлы стоп листа (без VPN) и,
+        с ключом --latest, устаревшие версии компонент пропускаются. Остальные файлы
+        упорядочиваются по размеру (--order, planning.get_schedule).
+    :return:
+        План синхронизации.
+    """
+    with pool.session(job.ftp_dir) as ftp, job.metrics.phase("listing"):
+        if job.ftp_listing is None:
+            job.ftp_listing = ftp_listing.get_listing(ftp)
+        ftp_file_sizes = ftp_listing.get_file_sizes(job.ftp_listing)
+        sfv_crcs = sfv.read_sfv(ftp, ftp_file_sizes)
+
+    plan = planning.JobPlan(
+        local_dir=job.local_dir,
+        ftp_dir=job.ftp_dir,
+        ftp_file_sizes=ftp_file_sizes,
+        sfv_crcs=sfv_crcs,
+    )
+    if options.latest:
+        plan.superseded_files = planning.get_superseded_files(
+            ftp_file_sizes, local_files
+        )
+        if plan.superseded_files:
+            logging.info(
+                f"Устаревших версий компонент не скачивается и не сверяется: "
+                f"{len(plan.superseded_files)}"
+            )
+
+    for _ in iter_plan_files(
+        plan,
+        job.ftp_listing.values(),
+        VPN_connected,
+        stop_list_files,
+        local_files,
+        already_copied_files,
+    ):
+        pass
+    plan.files_to_copy = planning.get_schedule(
+        plan.files_to_copy, ftp_file_sizes, options.order
+    )
+    return plan
+
+
+def is_streamed(job: jobs.SyncJob, options: argparse.Namespace) -> bool:
+    """Функция is_streamed(job: SyncJob, options: argparse.Namespace) -> bool
+    Можно ли скачивать файлы задания, пока директория FTP сервера ещё читается
+    (stream_job): плана ещё нет, и ему не нужна вся директория сразу -
+    файлы скачиваются в порядке директории (--order listing), без --latest
+    и без хранилища --store.
+    """
+    return (
+        job.plan is None
+        and options.order == "listing"
+        and not options.latest
+        and not options.store
+    )
+
+
+def stream_job(
+    job: jobs.SyncJob,
+    pool: ftp_pool.FtpSessionPool,
+    VPN_connected: bool,
+    stop_list_files: set[str],
+    local_files: set[str],
+    already_copied_files: set[str],
+) -> Iterator[str]:
+    """Функция stream_job(job, pool, VPN_connected, stop_list_files, local_files, already_copied_files) -> Iterator[str]
+        Составляет план синхронизации задания (пустой job.plan) по мере чтения
+        директории FTP сервера и выдаёт файлы к скачиванию сразу, не дожидаясь
+        конца директории (iter_plan_files): скачивание начинается, пока директория
+        ещё читается, и память не зависит от числа файлов, которые не скачиваются.
+        SFV_FILE читается до директории. Сессия, читающая директорию, занята
+        до её конца.
+    :return:
+        Имена скачиваемых файлов в порядке директории.
+    """
+    plan = job.plan
+    with pool.session(job.ftp_dir) as ftp:
+        with job.metrics.phase("listing"):
+            plan.sfv_crcs.update(
+                sfv.read_sfv(
+                    ftp,
+                    (
+                        ftp_listing.get_file_sizes(job.ftp_listing)
+                        if job.ftp_listing is not None
+                        else None
+                    ),
                 )
-                continue
-            if copy_from_ftp_file(ftp, ftp_file, local_subdir):
-                count_of_files_copied += 1
-            else:
-                count_of_files_not_copied += 1
+            )
+        entries = (
+            job.ftp_listing.values()
+            if job.ftp_listing is not None
+            else ftp_listing.iter_listing(ftp)
+        )
+        with contextlib.closing(
+            iter_plan_files(
+                plan,
+                entries,
+                VPN_connected,
+                stop_list_files,
+                local_files,
+                already_copied_files,
+            )
+        ) as ftp_files:
+            yield from ftp_files
+
+
+def iter_plan_files(
+    plan: planning.JobPlan,
+    entries: Iterable[ftp_listing.FtpEntry],
+    VPN_connected: bool,
+    stop_list_files: set[str],
+    local_files: set[str],
+    already_copied_files: set[str],
+) -> Iterator[str]:
+    """Функция iter_plan_files(plan, entries, VPN_connected, stop_list_files, local_files, already_copied_files) -> Iterator[str]
+        Стадия конвейера плана синхронизации: по мере поступления элементов
+        директории FTP сервера записывает файлы в снимок plan.ftp_file_sizes
+        (и время их изменения в plan.ftp_file_modify),
+        пропускаемые файлы - в plan.skipped с причиной, остальные добавляет
+        в plan.files_to_copy и выдаёт. Каждая проверка - поиск во множестве.
+    :param
+        1. plan: JobPlan                    - План (plan.superseded_files уже известны)
+        2. entries: Iterable[FtpEntry]      - Элементы директории FTP сервера
+        3. VPN_connected: bool              - Подключен ли VPN (без VPN - стоп лист)
+        4. stop_list_files: set[str]        - Стоп лист
+        5. local_files: set[str]            - Файлы директории компонент
+        6. already_copied_files: set[str]   - Файлы, ранее записанные в NEW
+    :return:
+        Имена скачиваемых файлов в порядке директории.
+    """
+    for entry in ftp_listing.iter_files(entries):
+        ftp_file = entry.name
+        plan.ftp_file_sizes[ftp_file] = entry.size
+        if entry.modify is not None:
+            plan.ftp_file_modify[ftp_file] = entry.modify
+        if ftp_file in plan.superseded_files:
+            plan.skipped[ftp_file] = "superseded"
+        elif ftp_file in local_files:
+            plan.skipped[ftp_file] = "exists"
+        elif ftp_file in already_copied_files:
+            plan.skipped[ftp_file] = "already_copied"
+        elif not VPN_connected and is_stop_list_file(ftp_file, stop_list_files):
+            plan.skipped[ftp_file] = "stop_list"
+            logging.info(
+                f"Файл {ftp_file} в стоп списке:\nФайл {ftp_file} не скопирован\n"
+            )
+        else:
+            plan.files_to_copy.append(ftp_file)
+            yield ftp_file
 
-    if count_of_files_copied != 0 and Path(ftp_dir).name == "UPDATES":
-        if copy_from_ftp_file(ftp, "UPDATES.sfv", local_subdir):
-            count_of_files_copied += 1
 
-    if count_of_files_not_copied == 0 and count_of_files_copied != 0:
-        logging.info(f"Переписано файлов: {count_of_files_copied}")
-        count_of_files_copied = -count_of_files_copied
-        copy_dir_to_dir(dir_from=local_subdir, dir_to=local_dir)
-        path_men.main_()
+def get_pool(options: argparse.Namespace) -> ftp_pool.FtpSessionPool:
+    """Функция get_pool(options: argparse.Namespace) -> FtpSessionPool
+    Общий пул сессий с FTP сервером на options.connections сессий.
+    Сессии открываются с зеркалами options.mirrors (по умолчанию - FTP_SITE).
+    """
+    mirror_set = mirrors.MirrorSet(
+        mirrors=(
+            mirrors.parse_mirrors(options.mirrors)
+            if options.mirrors
+            else [mirrors.Mirror(host=c.FTP_SITE, port=c.FTP_PORT)]
+        ),
+        connect=lambda mirror, ftp_dir: connect_to_ftp(
+            ftp_site=mirror.host,
+            ftp_dir=ftp_dir,
+            user=c.USER,
+            password=c.PASSWORD,
+            port=mirror.port,
+        ),
+    )
+    return ftp_pool.FtpSessionPool(
+        size=options.connections, connect=mirror_set.connect, mirrors=mirror_set
+    )
 
-    if not is_same_directories(ftp, Path(local_dir)):
-        raise f.MyException(
-            "Состав и/или размеры файлов на FTP сервере и локальном компьютере не совпали",
-            777,
+
+def run_jobs(
+    list_jobs: list[jobs.SyncJob],
+    pool: ftp_pool.FtpSessionPool,
+    options: argparse.Namespace,
+    VPN_connected: bool,
+    stop_list_files: set[str],
+    control: rate_limit.TransferControl | None = None,
+) -> None:
+    """Функция run_jobs(list_jobs, pool, options, VPN_connected, stop_list_files, control) -> None
+        Выполняет задания параллельно, каждое в своём потоке.
+        Все задания берут сессии из общего пула, что ограничивает
+        общее число параллельных обращений к FTP серверу.
+        Задания с общей поддиректорией NEW выполняются по очереди.
+        Место на дисках задания занимают в общем учёте (disk_space.DiskSpace).
+        Перед запуском директории компонент восстанавливаются по журналу
+        прошлого задания (start_journals). Если все задания директории выполнены,
+        в её журнал записывается commit.
+    :param
+        1. list_jobs: list[SyncJob]     - Задания
+        2. pool: FtpSessionPool         - Общий пул сессий с FTP сервером
+        3. options: Namespace           - Параметры программы
+        4. VPN_connected: bool          - Подключен ли VPN
+        5. stop_list_files: set[str]    - Стоп лист
+        6. control: TransferControl     - Управление скоростью скачивания
+    """
+    stop = Event()
+    path_men_lock = Lock()
+    disk = disk_space.DiskSpace()
+    dir_locks: dict[Path, Lock] = dict()
+    journals = start_journals(list_jobs)
+    threads = []
+    for job in list_jobs:
+        if job.error is not None:
+            continue
+        dir_lock = dir_locks.setdefault(job.local_subdir.resolve(), Lock())
+        threads.append(
+            Thread(
+                target=run_job_thread,
+                args=(job, pool, options, VPN_connected, stop_list_files),
+                kwargs=dict(
+                    dir_lock=dir_lock,
+                    path_men_lock=path_men_lock,
+                    stop=stop,
+                    control=control,
+                    disk=disk,
+                ),
+                daemon=True,
+            )
         )
+    for thread in threads:
+        thread.start()
 
-    print("\r")
-    return ftp, count_of_files_copied, count_of_files_not_copied
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        raise
+
+    for local_subdir, promotion_journal in journals.items():
+        if all(
+            job.error is None and job.count_of_files_not_copied == 0
+            for job in list_jobs
+            if job.local_subdir.resolve() == local_subdir
+        ):
+            promotion_journal.write("commit")
+
+
+def start_journals(
+    list_jobs: list[jobs.SyncJob],
+) -> dict[Path, journal.PromotionJournal]:
+    """Функция start_journals(list_jobs: list[SyncJob]) -> dict[Path, PromotionJournal]
+        Для каждой директории компонент заданий, по очереди до запуска заданий,
+        восстанавливает директорию по журналу прошлого задания
+        (PromotionJournal.recover: прерванный перенос доводится до конца,
+        NEW очищается после выполненного задания или сохраняется после прерванного)
+        и начинает журнал нового задания.
+        Если директорию восстановить не удалось, ошибка записывается в её задания.
+    :return:
+        Поддиректория NEW (resolve) -> журнал её директории компонент.
+    """
+    journals = dict()
+    failed = dict()
+    for job in list_jobs:
+        local_subdir = job.local_subdir.resolve()
+        if local_subdir in failed:
+            job.error = failed[local_subdir]
+            continue
+        if local_subdir in journals:
+            continue
+        promotion_journal = journal.PromotionJournal(job.local_dir)
+        try:
+            promotion_journal.recover(job.local_subdir)
+            promotion_journal.begin(
+                [item.ftp_dir for item in list_jobs if item.local_dir == job.local_dir]
+            )
+        except (OSError, f.MyException) as e:
+            failed[local_subdir] = job.error = f.MyException(
+                f"Не могу восстановить директорию {job.local_dir} по журналу "
+                f"{promotion_journal.file}\n{getattr(e, 'text_err', e)}",
+                777,
+            )
+            continue
+        journals[local_subdir] = promotion_journal
+    return journals
+
+
+def run_job_thread(
+    job: jobs.SyncJob,
+    *args,
+    dir_lock: Lock,
+    path_men_lock: Lock,
+    disk: disk_space.DiskSpace | None = None,
+    **kwargs,
+) -> None:
+    """Функция run_job_thread(job, *args, dir_lock, path_men_lock, disk, **kwargs) -> None
+    Поток задания. Выполняет задание под блокировкой его поддиректории NEW
+    и сохраняет в задании ошибку, прервавшую его выполнение.
+    Место на дисках, занятое заданием, освобождается по его окончании.
+    """
+    try:
+        with dir_lock:
+            run_job(job, *args, path_men_lock=path_men_lock, disk=disk, **kwargs)
+    except f.MyException as e:
+        job.error = e
+    except SystemExit as e:
+        job.error = f.MyException(
+            f"Программа path_men завершилась с кодом {e.code}", e.code
+        )
+    except Exception as e:
+        job.error = f.MyException(f"{e}\n{traceback.format_exc()}", 1000)
+    finally:
+        if disk is not None:
+            disk.release(job)
+
+
+def run_job(
+    job: jobs.SyncJob,
+    pool: ftp_pool.FtpSessionPool,
+    options: argparse.Namespace,
+    VPN_connected: bool,
+    stop_list_files: set[str],
+    path_men_lock: Lock,
+    stop: Event,
+    control: rate_limit.TransferControl | None = None,
+    disk: disk_space.DiskSpace | None = None,
+) -> None:
+    """Функция run_job(job, pool, options, VPN_connected, stop_list_files, path_men_lock, stop, control, disk) -> None
+    Синхронизирует директорию FTP сервера с директорией локального диска.
+    Файлы, существующие на FTP сервере и отсутствующие в директории компьютера,
+    записываются в поддиректорию, после успешного копирования переносятся
+    в директорию компонент, и директории сверяются.
+    С ключом --latest скачивается только самая свежая версия каждого компонента,
+    если она новее локальной (planning.get_superseded_files).
+    Если у задания уже есть план (--apply-plan), директории не читаются,
+    а выполняется этот план. Если плану не нужна вся директория сразу
+    (is_streamed), файлы скачиваются по мере её чтения (stream_job).
+    До начала скачивания проверяется и занимается место на томах NEW
+    и директории компонент (get_space_needs, disk), при скачивании по мере
+    чтения директории - перед постановкой каждого файла в очередь
+    (reserve_streamed). Место в NEW под файл освобождается по окончании его
+    скачивания (release_on_settle).
+    Результаты записываются в задание.
+    """
+    logging.info(Path(job.ftp_dir).name)
+    local_subdir = job.local_subdir
+    subdir_manifest = get_manifest(directory=local_subdir)
+    local_manifest = get_manifest(directory=Path(job.local_dir))
+    streamed = is_streamed(job, options)
+    if streamed:
+        job.plan = planning.JobPlan(
+            local_dir=job.local_dir,
+            ftp_dir=job.ftp_dir,
+            ftp_file_sizes=dict(),
+            sfv_crcs=dict(),
+        )
+    elif job.plan is None:
+        job.plan = plan_job(
+            job,
+            pool,
+            options,
+            VPN_connected,
+            stop_list_files,
+            local_files=local_manifest.names(),
+            already_copied_files=selection_already_copied_files(subdir_manifest),
+        )
+    plan = job.plan
+    ftp_file_sizes = plan.ftp_file_sizes
+    sfv_crcs = plan.sfv_crcs
+    if disk is None:
+        disk = disk_space.DiskSpace()
+    context = download.DownloadContext(
+        ftp_file_sizes=ftp_file_sizes,
+        sfv_crcs=sfv_crcs,
+        local_subdir=local_subdir,
+        ftp_dir=job.ftp_dir,
+        stop=stop,
+        control=control,
+        job_metrics=job.metrics,
+        mirror_set=pool.mirrors,
+        segments=options.segments,
+        ftp_file_modify=plan.ftp_file_modify,
+    )
+
+    if streamed:
+        files_to_copy = reserve_streamed(
+            stream_job(
+                job,
+                pool,
+                VPN_connected,
+                stop_list_files,
+                local_files=local_manifest.names(),
+                already_copied_files=selection_already_copied_files(subdir_manifest),
+            ),
+            job,
+            context,
+            disk,
+        )
+    else:
+        files_to_copy = planning.get_schedule(
+            plan.files_to_copy, ftp_file_sizes, options.order
+        )
+        if options.store:
+            linked_files = link_from_store(
+                options.store, files_to_copy, ftp_file_sizes, sfv_crcs, local_subdir
+            )
+            job.count_of_files_copied += len(linked_files)
+            files_to_copy = [name for name in files_to_copy if name not in linked_files]
+        subdir_needs = release_on_settle(job, context, disk)
+        file_needs = get_file_needs(files_to_copy, ftp_file_sizes, local_subdir)
+        disk.reserve(
+            job,
+            get_space_needs(
+                file_needs,
+                ftp_file_sizes,
+                local_subdir=local_subdir,
+                promote_dir=get_promote_dir(local_subdir, job.local_dir),
+                promoted_files=plan.get_skipped("already_copied"),
+            ),
+        )
+        subdir_needs.update(file_needs)
+
+    engine_download_files = (
+        ftp_async.download_files if options.engine == "asyncio" else download_files
+    )
+    with job.metrics.phase("download"):
+        copied, not_copied = engine_download_files(
+            ftp_files=files_to_copy, context=context, pool=pool
+        )
+    if stop.is_set():
+        raise f.MyException("Программа прервана оператором", 1000)
+    job.count_of_files_not_copied += plan.count_skipped("stop_list")
+    job.count_of_files_copied += copied
+    job.count_of_files_not_copied += not_copied
+    if options.store and copied:
+        add_to_store(options.store, files_to_copy, local_subdir)
+    subdir_manifest.update(get_download_names(plan.files_to_copy))
+
+    if job.count_of_files_copied != 0 and Path(job.ftp_dir).name == "UPDATES":
+        with job.metrics.phase("download"):
+            if copy_with_retry(pool, c.SFV_FILE, context):
+                job.count_of_files_copied += 1
+        subdir_manifest.update(get_download_names([c.SFV_FILE]))
+    job.retries += context.counts["retries"]
+    job.reconnects += context.counts["reconnects"]
+
+    if job.count_of_files_not_copied == 0 and job.count_of_files_copied != 0:
+        logging.info(f"Переписано файлов: {job.count_of_files_copied}")
+        job.count_of_files_copied = -job.count_of_files_copied
+        promotion_journal = journal.PromotionJournal(job.local_dir)
+        with job.metrics.phase("promote"):
+            copy_dir_to_dir(
+                dir_from=subdir_manifest,
+                dir_to=local_manifest,
+                promotion_journal=promotion_journal,
+            )
+        with path_men_lock, job.metrics.phase("path_men"):
+            path_men.main_(
+                job.local_dir,
+                interactive=options.watch is None,
+                components_manifest=local_manifest,
+                promotion_journal=promotion_journal,
+            )
+
+    with pool.session(job.ftp_dir) as ftp, job.metrics.phase("verify"):
+        if not is_same_directories(
+            ftp, ftp_file_sizes, local_manifest, plan.superseded_files
+        ):
+            raise f.MyException(
+                "Состав и/или размеры файлов на FTP сервере и локальном компьютере не совпали",
+                777,
+            )
+
+
+class OptionsParser(argparse.ArgumentParser):
+    """Разбор параметров программы.
+    Ошибка в параметрах завершает программу через MyException, как и остальные ошибки.
+    """
+
+    def error(self, message: str):
+        raise f.MyException(f"{c.TEXT_FTP_PARAMETERS}\n{message}", 777)
 
 
-def selection_stop_list_files(VPN_connected: bool) -> list:
-    """Функция selection_stop_list_files(VPN_connected:bool) -> list:
-        Формирует список файлов, которые не надо переписывать с FTP сервера
+def get_options(args: list[str]) -> argparse.Namespace:
+    """Функция get_options(args: list[str]) -> argparse.Namespace
+        Разбирает параметры программы.
+    :param
+        args: параметры программы (без имени программы)
+    :return:
+        local_dir   - Имя директории локального диска с дистрибутивом обновлений
+        ftp_dir     - Имя директории FTP сервера Галактика
+        jobs        - Файл заданий (пар директорий) вместо local_dir и ftp_dir
+        engine      - Механизм скачивания файлов: ftplib или asyncio
+        connections - Количество параллельных сессий с FTP сервером
+        watch       - Период опроса FTP сервера в режиме наблюдения, секунд
+        rate        - Ограничение общей скорости скачивания, КБ/с
+        adaptive    - Подбирать ли число параллельных передач по скорости
+        report      - Файл отчёта о запусках (JSON Lines, дописывается)
+        prometheus  - Файл показателей последнего запуска для Prometheus
+        latest      - Скачивать ли только самые свежие версии компонент
+        store       - Директория хранилища содержимого файлов
+        plan        - Файл плана синхронизации: только составить план (dry-run)
+        apply_plan  - Файл плана синхронизации: выполнить его без чтения директорий
+        mirrors     - Зеркала FTP сервера вместо FTP_SITE: адреса через запятую
+        segments    - Наибольшее число участков, скачиваемых параллельно, большого файла
+        order       - Порядок скачивания файлов: largest, smallest или listing
+    """
+    parser = OptionsParser(description=c.TEXT_FTP_PARAMETERS)
+    parser.add_argument("local_dir", nargs="?")
+    parser.add_argument("ftp_dir", nargs="?")
+    parser.add_argument("--jobs")
+    parser.add_argument("--engine", choices=c.FTP_ENGINES, default=c.FTP_ENGINES[0])
+    parser.add_argument("--connections", type=int, default=c.FTP_CONNECTIONS)
+    parser.add_argument("--watch", type=int)
+    parser.add_argument("--rate", type=int)
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--report")
+    parser.add_argument("--prometheus")
+    parser.add_argument("--latest", action="store_true")
+    parser.add_argument("--store")
+    parser.add_argument("--plan")
+    parser.add_argument("--apply-plan")
+    parser.add_argument("--mirrors")
+    parser.add_argument("--segments", type=int, default=c.SEGMENT_COUNT)
+    parser.add_argument(
+        "--order", choices=c.SCHEDULE_ORDERS, default=c.SCHEDULE_ORDERS[0]
+    )
+    options = parser.parse_args(args)
+    if options.mirrors is not None:
+        try:
+            mirrors.parse_mirrors(options.mirrors)
+        except ValueError as e:
+            parser.error(f"Список зеркал (--mirrors): {e}")
+    if options.connections < 1:
+        parser.error("Количество сессий (--connections) должно быть больше 0")
+    if options.segments < 1:
+        parser.error("Количество участков (--segments) должно быть больше 0")
+    if options.watch is not None and options.watch < 1:
+        parser.error("Период опроса (--watch) должен быть больше 0 секунд")
+    if options.rate is not None and options.rate < 1:
+        parser.error("Ограничение скорости (--rate) должно быть больше 0 КБ/с")
+    if options.apply_plan is not None:
+        if options.jobs is not None or options.local_dir is not None:
+            parser.error("План --apply-plan задан вместе с директориями или --jobs")
+        if options.plan is not None or options.watch is not None:
+            parser.error("План --apply-plan выполняется без --plan и --watch")
+        return options
+    if options.plan is not None and options.watch is not None:
+        parser.error("План --plan составляется без режима наблюдения --watch")
+    if options.jobs is None and options.ftp_dir is None:
+        parser.error("Не заданы директории (или файл заданий --jobs)")
+    if options.jobs is not None and options.local_dir is not None:
+        parser.error("Директории и файл заданий --jobs заданы одновременно")
+    return options
+
+
+def selection_stop_list_files(VPN_connected: bool) -> set[str]:
+    """Функция selection_stop_list_files(VPN_connected:bool) -> set[str]:
+        Формирует множество файлов, которые не надо переписывать с FTP сервера
         (Стоп лист)
     :param
         VPN_connected: Если VPN подключен надо формировать пустой стоп лист
     :return:
-        Список файлов, которые не надо переписывать с FTP сервера (стоп лист)
+        Имена файлов без версий, которые не надо переписывать с FTP сервера (стоп лист)
     """
     if not VPN_connected:
-        stop_list_files = []
+        stop_list_files = set()
         with open(c.FILE_STOP_LIST) as file_stop_list:
             for line in file_stop_list:
                 name = f.reset_component_version(line)
-                stop_list_files.append(name)
+                stop_list_files.add(name)
         logging.info("VPN не подключен\n" "Файлы из STOP листа копироваться не будут")
         return stop_list_files
-    return list()
+    return set()
 
 
-def selection_already_copied_files(local_subdir: Path) -> list:
-    """Функция selection_already_copied_files(local_subdir: Path) -> list:
-        Формирует список файлов, ранее записанных в поддиректорию NEW.
+def selection_already_copied_files(subdir_manifest: manifest.Manifest) -> set[str]:
+    """Функция selection_already_copied_files(subdir_manifest: Manifest) -> set[str]:
+        Формирует множество файлов, ранее записанных в поддиректорию NEW.
         Эти файлы с FTP сервера повторно записываться не будут.
     :param
-        local_subdir: поддиректория для новых файлов - NEW
+        subdir_manifest: индекс поддиректории для новых файлов - NEW
     :return:
-        Список имён файлов
+        Множество имён файлов
     """
-    existing_files = []
-    for file in local_subdir.glob("*.*"):
-        if file.is_file():
-            existing_files.append(file.name)
-    return existing_files
-
-
-def my_exit(ftp: FTP, ret_code: int):
+    return {
+        entry.name
+        for entry in subdir_manifest.files("*.*")
+        if not entry.name.endswith(c.PART_SUFFIX)
+    }
+
+
+def read_already_copied_files(local_dir: str) -> set[str]:
+    """Функция read_already_copied_files(local_dir: str) -> set[str]
+        Формирует множество файлов, ранее записанных в поддиректорию NEW,
+        не создавая поддиректорию и её индекс (для плана синхронизации).
+        Если прошлое задание по журналу выполнено, следующий запуск очистит NEW,
+        и множество пусто.
+    :param
+        local_dir: директория компонент
+    :return:
+        Множество имён файлов
+    """
+    local_subdir = Path(local_dir, c.SUB_DIR_NEW)
+    if not local_subdir.is_dir():
+        return set()
+    if journal.PromotionJournal(local_dir).state() == "committed":
+        return set()
+    with os.scandir(local_subdir) as dir_entries:
+        return {
+            dir_entry.name
+            for dir_entry in dir_entries
+            if dir_entry.is_file()
+            and "." in dir_entry.name
+            and not dir_entry.name.endswith(c.PART_SUFFIX)
+            and not manifest.is_manifest_file(dir_entry.name)
+        }
+
+
+def my_exit(ftp: ftp_pool.FtpSessionPool, ret_code: int, interactive: bool = True):
     """
     Функция my_exit(ret_code):
     Назначение:
         Разрывает соединение с FTP сервером и завершает работу программы
     Аргументы:
-        1. ftp: FTP         - FTP сервер
+        1. ftp: FtpSessionPool  - Сессии с FTP сервером
         2. ret_code: int    - код возврата
+        3. interactive: bool    - Если False - завершение без ожидания Enter
     Результат:
         None
     """
@@ -203,6 +1013,9 @@ def my_exit(ftp: FTP, ret_code: int):
     except Exception:
         pass
 
+    if not interactive:
+        exit(ret_code)
+
     try:
         input("Для завершения работы нажмите клавишу Enter\n")
     except KeyboardInterrupt:
@@ -210,20 +1023,24 @@ def my_exit(ftp: FTP, ret_code: int):
     exit(ret_code)
 
 
-def connect_to_ftp(ftp_site: str, ftp_dir: str, user: str, password: str) -> FTP:
+def connect_to_ftp(
+    ftp_site: str, ftp_dir: str, user: str, password: str, port: int | None = None
+) -> FTP:
     """Функция
-        connect_to_ftp(ftp_site: str, ftp_dir: str, user: str, password: str) -> FTP
+        connect_to_ftp(ftp_site: str, ftp_dir: str, user: str, password: str, port) -> FTP
     Аргументы:
         1. ftp_site: str    - адрес FTP сервера
         2. ftp_dir: str     - путь на директорию на FTP сервера
         3. user: str        - login FTP сервера
         4. password:str     - пароль FTP сервера
+        5. port: int        - порт FTP сервера (по умолчанию FTP_PORT)
     Результат:
         ftp                 - FTP сервер
     """
 
     try:
-        ftp = FTP(ftp_site, timeout=c.TIME_OUT_SEC)
+        ftp = FTP(timeout=c.TIME_OUT_SEC)
+        ftp.connect(ftp_site, port or c.FTP_PORT)
         ftp.login(user=user, passwd=password)
         ftp.cwd(ftp_dir)
     except Exception as e:
@@ -235,15 +1052,16 @@ def connect_to_ftp(ftp_site: str, ftp_dir: str, user: str, password: str) -> FTP
 def check_local_subdir(name_local_dir: str) -> Path:
     """Функция:
         check_local_subdir(name_local_dir: str) -> Path
-    Аргумент:
+    Аргументы:
         name_local_dir: str - имя директории, в которой создаётся поддиректория.
     Результат:
         Проверенная поддиректория.
+        Непустая поддиректория оператору не показывается: очистить её
+        или продолжить в неё скачивание, решается по журналу задания (start_journals).
     """
     local_subdir = Path(name_local_dir, c.SUB_DIR_NEW)
     if local_subdir.exists():
         if local_subdir.is_dir():
-            f.confirm_if_needed(local_subdir)
             return local_subdir
         else:
             raise f.MyException(
@@ -260,30 +1078,226 @@ def check_local_subdir(name_local_dir: str) -> Path:
     return local_subdir
 
 
-def get_local_files(local_dir: str) -> set:
+def get_manifest(directory: Path) -> manifest.Manifest:
     """Функция:
-        get_local_files() -> set
+        get_manifest(directory: Path) -> Manifest
     Аргумент:
-        local_dir: str - Полный путь на локальную директорию
+        directory: Path - Полный путь на локальную директорию
     Результат:
-        Множество имён файлов директории
+        Индекс файлов директории, приведённый в соответствие с директорией
     """
 
     try:
-        directory_files = Path(local_dir)
-        list_files = [file.name for file in directory_files.iterdir() if file.is_file()]
+        return manifest.Manifest(directory)
     except Exception as e:
-        raise f.MyException(f"Нет доступа к директории {local_dir}\n{e}", 777)
+        raise f.MyException(f"Нет доступа к директории {directory}\n{e}", 777)
 
-    return set(list_files)
+
+def get_download_names(ftp_files: list[str]) -> list[str]:
+    """Функция get_download_names(ftp_files: list[str]) -> list[str]
+    Имена файлов, которые скачивание может создать или удалить в поддиректории NEW:
+    сами файлы, их незавершённые копии (PART_SUFFIX) со сведениями об источнике
+    и файлы скачивания по участкам.
+    Ими обновляется индекс NEW, чтобы не читать поддиректорию заново.
+    """
+    return ftp_files + [
+        ftp_file + suffix + c.PART_SUFFIX
+        for ftp_file in ftp_files
+        for suffix in ("", c.SEGMENT_SUFFIX, c.SEGMENT_MAP_SUFFIX, c.PART_SOURCE_SUFFIX)
+    ]
+
+
+def get_file_needs(
+    files_to_copy: Iterable[str], ftp_file_sizes: dict[str, int], local_subdir: Path
+) -> dict[str, int]:
+    """Функция get_file_needs(files_to_copy, ftp_file_sizes, local_subdir) -> dict[str, int]
+    Сколько байт запишет в поддиректорию NEW скачивание каждого файла:
+    размер из снимка директории FTP сервера без уже скачанной части.
+    """
+    return {
+        name: max(
+            0,
+            (ftp_file_sizes.get(name) or 0)
+            - download.get_downloaded_size(local_subdir, name),
+        )
+        for name in files_to_copy
+    }
+
+
+def get_space_needs(
+    file_needs: dict[str, int],
+    ftp_file_sizes: dict[str, int],
+    local_subdir: Path,
+    promote_dir: Path | None,
+    promoted_files: Iterable[str] = (),
+) -> dict[Path, int]:
+    """Функция get_space_needs(file_needs, ftp_file_sizes, local_subdir, promote_dir, promoted_files) -> dict[Path, int]
+        Сколько места на дисках займёт задание, по размерам из снимка директории
+        FTP сервера ftp_file_sizes:
+        1. в поддиректории NEW - скачиваемые файлы без уже скачанных частей
+           (file_needs: имя файла -> байт, get_file_needs);
+        2. в директории компонент promote_dir, если она на другом томе
+           (get_promote_dir: перенос из NEW копирует файлы, а не создаёт ссылки),
+           - скачиваемые файлы и файлы promoted_files, скачанные в NEW ранее.
+    :return:
+        Директория -> сколько байт в неё будет записано.
+    """
+    needs = {local_subdir: sum(file_needs.values())}
+    if promote_dir is not None:
+        needs[promote_dir] = sum(
+            ftp_file_sizes.get(name) or 0
+            for name in itertools.chain(file_needs, promoted_files)
+        )
+    return needs
 
 
-def is_stop_list_file(ftp_file: str, stop_list_files: list[str]) -> bool:
+def get_promote_dir(local_subdir: Path, local_dir: str) -> Path | None:
+    """Функция get_promote_dir(local_subdir: Path, local_dir: str) -> Path | None
+    Директория компонент, если она на другом томе, чем NEW, и перенос
+    из NEW займёт в ней место, иначе None.
+    """
+    if promotion.is_same_device(local_subdir, Path(local_dir)):
+        return None
+    return Path(local_dir)
+
+
+def reserve_streamed(
+    ftp_files: Iterable[str],
+    job: jobs.SyncJob,
+    context: download.DownloadContext,
+    disk: disk_space.DiskSpace,
+) -> Iterator[str]:
+    """Функция reserve_streamed(ftp_files, job, context, disk) -> Iterator[str]
+        Стадия конвейера плана при скачивании по мере чтения директории:
+        перед постановкой каждого файла в очередь занимает под него место
+        на дисках (get_space_needs). Место в NEW освобождается по окончании
+        скачивания файла (release_on_settle). Место в директории компонент
+        на другом томе занято до конца задания, в конце директории к нему
+        добавляются файлы, скачанные в NEW ранее.
+    :return:
+        Имена файлов ftp_files.
+    """
+    local_subdir = job.local_subdir
+    promote_dir = get_promote_dir(local_subdir, job.local_dir)
+    subdir_needs = release_on_settle(job, context, disk)
+    for ftp_file in ftp_files:
+        file_needs = get_file_needs([ftp_file], context.ftp_file_sizes, local_subdir)
+        disk.reserve(
+            job,
+            get_space_needs(
+                file_needs, context.ftp_file_sizes, local_subdir, promote_dir
+            ),
+        )
+        subdir_needs.update(file_needs)
+        yield ftp_file
+    if promote_dir is not None:
+        disk.reserve(
+            job,
+            get_space_needs(
+                dict(),
+                context.ftp_file_sizes,
+                local_subdir,
+                promote_dir,
+                promoted_files=job.plan.get_skipped("already_copied"),
+            ),
+        )
+
+
+def release_on_settle(
+    job: jobs.SyncJob, context: download.DownloadContext, disk: disk_space.DiskSpace
+) -> dict[str, int]:
+    """Функция release_on_settle(job, context, disk) -> dict[str, int]
+        Освобождает место в NEW, занятое под файл, по окончании его скачивания
+        (context.on_settle): записанное уже уменьшило свободное место тома,
+        и параллельные задания не должны учитывать его дважды.
+    :return:
+        Словарь занятого места: имя файла -> байт в NEW, заполняется вызывающим
+        после disk.reserve.
+    """
+    subdir_needs: dict[str, int] = dict()
+
+    def release(ftp_file: str) -> None:
+        size = subdir_needs.pop(ftp_file, 0)
+        if size:
+            disk.release(job, {job.local_subdir: size})
+
+    context.on_settle = release
+    return subdir_needs
+
+
+def get_blob_store(directory: str) -> blob_store.BlobStore:
+    """Функция get_blob_store(directory: str) -> BlobStore
+    Открывает хранилище содержимого файлов.
+    """
+    try:
+        return blob_store.BlobStore(directory)
+    except Exception as e:
+        raise f.MyException(f"Нет доступа к хранилищу {directory}\n{e}", 777)
+
+
+def link_from_store(
+    store_dir: str,
+    ftp_files: list[str],
+    ftp_file_sizes: dict[str, int],
+    sfv_crcs: dict[str, int],
+    local_subdir: Path,
+) -> set[str]:
+    """Функция link_from_store(store_dir, ftp_files, ftp_file_sizes, sfv_crcs, local_subdir) -> set[str]
+        Файлы, содержимое которых уже есть в хранилище (совпали размер и CRC32 из SFV_FILE,
+        а без контрольной суммы - имя и размер на FTP сервере), не скачиваются:
+        в поддиректории создаются жёсткие ссылки на содержимое хранилища.
+        Сам SFV_FILE в хранилище не хранится.
+    :return:
+        Имена файлов, взятых из хранилища.
+    """
+    linked_files = set()
+    with contextlib.closing(get_blob_store(store_dir)) as store:
+        for ftp_file in ftp_files:
+            if ftp_file == c.SFV_FILE:
+                continue  # Меняется с каждым выпуском, контрольной суммы нет
+            blob = store.find(
+                ftp_file, ftp_file_sizes.get(ftp_file), sfv.get_crc(sfv_crcs, ftp_file)
+            )
+            if blob is not None:
+                store.link(blob, Path(local_subdir, ftp_file))
+                linked_files.add(ftp_file)
+        if linked_files:
+            logging.info(
+                f"Взято из хранилища вместо скачивания: {store.stats.linked_files} "
+                f"({store.stats.linked_bytes} байт)"
+            )
+    return linked_files
+
+
+def add_to_store(store_dir: str, ftp_files: list[str], local_subdir: Path) -> None:
+    """Функция add_to_store(store_dir: str, ftp_files: list[str], local_subdir: Path) -> None
+    Добавляет скачанные файлы в хранилище содержимого файлов.
+    Файл, содержимое которого в хранилище уже есть, заменяется ссылкой на него.
+    Ошибка хранилища не прерывает задание: файл остаётся только в поддиректории.
+    """
+    with contextlib.closing(get_blob_store(store_dir)) as store:
+        for ftp_file in ftp_files:
+            local_file = Path(local_subdir, ftp_file)
+            if ftp_file == c.SFV_FILE or not local_file.exists():
+                continue
+            try:
+                store.add(local_file)
+            except Exception as e:
+                logging.warning(f"Файл {ftp_file} не добавлен в хранилище: {e}")
+        if store.stats.added_files or store.stats.shared_files:
+            logging.info(
+                f"Добавлено в хранилище: {store.stats.added_files} "
+                f"({store.stats.added_bytes} байт), уже было в хранилище: "
+                f"{store.stats.shared_files} ({store.stats.shared_bytes} байт)"
+            )
+
+
+def is_stop_list_file(ftp_file: str, stop_list_files: set[str]) -> bool:
     """Функция is_stop_list_file(ftp_file, stop_list_files) -> bool:
         Проверяет входит ли файл в стоп лист.
     :param
         ftp_file:           Имя файла
-        stop_list_files:    Список имён файлов стоп листа
+        stop_list_files:    Множество имён файлов стоп листа
     :return:
         True если файл входит в стоп лист, False - если не входит.
     """
@@ -291,14 +1305,212 @@ def is_stop_list_file(ftp_file: str, stop_list_files: list[str]) -> bool:
     return True if name in stop_list_files else False
 
 
-def copy_from_ftp_file(ftp: FTP, ftp_file: str, local_subdir: Path) -> bool:
-    """Функция: copy_from_ftp_file(ftp: FTP, ftp_file: str, local_subdir: Path) -> bool
+def download_files(
+    ftp_files: Iterable[str],
+    context: download.DownloadContext,
+    pool: ftp_pool.FtpSessionPool,
+) -> tuple[int, int]:
+    """Функция download_files(ftp_files, context, pool) -> tuple[int, int]
+        Скачивает файлы с FTP сервера в поддиректорию NEW.
+        Очередь файлов параллельно обрабатывают потоки (не больше размера пула),
+        каждый из которых берёт для файла сессию из общего пула.
+        Файлы ставятся в очередь по мере их выдачи ftp_files, так что скачивание
+        начинается, пока конвейер плана (iter_plan_files) ещё читает директорию;
+        конец очереди отмечается для каждого потока значением None.
+        Если ftp_files прерывается ошибкой, уже поставленные в очередь файлы
+        скачиваются, и ошибка передаётся дальше.
+    :param
+        1. ftp_files: Iterable[str]         - Имена скачиваемых файлов
+        2. context: DownloadContext         - Общие данные потоков скачивания
+        3. pool: FtpSessionPool             - Общий пул сессий с FTP сервером
+    :return:
+        (Количество скопированных файлов, Количество не скопированных файлов)
+    """
+    queue: Queue[str | None] = Queue()
+    count = len(ftp_files) if isinstance(ftp_files, list) else pool.size
+    workers = [
+        Thread(target=download_worker, args=(queue, context, pool), daemon=True)
+        for _ in range(max(1, min(pool.size, count)))
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        try:
+            for ftp_file in ftp_files:
+                if context.stop.is_set():
+                    break
+                context.schedule([ftp_file])
+                queue.put(ftp_file)
+        finally:
+            for _ in workers:
+                queue.put(None)
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=0.5)
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            context.stop.set()
+        for worker in workers:
+            worker.join()
+        raise
+
+    return context.counts["copied"], context.counts["not_copied"]
+
+
+def download_worker(
+    queue: Queue, context: download.DownloadContext, pool: ftp_pool.FtpSessionPool
+) -> None:
+    """Функция download_worker(queue, context, pool) -> None
+        Поток скачивания. Выбирает файлы из очереди и копирует их
+        через сессии из общего пула (copy_with_retry).
+    :param
+        1. queue: Queue                     - Очередь имён скачиваемых файлов
+                                              (None - конец очереди)
+        2. context: DownloadContext         - Общие данные потоков скачивания
+        3. pool: FtpSessionPool             - Общий пул сессий с FTP сервером
+    :return:
+        None
+    """
+    while not context.stop.is_set():
+        ftp_file = queue.get()
+        if ftp_file is None:
+            break
+
+        copied = False
+        try:
+            copied = copy_with_retry(pool, ftp_file, context)
+        except f.MyException as e:
+            if not context.stop.is_set():
+                logging.warning(f"{e.text_err}\nФайл {ftp_file} не скопирован\n")
+
+        if context.stop.is_set():
+            break
+        context.count(copied)
+
+
+def copy_with_retry(
+    pool: ftp_pool.FtpSessionPool, ftp_file: str, context: download.DownloadContext
+) -> bool:
+    """Функция copy_with_retry(pool, ftp_file, context) -> bool
+        Копирует файл через сессию из общего пула (файл от PREALLOCATE_MIN_SIZE
+        байт - по участкам, copy_segmented). Если сессия с FTP сервером
+        потеряна (обрыв соединения, тайм-аут, ответ 421 и другие временные ошибки),
+        она закрывается, и попытка повторяется в новой сессии: пул заново
+        подключается к серверу и переходит в директорию context.ftp_dir.
+        Попыток не больше RETRY_ATTEMPTS, паузы между ними растут (retry.get_backoff_delay).
+        Неисправной (и зеркало - отказавшим) сессия считается только при её потере:
+        несовпадение контрольной суммы, ответ 550 или остановка на зеркало не влияют.
+        Повторные попытки и подключения учитываются в счётчиках context,
+        время и объём скачивания - в показателях файла (context.new_file_metrics).
+    :param
+        1. pool: FtpSessionPool             - Общий пул сессий с FTP сервером
+        2. ftp_file: str                    - Имя файла на FTP сервере
+        3. context: DownloadContext         - Общие данные потоков скачивания
+    :return:
+        True - если файл скопирован успешно, False - если не скопирован.
+    """
+    file_metrics = context.new_file_metrics(ftp_file)
+    copied = False
+    try:
+        for attempt in range(1, c.RETRY_ATTEMPTS + 1):
+            if file_metrics is not None:
+                file_metrics.attempts = attempt
+            if attempt > 1:
+                context.add("retries")
+                if context.stop.wait(retry.get_backoff_delay(attempt - 1)):
+                    return False
+
+            try:
+                ftp = pool.acquire(context.ftp_dir)
+            except f.MyException as e:
+                logging.warning(
+                    f"{e.text_err}\n"
+                    f"Файл {ftp_file}: попытка {attempt} из {c.RETRY_ATTEMPTS} не удалась\n"
+                )
+                continue
+
+            try:
+                count = download.get_segment_count(context, ftp_file)
+                if count:
+                    copied = copy_segmented(
+                        pool, ftp, ftp_file, context, count, file_metrics
+                    )
+                else:
+                    copied = copy_from_ftp_file(
+                        ftp,
+                        ftp_file,
+                        context.local_subdir,
+                        context.stop,
+                        context.ftp_file_sizes.get(ftp_file),
+                        sfv.get_crc(context.sfv_crcs, ftp_file),
+                        context.control,
+                        file_metrics,
+                        context.ftp_file_modify.get(ftp_file),
+                    )
+            except BaseException as err:
+                if not retry.is_session_error(err):
+                    pool.release(ftp, context.ftp_dir)
+                    raise
+                pool.release(ftp, context.ftp_dir, broken=True)
+                logging.warning(
+                    f"Сессия с FTP сервером потеряна: {err!r}\n"
+                    f"Файл {ftp_file}: попытка {attempt} из {c.RETRY_ATTEMPTS} не удалась\n"
+                )
+                if attempt < c.RETRY_ATTEMPTS:
+                    context.add("reconnects")
+                continue
+
+            pool.release(ftp, context.ftp_dir)
+            return copied
+
+        logging.warning(
+            f"Файл {ftp_file} не скопирован: попытки исчерпаны ({c.RETRY_ATTEMPTS})\n"
+        )
+        return False
+    finally:
+        if file_metrics is not None:
+            file_metrics.finish(copied)
+        context.settle(ftp_file, file_metrics)
+
+
+def copy_from_ftp_file(
+    ftp: FTP,
+    ftp_file: str,
+    local_subdir: Path,
+    stop: Event | None = None,
+    ftp_size: int | None = None,
+    crc: int | None = None,
+    control: rate_limit.TransferControl | None = None,
+    file_metrics: metrics.FileMetrics | None = None,
+    ftp_modify: str | None = None,
+) -> bool:
+    """Функция: copy_from_ftp_file(ftp, ftp_file, local_subdir, stop, ftp_size, crc, control, file_metrics, ftp_modify) -> bool
     Аргументы:
         1. ftp: FTP             - FTP сервер
         2. ftp_file: str        - Имя файла с FTP сервера
         3. local_subdir: Path   - Целевая поддиректория
+        4. stop: Event          - Признак прерывания работы оператором
+        5. ftp_size: int        - Размер файла из снимка директории FTP сервера.
+                                  Если не задан, размер запрашивается командой SIZE
+        6. crc: int             - Контрольная сумма CRC32 файла из SFV_FILE.
+                                  Если не задана, контрольная сумма не проверяется
+        7. control: TransferControl - Общее ограничение скорости скачивания.
+                                  Его состояние выводится вместе с ходом скачивания
+        8. file_metrics: FileMetrics - Показатели скачивания файла: время до первого
+                                  байта, время передачи и объём, дополняются
+        9. ftp_modify: str      - Время изменения файла из снимка директории
+                                  FTP сервера (None - неизвестно)
     Назначение:
-        Копирование файла в целевую поддиректорию
+        Копирование файла в целевую поддиректорию.
+        Файл пишется в файл с суффиксом PART_SUFFIX. Если такой файл остался
+        от прерванного копирования того же файла FTP сервера (download.get_part_offset),
+        скачивание продолжается с его конца (команда REST).
+        Файл получает своё имя только после совпадения размера с размером на FTP сервере
+        и контрольной суммы, вычисляемой по ходу скачивания, с контрольной суммой из SFV.
+        При несовпадении контрольной суммы файл скачивается заново (до CRC_RETRIES раз).
+        Ошибки потери сессии (retry.is_session_error) не обрабатываются, а передаются
+        вызывающей функции, чтобы она повторила копирование в новой сессии.
     Результат:
         bool:
             True - если файл скопирован успешно.
@@ -307,36 +1519,320 @@ def copy_from_ftp_file(ftp: FTP, ftp_file: str, local_subdir: Path) -> bool:
 
     count_call = 0
     i_progress = 0
+    crc_value = 0
 
     def my_write(buffer: bytes):
         nonlocal count_call
         nonlocal i_progress
+        nonlocal crc_value
         progress = ["|", "/", "—", "\\"]
+        if stop is not None and stop.is_set():
+            raise KeyboardInterrupt
         file.write(buffer)
+        crc_value = zlib.crc32(buffer, crc_value)
+        if file_metrics is not None:
+            file_metrics.received(len(buffer))
+        if control is not None:
+            delay = control.transferred(len(buffer))
+            if delay:
+                time.sleep(delay)
         if count_call == 0:
-            print(f"\r{progress[i_progress]}", end="")
+            status = f" {control.status()}" if control is not None else ""
+            print(f"\r{progress[i_progress]}{status}", end="")
             i_progress = (i_progress + 1) % len(progress)
         count_call = (count_call + 1) % c.PRINTING_RATIO
 
     print(f"\rкопируем файл {ftp_file}")
 
-    local_file = Path(local_subdir, ftp_file)
+    part_file = download.get_part_file(local_subdir, ftp_file)
     try:
-        with open(local_file, "wb") as file:
-            ftp.retrbinary("RETR " + ftp_file, my_write)
-        return True
+        if ftp_size is None:
+            ftp_size = get_ftp_file_size(ftp, ftp_file)
+
+        for _ in range(c.CRC_RETRIES + 1):
+            offset = download.get_part_offset(part_file, ftp_size, ftp_modify, crc)
+            # Контрольная сумма уже скачанной части считается один раз,
+            # остальные байты учитываются по мере поступления
+            crc_value = sfv.file_crc32(part_file) if offset and crc is not None else 0
+
+            if download.is_transfer_needed(part_file, offset, ftp_size):
+                if not offset:
+                    download.save_part_source(part_file, ftp_size, ftp_modify)
+                if file_metrics is not None:
+                    file_metrics.request()
+                with open(part_file, "ab" if offset else "wb") as file:
+                    try:
+                        ftp.retrbinary(
+                            "RETR " + ftp_file, my_write, rest=offset or None
+                        )
+                    except (error_perm, error_temp) as err:
+                        if not offset or str(err)[:3] not in c.FTP_REST_REFUSED:
+                            raise
+                        logging.info(
+                            f"FTP сервер не поддерживает докачку:\n"
+                            f"Файл {ftp_file} копируется заново\n"
+                        )
+                        file.seek(0)
+                        file.truncate()
+                        crc_value = 0
+                        ftp.retrbinary("RETR " + ftp_file, my_write)
+
+            finished = download.finish_part_file(
+                ftp_file, local_subdir, ftp_size, crc, crc_value
+            )
+            if finished is not None:
+                return finished
+
+        logging.warning(f"Файл {ftp_file} не скопирован\n")
+        return False
     except Exception as err:
+        if retry.is_session_error(err):
+            raise
         logging.warning(
             f"Произошла ошибка при копировании {err}:\nФайл {ftp_file} не скопирован\n"
         )
-        del_local_file(local_file)
+        return False
+    except KeyboardInterrupt:
+        raise f.MyException("Программа прервана оператором", 1000)
+
+
+def copy_segmented(
+    pool: ftp_pool.FtpSessionPool,
+    ftp: FTP,
+    ftp_file: str,
+    context: download.DownloadContext,
+    count: int,
+    file_metrics: metrics.FileMetrics | None = None,
+) -> bool:
+    """Функция copy_segmented(pool, ftp, ftp_file, context, count, file_metrics) -> bool
+        Копирует файл по участкам (download.SegmentedFile): место под файл
+        выделяется заранее, большой файл делится на несколько участков.
+        Участки по очереди скачивает сессия ftp; пока есть участки, которые никто
+        не скачивает, свободные места пула занимают дополнительные сессии (segment_helper),
+        каждая из которых скачивает участки со своего смещения (команда REST).
+        Когда все участки записаны, файл проверяется по размеру и контрольной
+        сумме из SFV, как скачанный одним потоком (download.finish_part_file);
+        файл из одного участка для этого не перечитывается.
+        Если сервер не поддерживает докачку (REST), файл копируется одним потоком.
+        Ошибки - как у copy_from_ftp_file: потеря сессии ftp передаётся
+        вызывающей функции, а следующая попытка продолжает по карте участков.
+    :param
+        1. pool: FtpSessionPool             - Общий пул сессий с FTP сервером
+        2. ftp: FTP                         - Сессия, выданная для файла
+        3. ftp_file: str                    - Имя файла на FTP сервере
+        4. context: DownloadContext         - Общие данные потоков скачивания
+        5. count: int                       - Число участков (download.get_segment_count)
+        6. file_metrics: FileMetrics        - Показатели скачивания файла
+    :return:
+        True - если файл скопирован успешно, False - если не скопирован.
+    """
+    print(f"\rкопируем файл {ftp_file}" + (" по участкам" if count > 1 else ""))
 
+    ftp_size = context.ftp_file_sizes[ftp_file]
+    crc = sfv.get_crc(context.sfv_crcs, ftp_file)
+    try:
+        for _ in range(c.CRC_RETRIES + 1):
+            segmented = download.SegmentedFile(
+                context.local_subdir,
+                ftp_file,
+                ftp_size,
+                count,
+                file_metrics,
+                ftp_modify=context.ftp_file_modify.get(ftp_file),
+            )
+            helpers = []
+            rest_refused = False
+            try:
+                while True:
+                    segment = segmented.take()
+                    if segment is None:
+                        for helper in helpers:
+                            helper.join()
+                        helpers = []
+                        if not segmented.pending():
+                            break
+                        continue
+                    running = sum(helper.is_alive() for helper in helpers)
+                    for _ in range(segmented.pending() - running):
+                        helper = start_segment_helper(pool, segmented, context)
+                        if helper is None:
+                            break
+                        helpers.append(helper)
+                    try:
+                        copy_segment(ftp, segmented, segment, context)
+                    except error_perm as err:
+                        segmented.put_back(segment)
+                        if str(err)[:3] not in c.FTP_REST_REFUSED:
+                            raise
+                        rest_refused = True
+                        break
+                    except BaseException:
+                        segmented.put_back(segment)
+                        raise
+            finally:
+                segmented.stopped = True
+                for helper in helpers:
+                    helper.join()
+                segmented.save()
+
+            if rest_refused:
+                logging.info(
+                    f"FTP сервер не поддерживает докачку:\n"
+                    f"Файл {ftp_file} копируется одним потоком\n"
+                )
+                segmented.discard()
+                return copy_from_ftp_file(
+                    ftp,
+                    ftp_file,
+                    context.local_subdir,
+                    context.stop,
+                    ftp_size,
+                    crc,
+                    context.control,
+                    file_metrics,
+                    context.ftp_file_modify.get(ftp_file),
+                )
+            if not segmented.is_complete():
+                logging.warning(f"Файл {ftp_file} не скопирован\n")
+                return False
+            part_file = segmented.stitch()
+            crc_value = segmented.get_crc32()
+            if crc_value is None:
+                crc_value = sfv.file_crc32(part_file) if crc is not None else 0
+            finished = download.finish_part_file(
+                ftp_file, context.local_subdir, ftp_size, crc, crc_value
+            )
+            if finished is not None:
+                return finished
+
+        logging.warning(f"Файл {ftp_file} не скопирован\n")
+        return False
+    except f.MyException:
+        raise
+    except Exception as err:
+        if retry.is_session_error(err):
+            raise
+        logging.warning(
+            f"Произошла ошибка при копировании {err}:\nФайл {ftp_file} не скопирован\n"
+        )
         return False
     except KeyboardInterrupt:
-        del_local_file(local_file)
         raise f.MyException("Программа прервана оператором", 1000)
 
 
+def start_segment_helper(
+    pool: ftp_pool.FtpSessionPool,
+    segmented: download.SegmentedFile,
+    context: download.DownloadContext,
+) -> Thread | None:
+    """Функция start_segment_helper(pool, segmented, context) -> Thread | None
+    Запускает поток segment_helper, если в пуле есть свободное место.
+    :return:
+        Запущенный поток или None, если свободного места нет или
+        подключиться к FTP серверу не удалось.
+    """
+    try:
+        ftp = pool.acquire(context.ftp_dir, blocking=False)
+    except f.MyException:
+        return None
+    if ftp is None:
+        return None
+    helper = Thread(
+        target=segment_helper, args=(pool, ftp, segmented, context), daemon=True
+    )
+    helper.start()
+    return helper
+
+
+def segment_helper(
+    pool: ftp_pool.FtpSessionPool,
+    ftp: FTP,
+    segmented: download.SegmentedFile,
+    context: download.DownloadContext,
+) -> None:
+    """Функция segment_helper(pool, ftp, segmented, context) -> None
+    Поток дополнительной сессии: скачивает участки файла, пока они есть.
+    При ошибке участок возвращается (его докачает другая сессия),
+    а сессия освобождается как неисправная.
+    """
+    broken = False
+    try:
+        while (segment := segmented.take()) is not None:
+            try:
+                copy_segment(ftp, segmented, segment, context)
+            except BaseException as err:
+                broken = True
+                segmented.put_back(segment)
+                if context.stop.is_set():
+                    break
+                logging.info(
+                    f"Участок {segment.start}-{segment.end} файла {segmented.ftp_file} "
+                    f"не скачан дополнительной сессией: {err!r}"
+                )
+                break
+    finally:
+        pool.release(ftp, context.ftp_dir, broken=broken)
+
+
+def copy_segment(
+    ftp: FTP,
+    segmented: download.SegmentedFile,
+    segment: download.Segment,
+    context: download.DownloadContext,
+) -> None:
+    """Функция copy_segment(ftp, segmented, segment, context) -> None
+    Скачивает участок файла: RETR с недописанной части участка (команда REST),
+    данные пишутся в файл с того же смещения. Дочитав участок,
+    прерывает передачу данных и читает ответ сервера на неё.
+    Ошибки передаются вызывающей функции.
+    """
+    ftp.voidcmd("TYPE I")
+    if segmented.file_metrics is not None:
+        segmented.file_metrics.request()
+    with ftp.transfercmd(
+        "RETR " + segmented.ftp_file, rest=segment.position or None
+    ) as conn, segmented.open(segment) as file:
+        while not segment.done:
+            if context.stop.is_set():
+                raise KeyboardInterrupt
+            block = conn.recv(min(c.SEGMENT_BLOCK_SIZE, segment.end - segment.position))
+            if not block:
+                break
+            file.write(block)
+            segment.position += len(block)
+            segmented.written(block)
+            if context.control is not None:
+                delay = context.control.transferred(len(block))
+                if delay:
+                    time.sleep(delay)
+    try:
+        ftp.voidresp()
+    except (error_perm, error_temp):
+        # Передача прервана до конца файла - ответ 426 или подобный ожидаем
+        if not segment.done:
+            raise
+    if not segment.done:
+        raise EOFError(
+            f"Передача файла {segmented.ftp_file} закончилась до конца участка"
+        )
+
+
+def get_ftp_file_size(ftp: FTP, ftp_file: str) -> int | None:
+    """Функция get_ftp_file_size(ftp: FTP, ftp_file: str) -> int | None
+        Запрашивает у FTP сервера размер файла (команда SIZE).
+    :param
+        1. ftp: FTP         - FTP сервер
+        2. ftp_file: str    - Имя файла на FTP сервере
+    :return:
+        Размер файла в байтах или None, если сервер размер не сообщил.
+    """
+    try:
+        ftp.voidcmd("TYPE I")
+        return ftp.size(ftp_file)
+    except (error_perm, error_temp, ValueError):
+        return None
+
+
 def del_local_file(local_file: Path) -> None:
     """Функция del_local_file(local_file: Path) -> None
     Назначение:
@@ -372,83 +1868,118 @@ def is_VPN_connected() -> bool:
     return False
 
 
-def copy_dir_to_dir(dir_from: Path, dir_to: str) -> None:
-    """Функция copy_dir_to_dir(local_subdir: Path, local_dir: str) -> None:
-            Копирует файлы из поддиректории в директорию.
+def copy_dir_to_dir(
+    dir_from: manifest.Manifest,
+    dir_to: manifest.Manifest,
+    promotion_journal: journal.PromotionJournal | None = None,
+) -> promotion.PromotionStats:
+    """Функция copy_dir_to_dir(dir_from, dir_to, promotion_journal) -> PromotionStats:
+            Переносит файлы из поддиректории в директорию.
+            Если директории на одной файловой системе, файлы переносятся
+            жёсткими ссылками, без копирования данных.
+            Индекс директории обновляется для перенесённых файлов.
+            Если задан журнал задания, список переносимых файлов записывается
+            в него до переноса, а окончание переноса - после.
         :param
-            dir_from: Path      - поддиректория
-            dir_to:   str       - Директория
-    :return:                    - None
+            dir_from: Manifest  - индекс поддиректории
+            dir_to:   Manifest  - индекс директории
+            promotion_journal: PromotionJournal - журнал задания
+    :return:                    - Итоги переноса
     """
-    for file in dir_from.glob("*.*"):
-        if file.is_file():
-            copy_file(file_from=file, dir_to=dir_to)
-
-
-def copy_file(file_from: Path, dir_to: str) -> None:
-    """Функция copy_file(file_from: Path, dir_from: Path, dir_to: str) -> None:
-        Копирует файл из одной директорию в другую.
-    :param
-        file_from: копируемый файл
-    :param
-        dir_from: исходная директория
-    :param
-        dir_to: Целевая директория
-    :return:
-        None
-    """
-    image_data: bytes
-    with open(file_from, "rb") as f_from:
-        image_data = f_from.read()
-    file_to = Path(dir_to, file_from.name)
-    with open(file_to, "wb") as f_to:
-        f_to.write(image_data)
+    dir_from.refresh()
+    stats = promotion.PromotionStats()
+    try_link = promotion.is_same_device(dir_from.directory, dir_to.directory)
+    promoted_files = sorted(selection_already_copied_files(dir_from))
+    if promotion_journal is not None:
+        promotion_journal.write("promote", promoted_files)
+    for name in promoted_files:
+        try_link = promotion.promote_file(
+            file_from=Path(dir_from.directory, name),
+            file_to=Path(dir_to.directory, name),
+            stats=stats,
+            try_link=try_link,
+        )
+    dir_to.update(promoted_files)
+    if promotion_journal is not None:
+        promotion_journal.write("promoted")
+
+    logging.info(
+        f"Перенесено в директорию компонент файлов: {len(promoted_files)}\n"
+        f"Связано ссылками: {stats.linked_files} ({stats.linked_bytes} байт)\n"
+        f"Скопировано: {stats.copied_files} ({stats.copied_bytes} байт)"
+    )
+    return stats
 
 
-def is_same_directories(ftp: FTP, local_dir: Path) -> bool:
-    """Функция is_same_directories(ftp: FTP, local_dir: Path):
+def is_same_directories(
+    ftp: FTP,
+    ftp_file_sizes: dict[str, int],
+    local_manifest: manifest.Manifest,
+    excluded_files: set[str] = frozenset(),
+) -> bool:
+    """Функция is_same_directories(ftp, ftp_file_sizes, local_manifest, excluded_files):
         Сравнивает директорию на FTP сервере и локальную директорию.
         Директории сравниваются по составу и размеру файлов.
+        Файлы excluded_files (например, заведомо устаревшие версии компонент)
+        в сравнении не участвуют ни с одной стороны.
+        Сначала локальная директория сравнивается со снимком директории FTP сервера,
+        сделанным при планировании. Если они не совпали (директория на сервере
+        могла измениться за время работы программы), директория FTP сервера
+        перечитывается и сравнение повторяется.
     :param
         1. ftp: Директория на сервере FTP.
-        2. local_dir: Локальная директория.
+        2. ftp_file_sizes: Снимок директории FTP сервера (имя файла -> размер).
+        3. local_manifest: Индекс локальной директории (размеры файлов
+           проверяются по диску, Manifest.verify).
+        4. excluded_files: Исключения сверки.
     :return:
         True если директории совпали по составу и размеру файлов, False если не совпали.
     """
-    ftp_file_sizes = dict()
-    size = slice(29, 41)
-    name = slice(54, None)
-
-    def my_call_back(line):
-        nonlocal ftp_file_sizes
-        nonlocal size
-        nonlocal name
-
-        if line[size].strip() != "0":
-            #   ftp_file_sizes - словарь
-            #   line[name].strip() - ключ в словаре
-            #   int(line[size]) - значение, соответствующее ключу
-            ftp_file_sizes[line[name].strip()] = int(line[size])
+    local_manifest.verify()
+    local_file_sizes = {
+        entry.name: entry.size
+        for entry in local_manifest.files("*.*")
+        if entry.name not in excluded_files
+    }
+
+    if is_equal_dict(
+        exclude_files(ftp_file_sizes, excluded_files), local_file_sizes, verbose=False
+    ):
+        return True
 
-    ftp.retrlines(cmd="LIST", callback=my_call_back)
+    logging.info("Директория FTP сервера перечитывается для сверки")
+    ftp_file_sizes = ftp_listing.get_file_sizes(ftp_listing.get_listing(ftp))
+    return is_equal_dict(
+        exclude_files(ftp_file_sizes, excluded_files), local_file_sizes
+    )
 
-    local_file_sizes = dict()
-    for file in Path(local_dir).glob("*.*"):
-        if file.is_file():
-            local_file_sizes[file.name] = file.stat().st_size
 
-    return True if is_equal_dict(ftp_file_sizes, local_file_sizes) else False
+def exclude_files(
+    file_sizes: dict[str, int], excluded_files: set[str]
+) -> dict[str, int]:
+    """Функция exclude_files(file_sizes, excluded_files) -> dict[str, int]
+    Словарь размеров файлов без файлов excluded_files.
+    """
+    if not excluded_files:
+        return file_sizes
+    return {
+        name: size for name, size in file_sizes.items() if name not in excluded_files
+    }
 
 
-def is_equal_dict(dict1: dict, dict2: dict) -> bool:
-    """Функция is_equal_dict(dict1: dict, dict2: dict) -> bool:
+def is_equal_dict(dict1: dict, dict2: dict, verbose: bool = True) -> bool:
+    """Функция is_equal_dict(dict1: dict, dict2: dict, verbose: bool = True) -> bool:
         Проверяет равны ли словари.
     :param
         dict1: Сравниваемый словарь (FTP файлы)
         dict2: Сравниваемый словарь (локальные файлы)
+        verbose: Выводить ли в лог сообщения о расхождениях
     :return:
         True - словари равны. False - словари не равны.
     """
+    if not verbose:
+        return dict1 == dict2
+
     ret_value = True
     for file in dict1.keys() - dict2.keys():
         ret_value = False
@@ -1,14 +1,32 @@
 import logging
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from sys import argv, exit
 
 import component_functions as f
+import journal
+import manifest
 from constant import const as C  # Константы
 
 
-def main_() -> None:
-    """Функция main() -> None
+def main_(
+    dir_components: str | None = None,
+    interactive: bool = True,
+    components_manifest: manifest.Manifest | None = None,
+    promotion_journal: journal.PromotionJournal | None = None,
+) -> None:
+    """Функция main_(dir_components, interactive, components_manifest, promotion_journal) -> None
     Обрабатывает прерывания сгенерированные в функции main_
+    Аргументы:
+        dir_components: str - директория компонент.
+                              Если не задана, берётся из параметров программы.
+        interactive: bool   - Если False - вопросы оператору не задаются.
+        components_manifest: Manifest - индекс директории компонент, уже открытый
+                              вызывающей программой (path_ftp). Если не задан,
+                              индекс открывается заново.
+        promotion_journal: PromotionJournal - журнал задания path_ftp, в который
+                              до переноса в OLD записывается список переносимых файлов.
     """
 
     file_log = logging.FileHandler("Log_path.log")
@@ -21,7 +39,7 @@ def main_() -> None:
     )
 
     try:
-        main()
+        main(dir_components, interactive, components_manifest, promotion_journal)
     except f.MyException as e:
         logging.error(e.text_err)
         exit(e.ret_code)
@@ -29,33 +47,47 @@ def main_() -> None:
         logging.critical(f"Непредвиденная ошибка\n{e}")
 
 
-def main() -> None:
-    """Функция main_() -> None
+def main(
+    dir_components: str | None = None,
+    interactive: bool = True,
+    components_manifest: manifest.Manifest | None = None,
+    promotion_journal: journal.PromotionJournal | None = None,
+) -> None:
+    """Функция main(dir_components, interactive, components_manifest, promotion_journal) -> None
     Для всех компонентов, имеющих одинаковые имена компонента и расширения файла,
     перемещает в директорию OLD компоненты с более ранней версией.
     В результате в директории компонент остаются только самые "свежие" компоненты.
-    Версия компонента определяется из кортежа, формируемого из имени файла компонента
-    (имя, версия, расширение файла)
+    Версия компонента определяется из разобранного имени файла компонента
+    (имя, версия, расширение файла), устаревшие версии выбираются за один проход
+    (get_outdated_components) и переносятся пачкой (remove_oldest_files).
+    Если часть файлов перенести не удалось, перенесённые удаляются из индекса
+    и отмечаются в журнале, затем возникает ошибка.
+    Если задан журнал задания, список устаревших компонент записывается в него
+    до переноса, чтобы прерванный перенос можно было довести до конца.
     """
 
-    dir_components, sub_dir_oldest, components = get_components()
-    components = sorted(components)
-    count_outdated = 0
-    name_tuple_previous = ("", "", "")
-
-    for component in components:
-        name_tuple = f.name_to_tuple(component.parts[-1])
-        if name_tuple:
-            if f.is_eq_name(name_tuple, name_tuple_previous):
-                remove_oldest_file(
-                    dir_components,
-                    sub_dir_oldest,
-                    get_oldest_component(name_tuple, name_tuple_previous),
-                )
-                count_outdated += 1
-        else:
-            name_tuple = ("", "", "")
-        name_tuple_previous = name_tuple
+    dir_components, sub_dir_oldest, components_manifest = get_components(
+        dir_components, interactive, components_manifest
+    )
+    outdated_components = get_outdated_components(
+        component.component_name() for component in components_manifest.files()
+    )
+
+    if promotion_journal is not None:
+        promotion_journal.write(
+            "prune", [component_name.name for component_name in outdated_components]
+        )
+    outdated_files, error = remove_oldest_files(
+        dir_components, sub_dir_oldest, outdated_components
+    )
+    components_manifest.remove(outdated_files)
+    if promotion_journal is not None:
+        # Если не все файлы перенесены, в записи - перенесённые,
+        # остальные перенесёт следующий запуск
+        promotion_journal.write("pruned", outdated_files if error else None)
+    if error is not None:
+        raise error
+    count_outdated = len(outdated_files)
 
     logging.info(
         f"Обнаружено и перенесено в поддиректорию {C.SUB_DIR_OLD}: "
@@ -64,16 +96,25 @@ def main() -> None:
     return None
 
 
-def get_components() -> tuple[Path, Path, list]:
-    """Функция get_components() -> (Path, Path, list):
+def get_components(
+    dir_components: str | None = None,
+    interactive: bool = True,
+    components_manifest: manifest.Manifest | None = None,
+) -> tuple[Path, Path, manifest.Manifest]:
+    """Функция get_components(dir_components, interactive, components_manifest) -> (Path, Path, Manifest):
+
+    Аргументы
+        Директория компонент. Если не задана, берётся из параметров программы.
+        Признак диалога с оператором. Без диалога старые версии в OLD сохраняются.
+        Открытый индекс директории компонент. Если не задан, открывается заново.
 
     Возвращает
         Выбранную из параметров программы директорию компонент.
         Поддиректорию для устаревших файлов.
-        Список файлов (компонент) выбранной директории.
+        Индекс файлов (компонент) выбранной директории.
     """
 
-    if not 2 <= len(argv) <= 3:
+    if dir_components is None and not 2 <= len(argv) <= 3:
         raise f.MyException(
             "Программе передано неверное количество параметров.\n"
             "Программа принимает 1 параметр:\n"
@@ -83,9 +124,12 @@ def get_components() -> tuple[Path, Path, list]:
             1000,
         )
 
-    dir_components = Path(argv[1])
+    dir_components = Path(argv[1] if dir_components is None else dir_components)
     try:
-        list_components = [file for file in dir_components.iterdir() if file.is_file()]
+        if components_manifest is None:
+            components_manifest = manifest.Manifest(dir_components)
+        else:
+            components_manifest.refresh()
     except Exception as e:
         raise f.MyException(
             f"Нет доступа к каталогу {dir_components}\n"
@@ -106,7 +150,7 @@ def get_components() -> tuple[Path, Path, list]:
             1000,
         )
 
-    if is_dir_no_empty(sub_dir_oldest):
+    if interactive and is_dir_no_empty(sub_dir_oldest):
         if f.dialog(C.TEXT_3, ["н", "п"]) == "н":
             f.delete_all(sub_dir_oldest)
         else:
@@ -114,47 +158,101 @@ def get_components() -> tuple[Path, Path, list]:
                 f"Старые версии компонент находятся в папке {sub_dir_oldest}\n", 1000
             )
 
-    return dir_components, sub_dir_oldest, list_components
+    return dir_components, sub_dir_oldest, components_manifest
 
 
-def get_oldest_component(tuple1, tuple2) -> tuple:
-    """Функция get_oldest_component(tuple1, tuple2) -> tuple.
-        Сравнивает номера версий компонентов.
+def get_outdated_components(
+    component_names: Iterable[f.ComponentName | None],
+) -> list[f.ComponentName]:
+    """Функция get_outdated_components(component_names) -> list[ComponentName]
+        Выбирает устаревшие версии компонентов за один проход, без сортировки:
+        версии группируются в словаре по имени компонента и расширению файла,
+        в группе остаётся самая свежая версия (ComponentName.is_newer: наибольший
+        номер версии, при равных номерах - большее имя файла), остальные - устаревшие.
+        Компонент может быть представлен любым числом версий.
 
     Аргументы:
-        tuple1 (tuple): кортеж имени компонента (имя, версия, расширение файла).
-        tuple2 (tuple): кортеж имени компонента (имя, версия, расширение файла).
+        component_names: разобранные имена файлов (None - не компонент, пропускается).
 
     Результат
-        Картеж имени компонента с более ранней версией.
+        Разобранные имена устаревших версий компонентов.
     """
 
-    # Выравниваем длины версий файлов
-    version_1 = tuple1[1]
-    version_2 = tuple2[1]
-    delta_len = len(version_1) - len(version_2)
-    if delta_len < 0:
-        version_1 += "0" * (-delta_len)
-    elif delta_len > 0:
-        version_2 += "0" * delta_len
+    latest: dict[tuple[str, str], f.ComponentName] = dict()
+    outdated_components = []
+    for component_name in component_names:
+        if component_name is None:
+            continue
+        key = (component_name.base, component_name.extension)
+        current = latest.get(key)
+        if current is None:
+            latest[key] = component_name
+        elif component_name.is_newer(current):
+            outdated_components.append(current)
+            latest[key] = component_name
+        else:
+            outdated_components.append(component_name)
+    return outdated_components
+
 
-    return tuple1 if int(version_1) < int(version_2) else tuple2
+def remove_oldest_files(
+    dir_components: Path,
+    sub_dir_oldest: Path,
+    outdated_components: list[f.ComponentName],
+) -> tuple[list[str], f.MyException | None]:
+    """Функция remove_oldest_files(dir_components, sub_dir_oldest, outdated_components) -> tuple[list[str], MyException | None]
+        Перемещает файлы устаревших компонентов в поддиректорию SUB_DIR_OLD
+        пачкой: файлы переименовываются параллельно, не больше PRUNE_MOVE_WORKERS
+        потоками (на сетевом диске каждое переименование ждёт ответа сервера).
+        Если файл переместить не удалось, остальные всё равно перемещаются.
+
+    Аргументы
+        1. dir_components: Path.                    Директория с компонентами.
+        2. sub_dir_oldest: Path.                    Директория со старыми версиями компонент
+        3. outdated_components: list[ComponentName]. Разобранные имена перемещаемых файлов
+    Результат
+        Имена перемещённых файлов и ошибка перемещения остальных
+        (None - перемещены все файлы).
+    """
+
+    if not outdated_components:
+        return [], None
+    moved_files = []
+    errors = []
+    with ThreadPoolExecutor(
+        max_workers=min(C.PRUNE_MOVE_WORKERS, len(outdated_components))
+    ) as executor:
+        futures = [
+            executor.submit(
+                remove_oldest_file, dir_components, sub_dir_oldest, component_name
+            )
+            for component_name in outdated_components
+        ]
+        for future in as_completed(futures):
+            try:
+                moved_files.append(future.result())
+            except f.MyException as e:
+                errors.append(e.text_err)
+    if not errors:
+        return moved_files, None
+    return moved_files, f.MyException("\n".join(errors), 1000)
 
 
 def remove_oldest_file(
-    dir_components: Path, sub_dir_oldest: Path, tuple_: tuple
-) -> None:
-    """Функция remove_oldest_file(dir_components: Path, tuple_: tuple) -> None
+    dir_components: Path, sub_dir_oldest: Path, component_name: f.ComponentName
+) -> str:
+    """Функция remove_oldest_file(dir_components, sub_dir_oldest, component_name) -> str
         перемещает файл компонента в поддиректорию SUB_DIR_OLD.
 
     Аргументы
-        1. dir_components: Path.    Директория с компонентами.
-        2. sub_dir_oldest: Path.    Директория со старыми версиями компонент
-        3. tuple_:         tuple.   Картеж имени перемещаемого файла компонента
-                                    (имя, версия, расширение файла).
+        1. dir_components: Path.            Директория с компонентами.
+        2. sub_dir_oldest: Path.            Директория со старыми версиями компонент
+        3. component_name: ComponentName.   Разобранное имя перемещаемого файла компонента
+    Результат
+        Имя перемещённого файла.
     """
 
-    file_name = tuple_[0] + tuple_[1] + tuple_[2]
+    file_name = component_name.name
     file_from = Path(dir_components, file_name)
     file_to = Path(sub_dir_oldest, file_name)
     try:
@@ -166,6 +264,7 @@ def remove_oldest_file(
             f"Обратитесь к системному администратору.",
             1000,
         )
+    return file_name
 
 
 def is_dir_no_empty(dir_: Path) -> bool:
@@ -0,0 +1,244 @@
+import json
+import statistics
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import component_functions as f
+from constant import const as c
+
+
+def get_latest_versions(names: Iterable[str]) -> dict[tuple[str, str], f.ComponentName]:
+    """Функция get_latest_versions(names: Iterable[str]) -> dict[tuple[str, str], ComponentName]
+        Выбирает самую свежую версию каждого компонента.
+        Компонент - имя компонента и расширение файла. Версии сравниваются
+        так же, как в path_men (ComponentName.is_newer), поэтому выбранную версию
+        path_men не перенесёт в OLD. Имена файлов, не являющиеся именами компонент,
+        пропускаются.
+    :param names: Имена файлов.
+    :return: Словарь: (имя компонента, расширение) -> разобранное имя самой свежей версии.
+    """
+    latest = dict()
+    for name in names:
+        component_name = f.parse_component_name(name)
+        if component_name is None:
+            continue
+        key = (component_name.base, component_name.extension)
+        current = latest.get(key)
+        if current is None or component_name.is_newer(current):
+            latest[key] = component_name
+    return latest
+
+
+def get_superseded_files(
+    ftp_names: Iterable[str], local_names: Iterable[str]
+) -> set[str]:
+    """Функция get_superseded_files(ftp_names, local_names) -> set[str]
+        Формирует множество файлов, которые при скачивании только последних версий
+        компонент заведомо различаются в директории FTP сервера и локальной директории:
+        1. версии компонент на FTP сервере, кроме самой свежей
+           (после скачивания path_men сразу перенёс бы их в OLD);
+        2. самая свежая версия на FTP сервере, если локальная версия компонента новее;
+        3. локальная версия компонента, более новая, чем любая на FTP сервере.
+        Эти файлы не скачиваются и не участвуют в сверке директорий.
+    :param
+        1. ftp_names: Имена файлов директории FTP сервера
+        2. local_names: Имена файлов локальной директории
+    :return:
+        Множество имён файлов (исключения сверки).
+    """
+    ftp_names = list(ftp_names)
+    ftp_latest = get_latest_versions(ftp_names)
+    local_latest = get_latest_versions(local_names)
+
+    superseded = set()
+    for name in ftp_names:
+        component_name = f.parse_component_name(name)
+        if component_name is None:
+            continue
+        key = (component_name.base, component_name.extension)
+        if component_name != ftp_latest[key]:
+            superseded.add(name)
+        elif key in local_latest and local_latest[key].is_newer(component_name):
+            superseded.add(name)
+            superseded.add(local_latest[key].name)
+    return superseded
+
+
+def get_schedule(
+    ftp_files: Iterable[str], ftp_file_sizes: dict[str, int], order: str
+) -> list[str]:
+    """Функция get_schedule(ftp_files, ftp_file_sizes, order) -> list[str]
+        Порядок скачивания файлов по их размерам в директории FTP сервера:
+        largest - сначала большие (большой файл, начатый последним,
+        не затягивает окончание скачивания), smallest - сначала маленькие
+        (быстрее готово больше файлов), listing - как в директории.
+        Файлы с неизвестным размером считаются пустыми, при равных размерах
+        порядок директории сохраняется.
+    :param
+        1. ftp_files: Имена скачиваемых файлов (без стоп листа и уже скачанных)
+        2. ftp_file_sizes: Размеры файлов на FTP сервере
+        3. order: Порядок (SCHEDULE_ORDERS)
+    :return:
+        Имена файлов в порядке скачивания.
+    """
+    ftp_files = list(ftp_files)
+    if order == "listing":
+        return ftp_files
+    return sorted(
+        ftp_files,
+        key=lambda name: ftp_file_sizes.get(name) or 0,
+        reverse=order == "largest",
+    )
+
+
+@dataclass
+class JobPlan:
+    """План синхронизации директории FTP сервера с директорией локального диска.
+    local_dir:          директория локального диска.
+    ftp_dir:            директория FTP сервера.
+    ftp_file_sizes:     снимок директории FTP сервера (имя файла -> размер).
+    ftp_file_modify:    время изменения файлов на FTP сервере (имя файла ->
+                        YYYYMMDDHHMMSS), если сервер его сообщает.
+    sfv_crcs:           контрольные суммы из SFV_FILE (имя в нижнем регистре -> CRC32).
+    files_to_copy:      файлы, которые надо скачать.
+    skipped:            пропускаемые файлы: имя -> причина (exists - есть в локальной
+                        директории, already_copied - есть в NEW, stop_list - в стоп
+                        листе, superseded - устаревшая версия компонента).
+    superseded_files:   исключения сверки директорий (get_superseded_files).
+    """
+
+    local_dir: str
+    ftp_dir: str
+    ftp_file_sizes: dict[str, int]
+    sfv_crcs: dict[str, int]
+    files_to_copy: list[str] = field(default_factory=list)
+    skipped: dict[str, str] = field(default_factory=dict)
+    superseded_files: set[str] = field(default_factory=set)
+    ftp_file_modify: dict[str, str] = field(default_factory=dict)
+
+    def bytes(self) -> int:
+        """Объём скачивания, байт."""
+        return sum(self.ftp_file_sizes.get(name) or 0 for name in self.files_to_copy)
+
+    def count_skipped(self, reason: str) -> int:
+        """Количество файлов, пропускаемых по причине reason."""
+        return sum(value == reason for value in self.skipped.values())
+
+    def get_skipped(self, reason: str) -> list[str]:
+        """Файлы, пропускаемые по причине reason."""
+        return [name for name, value in self.skipped.items() if value == reason]
+
+    def as_dict(self, throughput: float | None = None) -> dict:
+        """План для записи в JSON, с оценкой продолжительности скачивания."""
+        return {
+            "local_dir": self.local_dir,
+            "ftp_dir": self.ftp_dir,
+            "files": len(self.files_to_copy),
+            "bytes": self.bytes(),
+            "estimated_seconds": get_estimate(self.bytes(), throughput),
+            "files_to_copy": [
+                {
+                    "name": name,
+                    "size": self.ftp_file_sizes.get(name),
+                    "crc32": self.sfv_crcs.get(name.lower()),
+                }
+                for name in self.files_to_copy
+            ],
+            "skipped": [
+                {"name": name, "reason": reason}
+                for name, reason in self.skipped.items()
+            ],
+            "superseded_files": sorted(self.superseded_files),
+            "ftp_file_sizes": self.ftp_file_sizes,
+            "ftp_file_modify": self.ftp_file_modify,
+            "sfv_crcs": self.sfv_crcs,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "JobPlan":
+        """План, прочитанный из JSON."""
+        return cls(
+            local_dir=data["local_dir"],
+            ftp_dir=data["ftp_dir"],
+            ftp_file_sizes=data["ftp_file_sizes"],
+            sfv_crcs=data["sfv_crcs"],
+            files_to_copy=[item["name"] for item in data["files_to_copy"]],
+            skipped={item["name"]: item["reason"] for item in data["skipped"]},
+            superseded_files=set(data["superseded_files"]),
+            ftp_file_modify=data.get("ftp_file_modify", dict()),
+        )
+
+
+def get_estimate(size: int, throughput: float | None) -> float | None:
+    """Функция get_estimate(size: int, throughput: float | None) -> float | None
+    Оценка продолжительности скачивания size байт со скоростью throughput байт/с
+    (None, если скорость неизвестна).
+    """
+    if not throughput:
+        return None
+    return round(size / throughput, 1)
+
+
+def get_recent_throughput(file_report: str | None) -> float | None:
+    """Функция get_recent_throughput(file_report: str | None) -> float | None
+        Скорость скачивания по отчёту о запусках (--report): медиана скорости
+        последних PLAN_HISTORY_JOBS заданий, в которых что-то было скачано.
+    :return: Скорость, байт/с, или None, если отчёта нет или в нём нет замеров.
+    """
+    if not file_report:
+        return None
+    throughputs = []
+    try:
+        with open(file_report, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("type") == "job" and record.get("bytes"):
+                    if record.get("throughput"):
+                        throughputs.append(record["throughput"])
+    except OSError:
+        return None
+    if not throughputs:
+        return None
+    return statistics.median(throughputs[-c.PLAN_HISTORY_JOBS :])
+
+
+def write_plan(file_plan: str, plans: list[JobPlan], throughput: float | None) -> None:
+    """Функция write_plan(file_plan: str, plans: list[JobPlan], throughput) -> None
+    Записывает план синхронизации в JSON: задания, итоги (файлов, байт)
+    и оценку продолжительности скачивания при скорости throughput байт/с.
+    """
+    size = sum(plan.bytes() for plan in plans)
+    data = {
+        "version": c.PLAN_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "files": sum(len(plan.files_to_copy) for plan in plans),
+        "bytes": size,
+        "throughput": throughput,
+        "estimated_seconds": get_estimate(size, throughput),
+        "jobs": [plan.as_dict(throughput) for plan in plans],
+    }
+    with open(file_plan, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, indent=2)
+
+
+def read_plan(file_plan: str) -> list[JobPlan]:
+    """Функция read_plan(file_plan: str) -> list[JobPlan]
+    Читает план синхронизации, записанный write_plan.
+    """
+    try:
+        with open(file_plan, encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != c.PLAN_VERSION:
+            raise ValueError(
+                f"версия плана {data.get('version')}, ожидается {c.PLAN_VERSION}"
+            )
+        plans = [JobPlan.from_dict(item) for item in data["jobs"]]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise f.MyException(f"Не могу прочитать план {file_plan}\n{e!r}", 777)
+    if not plans:
+        raise f.MyException(f"План {file_plan} не содержит заданий", 777)
+    return plans
@@ -6,6 +6,7 @@ from docx.oxml.ns import nsdecls
 from docx.enum.dml import MSO_THEME_COLOR
 import docx
 
+import manifest
 from constant import const as c
 
 
@@ -160,7 +161,10 @@ def get_list_components() -> str:
     sub_dir_new = Path(dir_components, c.SUB_DIR_NEW)
 
     if sub_dir_new.is_dir():
-        component_files = sub_dir_new.glob("*.*")
+        component_files = [
+            Path(sub_dir_new, entry.name)
+            for entry in manifest.Manifest(sub_dir_new).files("*.*")
+        ]
     else:
         raise MyException(
             f"Нет доступа к каталогу {sub_dir_new}\n"
@@ -184,7 +188,7 @@ def convert_file_to_component(file: Path) -> str:
     :return:
         Имя компонента (Name)
     """
-    return file.stem if file.suffix != ".acc" and file.suffix != ".sfv" else None
+    return file.stem if file.suffix not in (".acc", ".sfv", c.PART_SUFFIX) else None
 
 
 def processing_end_of_line(line: str) -> str:
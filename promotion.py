@@ -0,0 +1,137 @@
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from constant import const as c
+
+
+@dataclass
+class PromotionStats:
+    """Итоги переноса файлов из поддиректории NEW в директорию компонент.
+    linked_files / linked_bytes: файлы, перенесённые жёсткими ссылками (без копирования).
+    copied_files / copied_bytes: файлы, данные которых были скопированы.
+    """
+
+    linked_files: int = 0
+    linked_bytes: int = 0
+    copied_files: int = 0
+    copied_bytes: int = 0
+
+
+def is_same_device(dir_from: Path, dir_to: Path) -> bool:
+    """Функция is_same_device(dir_from: Path, dir_to: Path) -> bool
+    Проверяет, находятся ли директории на одной файловой системе.
+    """
+    return os.stat(dir_from).st_dev == os.stat(dir_to).st_dev
+
+
+def promote_file(
+    file_from: Path, file_to: Path, stats: PromotionStats, try_link: bool
+) -> bool:
+    """Функция promote_file(file_from, file_to, stats, try_link) -> bool
+        Переносит файл из поддиректории NEW в директорию компонент.
+        Файл в NEW сохраняется.
+        Если директории на одной файловой системе, создаётся жёсткая ссылка,
+        иначе данные копируются средствами ядра ОС или блоками по COPY_CHUNK_SIZE.
+        Целевой файл появляется под своим именем атомарно (os.replace).
+    :param
+        1. file_from: Path          - Переносимый файл
+        2. file_to: Path            - Целевой файл
+        3. stats: PromotionStats    - Итоги переноса, дополняются
+        4. try_link: bool           - Пытаться ли создать жёсткую ссылку
+    :return:
+        True, если создана жёсткая ссылка, False - если файл скопирован.
+    """
+    size = file_from.stat().st_size
+    if file_to.exists() and os.path.samefile(file_from, file_to):
+        # Уже перенесён ссылкой при прошлом запуске. os.replace между
+        # ссылками на один файл ничего не делает и оставил бы временный файл.
+        stats.linked_files += 1
+        stats.linked_bytes += size
+        return True
+
+    file_temp = Path(file_to.parent, file_to.name + c.PART_SUFFIX)
+    if file_temp.exists():
+        file_temp.unlink()
+
+    linked = False
+    if try_link:
+        try:
+            os.link(file_from, file_temp)
+            linked = True
+        except OSError:
+            pass
+    if not linked:
+        copy_file(file_from, file_temp)
+
+    os.replace(file_temp, file_to)
+
+    if linked:
+        stats.linked_files += 1
+        stats.linked_bytes += size
+    else:
+        stats.copied_files += 1
+        stats.copied_bytes += size
+    return linked
+
+
+def copy_file(file_from: Path, file_to: Path) -> None:
+    """Функция copy_file(file_from: Path, file_to: Path) -> None:
+        Копирует файл, не читая его целиком в память.
+        Сначала пробует копирование внутри ядра ОС (copy_file_range, sendfile),
+        затем - копирование блоками по COPY_CHUNK_SIZE.
+    :param
+        file_from: копируемый файл
+    :param
+        file_to: Целевой файл
+    :return:
+        None
+    """
+    with open(file_from, "rb") as f_from, open(file_to, "wb") as f_to:
+        size = os.fstat(f_from.fileno()).st_size
+        for kernel_copy in (copy_by_copy_file_range, copy_by_sendfile):
+            try:
+                if kernel_copy(f_from.fileno(), f_to.fileno(), size):
+                    return
+            except OSError:
+                pass
+            f_to.seek(0)
+            f_to.truncate()
+        f_from.seek(0)
+        shutil.copyfileobj(f_from, f_to, c.COPY_CHUNK_SIZE)
+
+
+def copy_by_copy_file_range(fd_from: int, fd_to: int, size: int) -> bool:
+    """Функция copy_by_copy_file_range(fd_from, fd_to, size) -> bool
+        Копирует файл системным вызовом copy_file_range (Linux).
+    :return:
+        True, если файл скопирован, False - если вызов недоступен.
+    """
+    if not hasattr(os, "copy_file_range"):
+        return False
+    offset = 0
+    while offset < size:
+        sent = os.copy_file_range(fd_from, fd_to, size - offset, offset, offset)
+        if sent == 0:
+            break
+        offset += sent
+    return offset == size
+
+
+def copy_by_sendfile(fd_from: int, fd_to: int, size: int) -> bool:
+    """Функция copy_by_sendfile(fd_from, fd_to, size) -> bool
+        Копирует файл системным вызовом sendfile (Linux).
+    :return:
+        True, если файл скопирован, False - если вызов недоступен.
+    """
+    if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+        return False
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(fd_to, fd_from, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+    return offset == size
@@ -0,0 +1,229 @@
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from threading import Lock
+
+import ftp_pool
+from constant import const as c
+
+
+class TokenBucket:
+    """Ограничитель скорости передачи (маркерная корзина), общий для всех сессий.
+    Корзина пополняется со скоростью rate байт в секунду, но не больше чем
+    на RATE_BURST_SEC секунд передачи. Полученные байты забирают маркеры;
+    если маркеров не хватило, получатель ждёт, пока корзина не пополнится.
+    """
+
+    def __init__(self, rate: int | None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param
+            1. rate: int        - Скорость, байт в секунду (None - без ограничения)
+            2. clock: Callable  - Часы, секунды (time.monotonic)
+        """
+        self.rate = rate
+        self.burst = rate * c.RATE_BURST_SEC if rate else 0
+        self._clock = clock
+        self._tokens = self.burst
+        self._time = clock()
+        self._lock = Lock()
+
+    def reserve(self, size: int) -> float:
+        """Забирает маркеры на size байт.
+        :return: Сколько секунд получатель должен подождать.
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._time) * self.rate
+            )
+            self._time = now
+            self._tokens -= size
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """Измеряет скорость скачивания и долю ошибок и, если включено,
+    подбирает предел параллельных передач пула сессий.
+    Каждые ADAPTIVE_INTERVAL_SEC секунд предел меняется на единицу:
+    в том же направлении, если скорость заметно выросла, в обратном - если упала,
+    вниз - если не изменилась (ту же скорость меньшее число сессий
+    даёт с меньшей нагрузкой на общий канал). Если доля ошибок больше ADAPTIVE_MAX_ERROR_RATE,
+    предел уменьшается вдвое.
+    """
+
+    def __init__(
+        self,
+        pool: ftp_pool.FtpSessionPool,
+        enabled: bool,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.pool = pool
+        self.enabled = enabled
+        self._clock = clock
+        self.rate = 0.0
+        self._bytes = 0
+        self._copied = 0
+        self._errors = 0
+        self._started = clock()
+        self._last_rate: float | None = None
+        self._direction = -1
+        self._lock = Lock()
+
+    def transferred(self, size: int) -> None:
+        """Учитывает полученные байты."""
+        with self._lock:
+            self._bytes += size
+            self._adjust(self._clock())
+
+    def finished(self, copied: bool) -> None:
+        """Учитывает результат скачивания файла."""
+        with self._lock:
+            if copied:
+                self._copied += 1
+            else:
+                self._errors += 1
+
+    def current_rate(self) -> float:
+        """Скорость скачивания, байт в секунду."""
+        with self._lock:
+            elapsed = self._clock() - self._started
+            return self._bytes / elapsed if elapsed >= 1 else self.rate
+
+    def _adjust(self, now: float) -> None:
+        elapsed = now - self._started
+        if elapsed < c.ADAPTIVE_INTERVAL_SEC:
+            return
+        rate = self._bytes / elapsed
+        results = self._copied + self._errors
+        error_rate = self._errors / results if results else 0.0
+        self.rate = rate
+        self._bytes = self._copied = self._errors = 0
+        self._started = now
+        if not self.enabled:
+            return
+
+        limit = self.pool.limit
+        if error_rate > c.ADAPTIVE_MAX_ERROR_RATE:
+            self._direction = -1
+            new_limit = limit // 2
+        else:
+            if self._last_rate is not None:
+                if rate < self._last_rate * (1 - c.ADAPTIVE_GAIN):
+                    self._direction = -self._direction
+                elif rate <= self._last_rate * (1 + c.ADAPTIVE_GAIN):
+                    self._direction = -1
+            new_limit = limit + self._direction
+        self._last_rate = rate
+
+        new_limit = self.pool.set_limit(new_limit)
+        if new_limit != limit:
+            logging.info(
+                f"Скорость {format_rate(rate)}, ошибок {error_rate:.0%}: "
+                f"параллельных передач {limit} -> {new_limit}"
+            )
+
+
+class TransferControl:
+    """Общее управление скачиванием для всех сессий:
+    ограничение скорости, подбор числа параллельных передач
+    и оценка окончания скачивания запланированных файлов по текущей скорости.
+    """
+
+    def __init__(
+        self, pool: ftp_pool.FtpSessionPool, rate_kb: int | None, adaptive: bool
+    ):
+        """
+        :param
+            1. pool: FtpSessionPool - Общий пул сессий с FTP сервером
+            2. rate_kb: int         - Ограничение скорости, КБ/с (None или 0 - без ограничения)
+            3. adaptive: bool       - Подбирать ли число параллельных передач
+        """
+        self.pool = pool
+        self.bucket = TokenBucket(rate_kb * 1024 if rate_kb else None)
+        self.concurrency = AdaptiveConcurrency(pool, adaptive)
+        self._remaining = 0
+        self._reported = time.monotonic()
+        self._lock = Lock()
+
+    def transferred(self, size: int) -> float:
+        """Учитывает полученные байты.
+        :return: Сколько секунд получатель должен подождать (ограничение скорости).
+        """
+        self.concurrency.transferred(size)
+        with self._lock:
+            self._remaining -= size
+        return self.bucket.reserve(size)
+
+    def schedule(self, size: int) -> None:
+        """Учитывает size байт, запланированных к скачиванию."""
+        with self._lock:
+            self._remaining += size
+
+    def settle(self, size: int) -> None:
+        """Снимает с запланированного size байт файла, скачивание которого
+        закончено, но которые не были получены (файл не скопирован или
+        докачан). Раз в SCHEDULE_REPORT_SEC секунд выводит оценку окончания."""
+        now = time.monotonic()
+        with self._lock:
+            self._remaining -= size
+            if now - self._reported < c.SCHEDULE_REPORT_SEC:
+                return
+            self._reported = now
+        remaining = self.remaining()
+        estimate = self.estimate()
+        if remaining and estimate is not None:
+            finish = datetime.now() + timedelta(seconds=estimate)
+            logging.info(
+                f"Осталось скачать {format_size(remaining)}, "
+                f"окончание около {finish:%H:%M:%S}"
+            )
+
+    def remaining(self) -> int:
+        """Сколько байт запланированных файлов ещё не получено."""
+        with self._lock:
+            return max(0, self._remaining)
+
+    def estimate(self) -> float | None:
+        """Сколько секунд осталось до окончания скачивания запланированных файлов
+        при текущей скорости (None - скорость ещё не измерена)."""
+        rate = self.concurrency.current_rate()
+        if not rate:
+            return None
+        return self.remaining() / rate
+
+    def finished(self, copied: bool) -> None:
+        """Учитывает результат скачивания файла."""
+        self.concurrency.finished(copied)
+
+    def status(self) -> str:
+        """Строка состояния для вывода хода скачивания."""
+        text = (
+            f"{format_rate(self.concurrency.current_rate())}, "
+            f"передач {self.pool.active} из {self.pool.limit}"
+        )
+        remaining = self.remaining()
+        estimate = self.estimate()
+        if remaining and estimate is not None:
+            text += f", осталось {format_size(remaining)} (~{estimate:.0f} с)"
+        return text
+
+
+def format_rate(rate: float) -> str:
+    """Функция format_rate(rate: float) -> str
+    Скорость в байтах в секунду в виде строки в КБ/с или МБ/с.
+    """
+    if rate >= 1024 * 1024:
+        return f"{rate / (1024 * 1024):.1f} МБ/с"
+    return f"{rate / 1024:.0f} КБ/с"
+
+
+def format_size(size: int) -> str:
+    """Функция format_size(size: int) -> str
+    Объём в байтах в виде строки в КБ или МБ.
+    """
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} МБ"
+    return f"{size / 1024:.0f} КБ"
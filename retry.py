@@ -0,0 +1,41 @@
+import random
+import socket
+from ftplib import error_reply, error_temp
+
+from constant import const as c
+
+# Ошибки, после которых сессия с FTP сервером считается потерянной:
+# тайм-аут, обрыв соединения (в том числе broken pipe), закрытие соединения
+# сервером, временные ответы 4xx (421 - сервис недоступен, сессия закрыта)
+# и ответы, не соответствующие командам (сессия рассинхронизирована).
+SESSION_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    EOFError,
+    socket.gaierror,
+    error_temp,
+    error_reply,
+)
+
+
+def is_session_error(err: BaseException) -> bool:
+    """Функция is_session_error(err: BaseException) -> bool
+    Проверяет, потеряна ли сессия с FTP сервером после ошибки err
+    (повторная попытка в новой сессии может быть успешной).
+    """
+    return isinstance(err, SESSION_ERRORS)
+
+
+def get_backoff_delay(attempt: int) -> float:
+    """Функция get_backoff_delay(attempt: int) -> float
+        Пауза перед повторной попыткой номер attempt + 1.
+        Пауза растёт вдвое с каждой попыткой (от RETRY_BASE_SEC до RETRY_MAX_SEC).
+        Половина паузы случайна, чтобы сессии, потерянные одновременно,
+        не подключались к серверу снова тоже одновременно.
+    :param
+        attempt: int - Номер неудавшейся попытки (с 1)
+    :return:
+        Пауза, секунд.
+    """
+    delay = min(c.RETRY_MAX_SEC, c.RETRY_BASE_SEC * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,80 @@
+import logging
+import zlib
+from ftplib import FTP, error_perm
+from io import BytesIO
+from pathlib import Path
+
+from constant import const as c
+
+
+def read_sfv(ftp: FTP, ftp_file_sizes: dict[str, int] | None) -> dict[str, int]:
+    """Функция read_sfv(ftp: FTP, ftp_file_sizes: dict[str, int] | None) -> dict[str, int]
+        Читает с FTP сервера файл контрольных сумм SFV_FILE (в память, не на диск).
+    :param
+        1. ftp: FTP                         - FTP сервер
+        2. ftp_file_sizes: dict[str, int]   - Снимок директории FTP сервера
+                                              (None - директория ещё не прочитана,
+                                              файл запрашивается наугад)
+    :return:
+        Словарь: имя файла в нижнем регистре -> CRC32.
+        Пустой словарь, если файла контрольных сумм на сервере нет или он не прочитан.
+    """
+    if ftp_file_sizes is not None and c.SFV_FILE not in ftp_file_sizes:
+        return dict()
+
+    buffer = BytesIO()
+    try:
+        ftp.retrbinary("RETR " + c.SFV_FILE, buffer.write)
+    except Exception as err:
+        if ftp_file_sizes is None and isinstance(err, error_perm):
+            return dict()  # Файла контрольных сумм в директории нет
+        logging.warning(
+            f"Не удалось прочитать {c.SFV_FILE}: {err}\n"
+            f"Контрольные суммы файлов проверяться не будут\n"
+        )
+        return dict()
+
+    return parse_sfv(buffer.getvalue().decode("cp1251", errors="replace"))
+
+
+def parse_sfv(text: str) -> dict[str, int]:
+    """Функция parse_sfv(text: str) -> dict[str, int]
+        Разбирает содержимое SFV файла.
+        Строки вида "имя_файла CRC32", строки комментариев начинаются с ';'.
+    :param
+        text: str - содержимое SFV файла
+    :return:
+        Словарь: имя файла в нижнем регистре -> CRC32.
+    """
+    crcs = dict()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith(";"):
+            continue
+        parts = line.rsplit(maxsplit=1)
+        if len(parts) != 2:
+            continue
+        name, crc = parts
+        try:
+            crcs[name.lower()] = int(crc, 16)
+        except ValueError:
+            continue
+    return crcs
+
+
+def get_crc(crcs: dict[str, int], name: str) -> int | None:
+    """Функция get_crc(crcs: dict[str, int], name: str) -> int | None
+    Контрольная сумма файла из SFV или None, если файла в SFV нет.
+    """
+    return crcs.get(name.lower())
+
+
+def file_crc32(file: Path) -> int:
+    """Функция file_crc32(file: Path) -> int
+    Вычисляет CRC32 файла, читая его блоками по COPY_CHUNK_SIZE.
+    """
+    crc = 0
+    with open(file, "rb") as f_in:
+        while block := f_in.read(c.COPY_CHUNK_SIZE):
+            crc = zlib.crc32(block, crc)
+    return crc
@@ -0,0 +1,127 @@
+from pathlib import Path
+
+import download
+from constant import const as C
+
+MODIFY = "20260101120000"
+
+
+def write_part(tmp_path: Path, data: bytes) -> Path:
+    part_file = download.get_part_file(tmp_path, "A_RES_910000.acd")
+    part_file.write_bytes(data)
+    return part_file
+
+
+def test_get_part_offset_resumes_part_of_same_file(tmp_path: Path):
+    """Часть продолжается, если размер и время изменения файла на FTP сервере
+    совпадают с записанными при её начале."""
+    part_file = write_part(tmp_path, b"x" * 4)
+    download.save_part_source(part_file, 10, MODIFY)
+
+    assert download.get_part_offset(part_file, 10, MODIFY) == 4
+    assert download.get_part_offset(part_file, 10, MODIFY, crc=1) == 4
+
+
+def test_get_part_offset_restarts_part_of_changed_file(tmp_path: Path):
+    """Файл на FTP сервере заменён (другие время изменения или размер) -
+    часть скачивается с начала."""
+    part_file = write_part(tmp_path, b"x" * 4)
+    download.save_part_source(part_file, 10, MODIFY)
+
+    assert download.get_part_offset(part_file, 10, "20260102120000") == 0
+    assert download.get_part_offset(part_file, 12, MODIFY) == 0
+
+
+def test_get_part_offset_restarts_part_without_source(tmp_path: Path):
+    """Часть без сведений об источнике (например, от прежней версии) и часть,
+    которую нечем сверить (нет ни времени изменения, ни контрольной суммы),
+    скачиваются с начала."""
+    part_file = write_part(tmp_path, b"x" * 4)
+
+    assert download.get_part_offset(part_file, 10, MODIFY, crc=1) == 0
+
+    download.save_part_source(part_file, 10, None)
+    assert download.get_part_offset(part_file, 10) == 0
+    assert download.get_part_offset(part_file, 10, crc=1) == 4
+
+
+def test_finish_part_file_removes_source(tmp_path: Path):
+    """Скачанный файл получает своё имя, сведения об источнике удаляются."""
+    part_file = write_part(tmp_path, b"data")
+    download.save_part_source(part_file, 4, MODIFY)
+
+    assert download.finish_part_file("A_RES_910000.acd", tmp_path, 4, None, 0)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["A_RES_910000.acd"]
+
+
+def test_finish_part_file_discards_part_with_wrong_crc(tmp_path: Path):
+    """При несовпадении контрольной суммы часть удаляется и файл не получает
+    своё имя: None - скачать заново."""
+    part_file = write_part(tmp_path, b"data")
+    download.save_part_source(part_file, 4, MODIFY)
+
+    assert download.finish_part_file("A_RES_910000.acd", tmp_path, 4, 1, 2) is None
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_segmented_file_resumes_from_segment_map(tmp_path: Path):
+    """Карта участков, оставшаяся от прерванного скачивания, продолжается
+    с записанных байтов каждого участка; участков столько же, сколько в карте."""
+    segmented = download.SegmentedFile(
+        tmp_path, "A_RES_910000.acd", 1000, 4, ftp_modify=MODIFY
+    )
+    segmented.segments[0].position = 100
+    segmented.segments[1].position = segmented.segments[1].end
+    segmented.segments[3].position = 900
+    segmented.save()
+
+    resumed = download.SegmentedFile(
+        tmp_path, "A_RES_910000.acd", 1000, 2, ftp_modify=MODIFY
+    )
+
+    assert [
+        (segment.start, segment.position, segment.end) for segment in resumed.segments
+    ] == [(0, 100, 250), (250, 500, 500), (500, 500, 750), (750, 900, 1000)]
+    assert resumed.pending() == 3
+    assert resumed.take().position == 100
+
+
+def test_segmented_file_restarts_for_changed_file(tmp_path: Path):
+    """Карта участков другого файла FTP сервера (время изменения или размер
+    не совпадают) не используется."""
+    segmented = download.SegmentedFile(
+        tmp_path, "A_RES_910000.acd", 1000, 2, ftp_modify=MODIFY
+    )
+    segmented.segments[0].position = 100
+    segmented.save()
+
+    restarted = download.SegmentedFile(
+        tmp_path, "A_RES_910000.acd", 1000, 4, ftp_modify="20260102120000"
+    )
+
+    assert [segment.position for segment in restarted.segments] == [0, 250, 500, 750]
+
+
+def test_get_segment_count(tmp_path: Path):
+    """Файл, начатый одним потоком, докачивается одним потоком (0);
+    файл с картой участков продолжается по участкам."""
+    ftp_file = "A_RES_910000.acd"
+    ftp_size = 2 * C.PREALLOCATE_MIN_SIZE
+    context = download.DownloadContext(
+        {ftp_file: ftp_size},
+        dict(),
+        tmp_path,
+        "/ftp",
+        ftp_file_modify={ftp_file: MODIFY},
+    )
+    assert download.get_segment_count(context, ftp_file) == 1
+
+    part_file = write_part(tmp_path, b"x" * 4)
+    download.save_part_source(part_file, ftp_size, MODIFY)
+    assert download.get_segment_count(context, ftp_file) == 0
+
+    download.discard_part_file(part_file)
+    download.SegmentedFile(tmp_path, ftp_file, ftp_size, 1, ftp_modify=MODIFY)
+    assert download.get_segment_count(context, ftp_file) == 1
@@ -0,0 +1,23 @@
+import asyncio
+import time
+from threading import Event, Timer
+
+import ftp_async
+
+
+def test_wait_stop_returns_when_stop_is_set():
+    """Пауза между попытками прерывается остановкой, не дожидаясь конца."""
+    stop = Event()
+    Timer(0.1, stop.set).start()
+    started = time.monotonic()
+
+    assert asyncio.run(ftp_async.wait_stop(stop, 10))
+    assert time.monotonic() - started < 1
+
+
+def test_wait_stop_waits_delay():
+    """Без остановки пауза длится delay секунд."""
+    started = time.monotonic()
+
+    assert not asyncio.run(ftp_async.wait_stop(Event(), 0.2))
+    assert time.monotonic() - started >= 0.2
@@ -0,0 +1,150 @@
+import io
+from datetime import datetime
+from ftplib import error_perm
+
+import ftp_listing
+from ftp_listing import DIR_TYPE, FILE_TYPE, LINK_TYPE, FtpEntry
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+class FakeConnection:
+    """Соединение данных: строки ответа на команду."""
+
+    def __init__(self, lines: list[str]):
+        self.text = "".join(line + "\r\n" for line in lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def makefile(self, mode: str, encoding: str) -> io.StringIO:
+        return io.StringIO(self.text)
+
+
+class FakeFtp:
+    """FTP сервер, отвечающий на команды передачи данных строками replies;
+    команда без ответа отклоняется (550)."""
+
+    encoding = "utf-8"
+    maxline = 8192
+
+    def __init__(self, replies: dict[str, list[str]]):
+        self.replies = replies
+        self.commands = []
+
+    def sendcmd(self, cmd: str) -> str:
+        self.commands.append(cmd)
+        return "200 OK"
+
+    def transfercmd(self, cmd: str) -> FakeConnection:
+        self.commands.append(cmd)
+        if cmd not in self.replies:
+            raise error_perm("550 Command not supported")
+        return FakeConnection(self.replies[cmd])
+
+    def voidresp(self) -> str:
+        return "226 Transfer complete"
+
+
+def test_parse_mlsd_line():
+    """Факты MLSD без учёта регистра, имена с пробелами; cdir и pdir пропускаются."""
+    parse = ftp_listing.parse_mlsd_line
+
+    assert parse(
+        "type=file;size=1048576;modify=20261017093015.123; A_RES_910000.acd"
+    ) == FtpEntry("A_RES_910000.acd", 1048576, "20261017093015", FILE_TYPE)
+    assert parse("Type=File;Size=12;Modify=20261017093015; my file.txt") == FtpEntry(
+        "my file.txt", 12, "20261017093015", FILE_TYPE
+    )
+    assert parse("type=dir;modify=20261001000000; OLD") == FtpEntry(
+        "OLD", 0, "20261001000000", DIR_TYPE
+    )
+    assert parse("type=OS.unix=symlink;size=7; latest") == FtpEntry(
+        "latest", 7, None, LINK_TYPE
+    )
+    assert parse("type=cdir;modify=20261001000000; .") is None
+    assert parse("type=pdir;modify=20261001000000; ..") is None
+
+
+def test_parse_list_line_unix():
+    """Строки ls -l: файл, директория, ссылка, имя с пробелами, год вместо времени."""
+    parse = ftp_listing.parse_list_line
+
+    assert parse(
+        "-rw-r--r--   1 ftp      ftp       1048576 Oct 17 09:30 A_RES_910000.acd", NOW
+    ) == FtpEntry("A_RES_910000.acd", 1048576, "20261017093000", FILE_TYPE)
+    assert parse(
+        "-rw-r--r--   1 ftp      ftp            12 Oct 17 09:30 my  file.txt", NOW
+    ) == FtpEntry("my  file.txt", 12, "20261017093000", FILE_TYPE)
+    assert parse(
+        "drwxr-xr-x   2 ftp      ftp          4096 Jan  5  2025 OLD", NOW
+    ) == FtpEntry("OLD", 4096, "20250105000000", DIR_TYPE)
+    assert parse(
+        "lrwxrwxrwx   1 ftp      ftp            16 Dec 31 23:59 latest -> A_RES_910000.acd",
+        NOW,
+    ) == FtpEntry("latest", 16, "20251231235900", LINK_TYPE)
+    assert (
+        parse("drwxr-xr-x   2 ftp      ftp          4096 Oct 17 09:30 ..", NOW) is None
+    )
+    assert parse("total 12", NOW) is None
+
+
+def test_parse_list_line_dos():
+    """Строки DOS (IIS): файл, директория, имя с пробелами, четырёхзначный год."""
+    parse = ftp_listing.parse_list_line
+
+    assert parse("10-17-26  09:30AM              1048576 A_RES_910000.acd") == (
+        FtpEntry("A_RES_910000.acd", 1048576, "20261017093000", FILE_TYPE)
+    )
+    assert parse("10-17-2026  01:05PM       <DIR>          New folder") == (
+        FtpEntry("New folder", 0, "20261017130500", DIR_TYPE)
+    )
+    assert parse("10-17-26  09:30AM                   12 my file.txt") == (
+        FtpEntry("my file.txt", 12, "20261017093000", FILE_TYPE)
+    )
+
+
+def test_iter_listing_mlsd():
+    """Директория читается командой MLSD; нераспознанные строки пропускаются."""
+    ftp = FakeFtp(
+        {
+            "MLSD": [
+                "type=cdir;modify=20261001000000; .",
+                "type=file;size=10;modify=20261017093015; A_RES_910000.acd",
+                "type=file;size=3;modify=20261017093015; my file.txt",
+                "",
+            ]
+        }
+    )
+
+    assert list(ftp_listing.iter_listing(ftp)) == [
+        FtpEntry("A_RES_910000.acd", 10, "20261017093015", FILE_TYPE),
+        FtpEntry("my file.txt", 3, "20261017093015", FILE_TYPE),
+    ]
+    assert "LIST" not in ftp.commands
+
+
+def test_iter_listing_falls_back_to_list():
+    """Если сервер отклоняет MLSD, директория читается командой LIST."""
+    ftp = FakeFtp(
+        {
+            "LIST": [
+                "10-17-26  09:30AM                   10 A_RES_910000.acd",
+                "10-17-26  09:30AM       <DIR>          OLD",
+            ]
+        }
+    )
+
+    listing = ftp_listing.get_listing(ftp)
+
+    assert listing == {
+        "A_RES_910000.acd": FtpEntry(
+            "A_RES_910000.acd", 10, "20261017093000", FILE_TYPE
+        ),
+        "OLD": FtpEntry("OLD", 0, "20261017093000", DIR_TYPE),
+    }
+    assert [cmd for cmd in ftp.commands if cmd in ("MLSD", "LIST")] == ["MLSD", "LIST"]
+    assert ftp_listing.get_file_sizes(listing) == {"A_RES_910000.acd": 10}
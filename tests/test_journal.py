@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import journal
+from constant import const as C
+
+
+def get_names(directory: Path) -> list[str]:
+    return sorted(path.name for path in directory.iterdir() if path.is_file())
+
+
+def make_journal(
+    tmp_path: Path, *records: tuple[str, list[str] | None]
+) -> tuple[journal.PromotionJournal, Path]:
+    """Журнал задания, прерванного после записей records, и поддиректория NEW."""
+    local_subdir = Path(tmp_path, C.SUB_DIR_NEW)
+    local_subdir.mkdir()
+    promotion_journal = journal.PromotionJournal(tmp_path)
+    promotion_journal.begin(["/ftp"])
+    for op, names in records:
+        promotion_journal.write(op, names)
+    return promotion_journal, local_subdir
+
+
+def test_recover_rolls_forward_promote(tmp_path: Path):
+    """Перенос из NEW, прерванный после записи promote, доводится до конца:
+    перенесённые файлы не трогаются, недостающие в NEW откатываются;
+    повторное восстановление ничего не меняет."""
+    names = ["A_RES_910000.acd", "B_RES_910000.acd", "C_RES_910000.acd"]
+    promotion_journal, local_subdir = make_journal(tmp_path, ("promote", names))
+    for name in names[:2]:
+        Path(local_subdir, name).write_bytes(name.encode())
+    Path(tmp_path, names[0]).write_bytes(names[0].encode())
+    Path(tmp_path, names[2] + C.PART_SUFFIX).write_bytes(b"part")
+
+    assert promotion_journal.recover(local_subdir) == "promoting"
+
+    files = [C.JOURNAL_FILE] + names[:2]
+    assert get_names(tmp_path) == files
+    assert Path(tmp_path, names[1]).read_bytes() == names[1].encode()
+    assert get_names(local_subdir) == names[:2]
+    ops = [record["op"] for record in promotion_journal.read()]
+    assert ops == ["begin", "promote", "promoted"]
+
+    assert promotion_journal.recover(local_subdir) == "downloading"
+    assert get_names(tmp_path) == files
+    assert get_names(local_subdir) == names[:2]
+    assert len(promotion_journal.read()) == len(ops)
+
+
+def test_recover_rolls_forward_prune(tmp_path: Path):
+    """Перенос в OLD, прерванный после записи prune, доводится до конца:
+    уже перенесённые и отсутствующие файлы пропускаются;
+    повторное восстановление ничего не меняет."""
+    names = ["A_RES_900000.acd", "B_RES_900000.acd", "C_RES_900000.acd"]
+    promotion_journal, local_subdir = make_journal(
+        tmp_path, ("promote", []), ("promoted", None), ("prune", names)
+    )
+    sub_dir_old = Path(tmp_path, C.SUB_DIR_OLD)
+    sub_dir_old.mkdir()
+    Path(tmp_path, names[0]).write_bytes(names[0].encode())
+    Path(sub_dir_old, names[1]).write_bytes(names[1].encode())
+    Path(tmp_path, "A_RES_910000.acd").write_bytes(b"latest")
+
+    assert promotion_journal.recover(local_subdir) == "pruning"
+
+    files = [C.JOURNAL_FILE, "A_RES_910000.acd"]
+    assert get_names(tmp_path) == files
+    assert get_names(sub_dir_old) == names[:2]
+    ops = [record["op"] for record in promotion_journal.read()]
+    assert ops == ["begin", "promote", "promoted", "prune", "pruned"]
+
+    assert promotion_journal.recover(local_subdir) == "downloading"
+    assert get_names(tmp_path) == files
+    assert get_names(sub_dir_old) == names[:2]
+    assert len(promotion_journal.read()) == len(ops)
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+import manifest
+from constant import const as C
+
+NAMES = ["A_RES_910000.acd", "B_RES_910000.acd", "readme.txt"]
+
+
+def make_directory(tmp_path: Path) -> None:
+    """Файлы NAMES и файл индекса; время изменения директории - в прошлом,
+    дальше точности MANIFEST_MTIME_GRANULARITY_NS."""
+    for name in NAMES:
+        Path(tmp_path, name).write_bytes(name.encode())
+    manifest.Manifest(tmp_path).close()
+    past_ns = time.time_ns() - 10 * C.MANIFEST_MTIME_GRANULARITY_NS
+    os.utime(tmp_path, ns=(past_ns, past_ns))
+
+
+def test_unchanged_directory_is_not_rescanned(tmp_path: Path, monkeypatch):
+    """Если директория не менялась с прошлого чтения, индекс берётся из файла."""
+    make_directory(tmp_path)
+    manifest.Manifest(tmp_path).close()
+
+    def scandir(path):
+        raise AssertionError(f"{path} прочитана заново")
+
+    monkeypatch.setattr(manifest.os, "scandir", scandir)
+    components_manifest = manifest.Manifest(tmp_path)
+
+    assert components_manifest.names() == set(NAMES)
+    assert components_manifest.entries["A_RES_910000.acd"].version == "910000"
+
+
+def test_in_place_rewrite_is_found_by_verify(tmp_path: Path):
+    """Перезапись файла на месте не меняет время изменения директории:
+    refresh её не замечает, verify - обнаруживает."""
+    make_directory(tmp_path)
+    components_manifest = manifest.Manifest(tmp_path)
+    file = Path(tmp_path, "A_RES_910000.acd")
+    with open(file, "r+b") as f_out:
+        f_out.truncate(3)
+
+    components_manifest.refresh()
+    assert components_manifest.sizes()["A_RES_910000.acd"] == len(file.name)
+
+    components_manifest.verify()
+    assert components_manifest.sizes()["A_RES_910000.acd"] == 3
+    components_manifest.close()
+    assert manifest.Manifest(tmp_path).sizes()["A_RES_910000.acd"] == 3
+
+
+def test_manifest_works_in_memory_without_sqlite(tmp_path: Path, monkeypatch):
+    """Если файл индекса не открывается, индекс строится в памяти."""
+    for name in NAMES:
+        Path(tmp_path, name).write_bytes(name.encode())
+
+    def connect(file):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(manifest.sqlite3, "connect", connect)
+    components_manifest = manifest.Manifest(tmp_path)
+
+    assert components_manifest.names() == set(NAMES)
+    Path(tmp_path, "C_RES_910000.acd").write_bytes(b"new")
+    Path(tmp_path, "readme.txt").unlink()
+    components_manifest.update(["C_RES_910000.acd", "readme.txt"])
+    components_manifest.remove(["B_RES_910000.acd"])
+    assert components_manifest.names() == {"A_RES_910000.acd", "C_RES_910000.acd"}
+    assert not Path(tmp_path, C.MANIFEST_FILE).exists()
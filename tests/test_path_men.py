@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import pytest
+
+import component_functions as f
+import journal
+import manifest
+import path_men
+from constant import const as C
+
+COMPONENTS = [
+    "A_RES_900000.acd",
+    "A_RES_905.acd",
+    "A_RES_911010.acd",
+    "A_RES_92.acd",
+    "A_RES_900000.dll",
+    "A_RES_912000.dll",
+    "B_RES_910000.acd",
+    "readme.txt",
+]
+KEPT = ["A_RES_912000.dll", "A_RES_92.acd", "B_RES_910000.acd", "readme.txt"]
+MOVED = ["A_RES_900000.acd", "A_RES_900000.dll", "A_RES_905.acd", "A_RES_911010.acd"]
+
+
+def get_outdated_by_pairs(names: list[str]) -> set[str]:
+    """Устаревшие версии по прежнему алгоритму: отсортированные имена одного
+    компонента сравниваются попарно, из пары остаётся более свежая версия
+    (при равных версиях - следующая по сортировке)."""
+    outdated = set()
+    previous = None
+    for name in sorted(
+        names, key=lambda name: (f.parse_component_name(name)[::2], name)
+    ):
+        current = f.parse_component_name(name)
+        if previous is not None and current.is_same_component(previous):
+            oldest = current if current.number < previous.number else previous
+            outdated.add(oldest.name)
+            if oldest is current:
+                current = previous
+        previous = current
+    return outdated
+
+
+def test_main_moves_outdated_versions(tmp_path: Path):
+    """Остаётся самая свежая версия каждого компонента с каждым расширением,
+    остальные переносятся в OLD; не компоненты не трогаются."""
+    for name in COMPONENTS:
+        Path(tmp_path, name).write_bytes(name.encode())
+
+    path_men.main(str(tmp_path), interactive=False)
+
+    assert sorted(path.name for path in tmp_path.glob("[!.]*") if path.is_file()) == (
+        KEPT
+    )
+    assert sorted(path.name for path in Path(tmp_path, C.SUB_DIR_OLD).iterdir()) == (
+        MOVED
+    )
+
+
+def test_get_outdated_components_matches_pairwise():
+    """Выбор за один проход совпадает с попарным сравнением версий,
+    в том числе при равных номерах версий (91 и 910000)."""
+    names = COMPONENTS + ["A_RES_91.acd", "A_RES_910000.acd", "C_RES_1.acd"]
+    component_names = [f.parse_component_name(name) for name in names]
+
+    outdated = path_men.get_outdated_components(component_names)
+
+    assert {component_name.name for component_name in outdated} == (
+        get_outdated_by_pairs([name for name in names if f.parse_component_name(name)])
+    )
+    assert len(outdated) == len(MOVED) + 2
+
+
+def test_main_records_moved_files_when_a_move_fails(tmp_path: Path):
+    """Если файл перенести в OLD не удалось, остальные переносятся,
+    удаляются из индекса и отмечаются в журнале, затем возникает ошибка."""
+    for name in COMPONENTS:
+        Path(tmp_path, name).write_bytes(name.encode())
+    # На месте файла в OLD - непустая директория: переименование не удастся
+    Path(tmp_path, C.SUB_DIR_OLD, "A_RES_905.acd").mkdir(parents=True)
+    Path(tmp_path, C.SUB_DIR_OLD, "A_RES_905.acd", "x").write_bytes(b"x")
+    components_manifest = manifest.Manifest(tmp_path)
+    promotion_journal = journal.PromotionJournal(tmp_path)
+
+    with pytest.raises(f.MyException) as error:
+        path_men.main(
+            str(tmp_path),
+            interactive=False,
+            components_manifest=components_manifest,
+            promotion_journal=promotion_journal,
+        )
+
+    assert "A_RES_905.acd" in error.value.text_err
+    moved = [name for name in MOVED if name != "A_RES_905.acd"]
+    assert sorted(components_manifest.names()) == sorted(KEPT + ["A_RES_905.acd"])
+    assert all(Path(tmp_path, C.SUB_DIR_OLD, name).is_file() for name in moved)
+    records = promotion_journal.read()
+    assert [record["op"] for record in records] == ["prune", "pruned"]
+    assert sorted(records[-1]["names"]) == moved
@@ -0,0 +1,88 @@
+import component_functions as f
+import path_men
+import planning
+
+
+def test_get_latest_versions():
+    """Самая свежая версия каждого компонента с каждым расширением;
+    при равных номерах (91 и 910000) - большее имя, как в path_men."""
+    names = [
+        "A_RES_900000.acd",
+        "A_RES_91.acd",
+        "A_RES_910000.acd",
+        "A_RES_900000.dll",
+        "B_RES_910000.acd",
+        "B_RES_91.acd",
+        "readme.txt",
+    ]
+
+    latest = planning.get_latest_versions(names)
+
+    assert {key: value.name for key, value in latest.items()} == {
+        ("A_RES_", ".acd"): "A_RES_910000.acd",
+        ("A_RES_", ".dll"): "A_RES_900000.dll",
+        ("B_RES_", ".acd"): "B_RES_910000.acd",
+    }
+
+
+def test_get_latest_versions_agrees_with_path_men():
+    """Выбранную --latest версию path_men не переносит в OLD."""
+    names = ["A_RES_910000.acd", "A_RES_91.acd", "A_RES_9.acd", "A_RES_900000.acd"]
+
+    latest = planning.get_latest_versions(names)
+    outdated = path_men.get_outdated_components(map(f.parse_component_name, names))
+
+    assert latest[("A_RES_", ".acd")].name not in {name.name for name in outdated}
+    assert len(outdated) == len(names) - 1
+
+
+def test_get_superseded_files():
+    """Исключения сверки: устаревшие версии на FTP сервере, свежая версия
+    на FTP сервере, если локальная новее, и сама локальная версия."""
+    ftp_names = [
+        "A_RES_900000.acd",
+        "A_RES_910000.acd",
+        "B_RES_900000.acd",
+        "C_RES_91.acd",
+        "D_RES_910000.acd",
+        "readme.txt",
+    ]
+    local_names = [
+        "A_RES_900000.acd",
+        "B_RES_910000.acd",
+        "C_RES_910000.acd",
+        "D_RES_91.acd",
+    ]
+
+    superseded = planning.get_superseded_files(ftp_names, local_names)
+
+    assert superseded == {
+        "A_RES_900000.acd",
+        "B_RES_900000.acd",
+        "B_RES_910000.acd",
+        "C_RES_91.acd",
+        "C_RES_910000.acd",
+    }
+
+
+def test_get_schedule():
+    """Порядок скачивания по размерам; неизвестный размер - как пустой файл,
+    при равных размерах сохраняется порядок директории."""
+    ftp_files = ["a", "b", "c", "d", "e"]
+    ftp_file_sizes = {"a": 10, "b": 30, "c": 10, "e": 20}
+
+    assert planning.get_schedule(ftp_files, ftp_file_sizes, "listing") == ftp_files
+    assert planning.get_schedule(ftp_files, ftp_file_sizes, "largest") == [
+        "b",
+        "e",
+        "a",
+        "c",
+        "d",
+    ]
+    assert planning.get_schedule(ftp_files, ftp_file_sizes, "smallest") == [
+        "d",
+        "a",
+        "c",
+        "e",
+        "b",
+    ]
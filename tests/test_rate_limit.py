@@ -0,0 +1,89 @@
+import rate_limit
+from constant import const as C
+
+
+class FakeClock:
+    """Часы, которые идут, только когда их переводят."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakePool:
+    """Предел параллельных передач пула сессий (как FtpSessionPool.set_limit)."""
+
+    def __init__(self, limit: int, size: int):
+        self.limit = limit
+        self.size = size
+
+    def set_limit(self, limit: int) -> int:
+        self.limit = max(1, min(self.size, limit))
+        return self.limit
+
+
+def test_token_bucket_refill_and_burst():
+    """Корзина пополняется со скоростью rate, но не больше чем на RATE_BURST_SEC
+    секунд передачи; при нехватке маркеров - ожидание до пополнения."""
+    clock = FakeClock()
+    bucket = rate_limit.TokenBucket(1000, clock)
+    burst = int(1000 * C.RATE_BURST_SEC)
+
+    assert bucket.reserve(burst // 2) == 0
+    assert bucket.reserve(burst) == (burst // 2) / 1000
+
+    clock.now += 0.25
+    assert bucket.reserve(0) == (burst // 2 - 250) / 1000
+
+    clock.now += 100
+    assert bucket.reserve(burst) == 0
+    assert bucket.reserve(500) == 0.5
+
+
+def test_token_bucket_without_rate():
+    assert rate_limit.TokenBucket(None, FakeClock()).reserve(10**9) == 0
+
+
+def test_adaptive_concurrency_steps():
+    """Каждые ADAPTIVE_INTERVAL_SEC предел меняется на единицу: вниз сначала
+    и при неизменной скорости, в том же направлении при росте скорости,
+    в обратном - при падении; при доле ошибок больше ADAPTIVE_MAX_ERROR_RATE -
+    вдвое."""
+    clock = FakeClock()
+    pool = FakePool(4, 8)
+    concurrency = rate_limit.AdaptiveConcurrency(pool, True, clock)
+    limits = []
+    for size in (1000, 2000, 1000, 2000, 2000):
+        clock.now += C.ADAPTIVE_INTERVAL_SEC / 2
+        concurrency.transferred(size // 2)
+        assert pool.limit == (limits[-1] if limits else 4)
+        clock.now += C.ADAPTIVE_INTERVAL_SEC / 2
+        concurrency.transferred(size // 2)
+        limits.append(pool.limit)
+
+    assert limits == [3, 2, 3, 4, 3]
+    assert concurrency.rate == 2000 / C.ADAPTIVE_INTERVAL_SEC
+
+    pool.set_limit(8)
+    concurrency.finished(True)
+    for _ in range(3):
+        concurrency.finished(False)
+    clock.now += C.ADAPTIVE_INTERVAL_SEC
+    concurrency.transferred(2000)
+    assert pool.limit == 4
+
+
+def test_adaptive_concurrency_disabled_measures_rate():
+    """Без подбора предел не меняется, скорость измеряется."""
+    clock = FakeClock()
+    pool = FakePool(4, 8)
+    concurrency = rate_limit.AdaptiveConcurrency(pool, False, clock)
+
+    clock.now += C.ADAPTIVE_INTERVAL_SEC
+    concurrency.transferred(5000)
+
+    assert pool.limit == 4
+    assert concurrency.rate == 5000 / C.ADAPTIVE_INTERVAL_SEC
+    assert concurrency.current_rate() == concurrency.rate
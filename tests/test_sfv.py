@@ -0,0 +1,73 @@
+import zlib
+from pathlib import Path
+from threading import Event
+
+import path_ftp
+import sfv
+
+SFV_TEXT = """; Generated by WIN-SFV32 v1.1a on 2026-10-17 at 09:30:15
+;
+;    1048576  09:30.15 2026-10-17 A_RES_910000.acd
+A_RES_910000.acd 0A1B2C3D
+  b_res_910000.ACD   deadbeef
+my file.txt 00000001
+
+broken line
+c_res_910000.acd NOTACRC
+"""
+
+
+class FakeFtp:
+    """FTP сервер, отдающий файл по очереди содержимым из datas."""
+
+    def __init__(self, *datas: bytes):
+        self.datas = list(datas)
+        self.commands = []
+
+    def retrbinary(self, cmd: str, callback, rest: int | None = None) -> str:
+        self.commands.append(cmd)
+        data = self.datas.pop(0)
+        callback(data[rest or 0 :])
+        return "226 Transfer complete"
+
+
+def test_parse_sfv_skips_comments():
+    """Строки комментариев (';'), пустые и нераспознанные строки пропускаются,
+    имена с пробелами сохраняются."""
+    assert sfv.parse_sfv(SFV_TEXT) == {
+        "a_res_910000.acd": 0x0A1B2C3D,
+        "b_res_910000.acd": 0xDEADBEEF,
+        "my file.txt": 1,
+    }
+
+
+def test_get_crc_ignores_case():
+    """Имена сравниваются без учёта регистра."""
+    crcs = sfv.parse_sfv(SFV_TEXT)
+
+    assert sfv.get_crc(crcs, "A_RES_910000.ACD") == 0x0A1B2C3D
+    assert sfv.get_crc(crcs, "B_RES_910000.acd") == 0xDEADBEEF
+    assert sfv.get_crc(crcs, "C_RES_910000.acd") is None
+
+
+def test_file_crc32(tmp_path: Path):
+    file = Path(tmp_path, "A_RES_910000.acd")
+    file.write_bytes(b"data" * 1000)
+
+    assert sfv.file_crc32(file) == zlib.crc32(b"data" * 1000)
+
+
+def test_copy_retries_file_with_wrong_crc(tmp_path: Path):
+    """Файл с неверной контрольной суммой не получает своё имя
+    и скачивается заново."""
+    data = b"component data"
+    ftp = FakeFtp(data.upper(), data)
+
+    copied = path_ftp.copy_from_ftp_file(
+        ftp, "A_RES_910000.acd", tmp_path, Event(), len(data), zlib.crc32(data)
+    )
+
+    assert copied
+    assert ftp.commands == ["RETR A_RES_910000.acd"] * 2
+    assert [path.name for path in tmp_path.iterdir()] == ["A_RES_910000.acd"]
+    assert Path(tmp_path, "A_RES_910000.acd").read_bytes() == data